@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: AnnotationStore
+@time: 2020/3/24
+@desc: 列式标注缓存，xml只解析一次，按文件mtime/size失效
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from DatasetIndex import get_cache_dir
+from VocReader import read_voc
+
+STORE_VERSION = 1
+IMAGE_FIELDS = ('category_id', 'mtime', 'size', 'width', 'height', 'num_obj', 'obj_start')
+OBJECT_FIELDS = ('image_id', 'class_id', 'xmin', 'ymin', 'xmax', 'ymax', 'difficult')
+
+
+def parse_shard(xml_paths):
+    """
+    :info: 解析一组xml，返回紧凑的数组结果，供进程池使用
+    :return: (sizes[n, 2], num_obj[n], names, boxes[m, 5])，boxes列为 xmin, ymin, xmax, ymax, difficult
+    """
+    sizes = np.zeros((len(xml_paths), 2), dtype=np.int32)
+    num_obj = np.zeros(len(xml_paths), dtype=np.int32)
+    names = []
+    boxes = []
+    for i, xml_path in enumerate(xml_paths):
+        width, height, objects = read_voc(xml_path)
+        sizes[i] = width, height
+        num_obj[i] = len(objects)
+        for obj in objects:
+            names.append(obj[0])
+            boxes.append(obj[1:])
+    boxes = np.array(boxes, dtype=np.int32).reshape(-1, 5)
+    return sizes, num_obj, names, boxes
+
+
+def parse_files(xml_paths, workers=1):
+    """
+    :info: 将xml列表按顺序切分到进程池中解析，按切分顺序合并，结果与进程数无关
+    :param workers: 进程数，1 表示在当前进程中解析
+    """
+    if workers <= 1 or len(xml_paths) < 2:
+        return parse_shard(xml_paths)
+    num_shards = min(len(xml_paths), workers * 4)
+    bounds = np.linspace(0, len(xml_paths), num_shards + 1).astype(int)
+    shards = [xml_paths[bounds[i]:bounds[i + 1]] for i in range(num_shards)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(parse_shard, shards))
+    names = []
+    for result in results:
+        names.extend(result[2])
+    return (np.concatenate([r[0] for r in results]),
+            np.concatenate([r[1] for r in results]),
+            names,
+            np.concatenate([r[3] for r in results]))
+
+
+class AnnotationStore(object):
+    def __init__(self, sample_root):
+        """
+        :param sample_root: 数据集根目录，缓存保存在 sample_root_cache/annotation.npz
+        """
+        self.sample_root = sample_root
+        self.store_path = os.path.join(get_cache_dir(sample_root), 'annotation.npz')
+        self.categories = []
+        self.classes = []
+        self.stems = np.zeros(0, dtype='S1')
+        self.images = {name: np.zeros(0, dtype=np.int64) for name in IMAGE_FIELDS}
+        self.objects = {name: np.zeros(0, dtype=np.int32) for name in OBJECT_FIELDS}
+        self.parsed = 0
+        self.changed = False
+        # 图片行号与 (category, file_name) 的对应关系每变化一次加1，Selection 据此判断是否过期
+        self.version = 0
+        self._lookup = None
+
+    def __len__(self):
+        return len(self.stems)
+
+    @property
+    def num_objects(self):
+        return len(self.objects['image_id'])
+
+    def load(self):
+        """
+        :info: 读取持久化的标注缓存
+        :return: 是否成功读取
+        """
+        try:
+            with np.load(self.store_path) as data:
+                if int(data['version']) != STORE_VERSION:
+                    return False
+                self.categories = [c.decode('utf-8') for c in data['categories'].tolist()]
+                self.classes = [c.decode('utf-8') for c in data['classes'].tolist()]
+                self.stems = data['stems']
+                self.images = {name: data['img_' + name] for name in IMAGE_FIELDS}
+                self.objects = {name: data['obj_' + name] for name in OBJECT_FIELDS}
+        except (OSError, KeyError, ValueError):
+            return False
+        self._lookup = None
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        arrays = {'version': np.array(STORE_VERSION),
+                  'categories': self._encode(self.categories),
+                  'classes': self._encode(self.classes),
+                  'stems': self.stems}
+        arrays.update(('img_' + name, value) for name, value in self.images.items())
+        arrays.update(('obj_' + name, value) for name, value in self.objects.items())
+        tmp_path = self.store_path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.store_path)
+
+    @staticmethod
+    def _encode(names):
+        return np.array([name.encode('utf-8') for name in names], dtype='S')
+
+    def _rows(self):
+        return self.categories, self.images['category_id'], self.stems
+
+    def _same_rows(self, rows):
+        categories, category_id, stems = rows
+        return (categories == self.categories and np.array_equal(category_id, self.images['category_id'])
+                and np.array_equal(stems, self.stems))
+
+    def lookup(self):
+        """
+        :return: {(category, file_name): image_id}
+        """
+        if self._lookup is None:
+            self._lookup = {(self.categories[c], s.decode('utf-8')): i for i, (c, s)
+                            in enumerate(zip(self.images['category_id'].tolist(), self.stems.tolist()))}
+        return self._lookup
+
+    def refresh(self, dataset, workers=1):
+        """
+        :info: 与数据集字典同步，仅重新解析 mtime 或 size 发生变化的xml
+        :param dataset: {category: [file_name]}
+        :param workers: 解析xml的进程数
+        """
+        rows = self._rows()
+        old_lookup = self.lookup()
+        old_mtime = self.images['mtime']
+        old_size = self.images['size']
+
+        categories = sorted(dataset)
+        keys = []
+        stats = []
+        reuse = []
+        todo = []
+        for category_id, category in enumerate(categories):
+            category_path = os.path.join(self.sample_root, category)
+            for file_name in dataset[category]:
+                st = os.stat(os.path.join(category_path, file_name + '.xml'))
+                old_id = old_lookup.get((category, file_name), -1)
+                if old_id >= 0 and old_mtime[old_id] == st.st_mtime_ns and old_size[old_id] == st.st_size:
+                    reuse.append((len(keys), old_id))
+                else:
+                    todo.append(len(keys))
+                keys.append((category_id, file_name))
+                stats.append((st.st_mtime_ns, st.st_size))
+
+        parsed = parse_files([os.path.join(self.sample_root, categories[keys[i][0]], keys[i][1] + '.xml')
+                              for i in todo], workers)
+        self._assemble(categories, keys, stats, reuse, todo, parsed)
+        self.parsed = len(todo)
+        self.changed = self.parsed > 0 or len(reuse) != len(old_lookup)
+        if not self._same_rows(rows):
+            self.version += 1
+        return self
+
+    def _assemble(self, categories, keys, stats, reuse, todo, parsed):
+        num = len(keys)
+        width = np.zeros(num, dtype=np.int32)
+        height = np.zeros(num, dtype=np.int32)
+        num_obj = np.zeros(num, dtype=np.int32)
+
+        # 新解析的行
+        sizes, counts, names, boxes = parsed
+        todo = np.array(todo, dtype=np.int64)
+        width[todo] = sizes[:, 0]
+        height[todo] = sizes[:, 1]
+        num_obj[todo] = counts
+        classes = sorted(set(self.classes) | set(names))
+        class_map = {name: i for i, name in enumerate(classes)}
+        objects = {'image_id': [np.repeat(todo, counts)],
+                   'class_id': [np.array([class_map[name] for name in names], dtype=np.int64)]}
+        for column, name in enumerate(OBJECT_FIELDS[2:]):
+            objects[name] = [boxes[:, column]]
+
+        # 沿用未变化的行
+        if len(reuse) > 0:
+            new_ids = np.array([r[0] for r in reuse], dtype=np.int64)
+            old_ids = np.array([r[1] for r in reuse], dtype=np.int64)
+            width[new_ids] = self.images['width'][old_ids]
+            height[new_ids] = self.images['height'][old_ids]
+            counts = self.images['num_obj'][old_ids]
+            num_obj[new_ids] = counts
+            starts = self.images['obj_start'][old_ids]
+            offsets = np.cumsum(counts) - counts
+            obj_idx = np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+            for name in OBJECT_FIELDS[2:]:
+                objects[name].append(self.objects[name][obj_idx])
+            objects['image_id'].append(np.repeat(new_ids, counts))
+            class_remap = np.array([class_map[name] for name in self.classes], dtype=np.int64)
+            objects['class_id'].append(class_remap[self.objects['class_id'][obj_idx]])
+
+        class_id = np.concatenate(objects.pop('class_id'))
+        image_id = np.concatenate(objects.pop('image_id'))
+        order = np.argsort(image_id, kind='stable')
+        self.objects = {'image_id': image_id[order].astype(np.int32),
+                        'class_id': class_id[order].astype(np.int32)}
+        for name in OBJECT_FIELDS[2:]:
+            self.objects[name] = np.concatenate(objects[name])[order].astype(
+                np.int8 if name == 'difficult' else np.int32)
+
+        stats = np.array(stats, dtype=np.int64).reshape(-1, 2)
+        self.categories = categories
+        self.classes = classes
+        self.stems = np.array([k[1].encode('utf-8') for k in keys], dtype='S') if num else np.zeros(0, dtype='S1')
+        self.images = {'category_id': np.array([k[0] for k in keys], dtype=np.int32),
+                       'mtime': stats[:, 0],
+                       'size': stats[:, 1],
+                       'width': width,
+                       'height': height,
+                       'num_obj': num_obj,
+                       'obj_start': np.cumsum(num_obj, dtype=np.int64) - num_obj}
+        self._lookup = None
+
+    def update(self, dataset, workers=1):
+        """
+        :info: 读取缓存、增量刷新并写回磁盘
+        :param workers: 解析xml的进程数
+        """
+        rows = self._rows()
+        version = self.version
+        self.load()
+        self.refresh(dataset, workers)
+        # 与读取缓存之前相比，行号对应的文件没有变化时版本不变
+        self.version = version if self._same_rows(rows) else version + 1
+        if self.changed or not os.path.isfile(self.store_path):
+            self.save()
+        print('Parsed {} of {} xml files.'.format(self.parsed, len(self)))
+        return self
+
+    def file_name(self, image_id):
+        return self.stems[image_id].decode('utf-8')
+
+    def category(self, image_id):
+        return self.categories[self.images['category_id'][image_id]]
+
+    def image_of_objects(self, field):
+        """
+        :info: 将图片表的字段展开到对象表，便于向量化计算
+        """
+        return self.images[field][self.objects['image_id']]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: BatchRunner
+@time: 2020/5/18
+@desc: 按任务文件批量处理多个数据集目录，多个任务并发执行，拷贝线程数与解析进程数受全局上限约束，
+       每个任务输出日志、分阶段记录与汇总
+       python BatchRunner.py jobs.json --jobs 4 --threads 32 --workers 8 --summary-dir ./batch
+任务文件:
+{
+    "defaults": {"class": "PlayDataset", "init": {"img_format": ".jpg"}},
+    "jobs": [
+        {"name": "18902", "sample_root": "/data/18902", "ops": ["count_category", {"op": "correct_dataset", "mode": "hardlink"}]},
+        {"class": "CopeResult", "sample_root": "/data/18902_result", "ops": ["reconstruct_result"]}
+    ]
+}
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+matplotlib.use('Agg')
+from PlayDataset import PlayDataset
+from CopeResult import CopeResult
+from DifficultDataset import DifficultDataset
+from Instrument import Instrumentation, JsonLinesSink
+
+CLASSES = {cls.__name__: cls for cls in (PlayDataset, CopeResult, DifficultDataset)}
+
+
+def load_jobs(job_file):
+    """
+    :info: 读取并检查任务文件，任务文件可以是 {"defaults": ..., "jobs": [...]} 或任务列表
+    :return: 规范化后的任务列表 [{name, class, sample_root, init, ops: [(op, kwargs)]}]
+    """
+    with open(job_file, encoding='utf-8') as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        config = {'jobs': config}
+    defaults = config.get('defaults', {})
+    jobs = []
+    names = set()
+    for idx, raw in enumerate(config['jobs']):
+        job = dict(defaults, **raw)
+        job['init'] = dict(defaults.get('init', {}), **raw.get('init', {}))
+        class_name = job.get('class', 'PlayDataset')
+        if class_name not in CLASSES:
+            raise ValueError('Job {}: unknown class {}, expected one of {}.'.format(idx, class_name, list(CLASSES)))
+        cls = CLASSES[class_name]
+        if 'sample_root' not in job:
+            raise ValueError('Job {}: sample_root is required.'.format(idx))
+        ops = []
+        for op in job.get('ops', []):
+            kwargs = {}
+            if isinstance(op, dict):
+                kwargs = {key: value for key, value in op.items() if key != 'op'}
+                op = op['op']
+            if op.startswith('_') or not callable(getattr(cls, op, None)):
+                raise ValueError('Job {}: {} has no operation {}.'.format(idx, class_name, op))
+            ops.append((op, kwargs))
+        name = job.get('name') or os.path.basename(job['sample_root'].rstrip('\\').rstrip('/'))
+        base, cnt = name, 1
+        while name in names:
+            cnt += 1
+            name = '{}_{}'.format(base, cnt)
+        names.add(name)
+        jobs.append({'name': name, 'class': class_name, 'sample_root': job['sample_root'],
+                     'init': job['init'], 'ops': ops})
+    return jobs
+
+
+def _limit(func, kwargs, threads, workers):
+    """
+    :info: 没有指定或超过份额时，把拷贝线程数与解析进程数限制在本任务的份额内
+    """
+    kwargs = dict(kwargs)
+    params = inspect.signature(func).parameters
+    for key, share in (('threads', threads), ('workers', workers)):
+        if key in params:
+            kwargs[key] = min(kwargs.get(key, share), share)
+    return kwargs
+
+
+def run_job(job, summary_dir, threads=8, workers=1):
+    """
+    :info: 在子进程中执行一个任务的全部操作，某个操作失败时跳过其后的操作
+    :param threads: 本任务可用的拷贝线程数
+    :param workers: 本任务可用的解析进程数
+    :return: 任务汇总 dict
+    """
+    job_dir = os.path.join(summary_dir, job['name'])
+    os.makedirs(job_dir, exist_ok=True)
+    records = []
+    instrument = Instrumentation([JsonLinesSink(os.path.join(job_dir, 'instrument.jsonl'))])
+    instrument.add_hook(records.append)
+    summary = {'name': job['name'], 'class': job['class'], 'sample_root': job['sample_root'],
+               'threads': threads, 'workers': workers, 'status': 'ok', 'error': None, 'ops': []}
+    start = time.time()
+    with open(os.path.join(job_dir, 'job.log'), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            cls = CLASSES[job['class']]
+            init = dict(job['init'], instrument=instrument)
+            params = inspect.signature(cls).parameters
+            if 'headless' in params:
+                init.setdefault('headless', True)
+            if 'output_dir' in params:
+                init.setdefault('output_dir', job_dir)
+            data = cls(job['sample_root'], **init)
+        except Exception as e:
+            traceback.print_exc()
+            summary.update(status='failed', error='__init__: {!r}'.format(e))
+            data = None
+        for op, kwargs in job['ops']:
+            if data is None or summary['status'] != 'ok':
+                summary['ops'].append({'op': op, 'status': 'skipped'})
+                continue
+            func = getattr(data, op)
+            kwargs = _limit(func, kwargs, threads, workers)
+            record = {'op': op, 'args': kwargs, 'status': 'ok'}
+            del records[:]
+            op_start = time.time()
+            try:
+                result = func(**kwargs)
+                if isinstance(result, (str, int, float)):
+                    record['result'] = result
+            except Exception as e:
+                traceback.print_exc()
+                record.update(status='failed', error=repr(e))
+                summary.update(status='failed', error='{}: {!r}'.format(op, e))
+            record['seconds'] = round(time.time() - op_start, 3)
+            totals = [total for total in records if total['method'] == op and total['phase'] == 'total']
+            record['files'] = sum(total['files'] for total in totals)
+            record['bytes'] = sum(total['bytes'] for total in totals)
+            record['phases'] = {}
+            for phase in records:
+                if phase['method'] == op and phase['phase'] != 'total':
+                    item = record['phases'].setdefault(phase['phase'], {'seconds': 0., 'files': 0, 'bytes': 0})
+                    item['seconds'] = round(item['seconds'] + phase['seconds'], 4)
+                    item['files'] += phase['files']
+                    item['bytes'] += phase['bytes']
+            summary['ops'].append(record)
+            print('[BATCH] {} {} in {:.1f}s.'.format(op, record['status'], record['seconds']))
+    summary['seconds'] = round(time.time() - start, 3)
+    with open(os.path.join(job_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    return summary
+
+
+def run_batch(jobs, summary_dir, max_jobs=4, threads=32, workers=None):
+    """
+    :param jobs: load_jobs 得到的任务列表
+    :param summary_dir: 每个任务的日志与汇总目录，总汇总为 summary_dir/summary.jsonl
+    :param max_jobs: 同时执行的任务数，超过线程或进程上限时减少到上限
+    :param threads: 所有任务合计的拷贝线程上限
+    :param workers: 所有任务合计的解析进程上限，默认 CPU 核数
+    :return: 任务汇总列表，顺序与任务文件一致
+    """
+    workers = workers or os.cpu_count() or 1
+    assert threads >= 1 and workers >= 1, 'threads and workers should be at least 1.'
+    # 每个任务至少要一个线程和一个进程，同时执行的任务数不能超过上限
+    max_jobs = max(1, min(max_jobs, len(jobs), threads, workers))
+    job_threads = max(1, threads // max_jobs)
+    job_workers = max(1, workers // max_jobs)
+    os.makedirs(summary_dir, exist_ok=True)
+    print('---Start running {} jobs, {} at a time, {} threads and {} workers each---'.format(
+        len(jobs), max_jobs, job_threads, job_workers))
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=max_jobs) as pool, \
+            open(os.path.join(summary_dir, 'summary.jsonl'), 'a', encoding='utf-8') as f:
+        futures = {pool.submit(run_job, job, summary_dir, job_threads, job_workers): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'name': job['name'], 'class': job['class'], 'sample_root': job['sample_root'],
+                           'status': 'failed', 'error': repr(e), 'ops': []}
+            summaries[job['name']] = summary
+            f.write(json.dumps(summary, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            print('[BATCH] {} {} in {}s.'.format(summary['name'], summary['status'], summary.get('seconds')))
+    failed = [name for name, summary in summaries.items() if summary['status'] != 'ok']
+    print('---End running jobs, {} succeeded, {} failed---'.format(len(jobs) - len(failed), len(failed)))
+    if failed:
+        print('[WARNING] Failed jobs: {}'.format(', '.join(failed)))
+    return [summaries[job['name']] for job in jobs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run PlayDataset operations over many dataset roots.')
+    parser.add_argument('job_file', help='json job file')
+    parser.add_argument('--jobs', type=int, default=4, help='jobs running at the same time')
+    parser.add_argument('--threads', type=int, default=32, help='copy threads shared by all jobs')
+    parser.add_argument('--workers', type=int, default=None, help='parse processes shared by all jobs')
+    parser.add_argument('--summary-dir', default=os.path.join('.', 'batch'))
+    args = parser.parse_args(argv)
+    summaries = run_batch(load_jobs(args.job_file), args.summary_dir, args.jobs, args.threads, args.workers)
+    return 0 if all(summary['status'] == 'ok' for summary in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
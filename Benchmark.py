@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: Benchmark
+@time: 2020/4/14
+@desc: 在合成数据集上测量建索引、解析xml、拷贝和重建结果的耗时，结果以 json lines 输出
+       python Benchmark.py --scales 10000 100000 1000000 --work-dir /data/bench --output bench.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import matplotlib
+matplotlib.use('Agg')
+from PlayDataset import PlayDataset
+from CopeResult import CopeResult
+from SyntheticDataset import generate_dataset, generate_result
+from DatasetIndex import get_cache_dir
+
+
+def timed(records, scale, op, func, files):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    record = {'scale': scale, 'op': op, 'seconds': round(seconds, 4), 'files': files,
+              'files_per_second': round(files / seconds, 1) if seconds > 0 else None,
+              'python': platform.python_version(), 'platform': platform.platform()}
+    records.append(record)
+    print('[BENCH] scale={} {:<32} {:>9.3f}s'.format(scale, op, seconds))
+    return result
+
+
+def bench_scale(work_dir, scale, num_categories=20, workers=1, threads=8, keep=False):
+    """
+    :info: 在一个规模上跑全部测试
+    :return: 记录列表
+    """
+    records = []
+    scale_dir = os.path.join(work_dir, 'scale_{}'.format(scale))
+    sample_root = os.path.join(scale_dir, 'dataset')
+    result_root = os.path.join(scale_dir, 'result')
+    if not os.path.isdir(sample_root):
+        timed(records, scale, 'generate_dataset',
+              lambda: generate_dataset(sample_root, num_categories, scale), scale * 2)
+        timed(records, scale, 'generate_result',
+              lambda: generate_result(result_root, num_categories, scale), scale)
+
+    data = timed(records, scale, '__file_to_dict(cold)',
+                 lambda: PlayDataset(sample_root, use_cache=True, rebuild=True, headless=True), scale * 2)
+    timed(records, scale, '__file_to_dict(warm)',
+          lambda: PlayDataset(sample_root, use_cache=True, headless=True), scale * 2)
+    store_path = os.path.join(get_cache_dir(sample_root), 'annotation.npz')
+    if os.path.isfile(store_path):
+        os.remove(store_path)
+    timed(records, scale, 'info_img_and_category(cold)',
+          lambda: data.info_img_and_category(workers=workers, plot=False), scale)
+    timed(records, scale, 'info_img_and_category(warm)',
+          lambda: data.info_img_and_category(workers=workers, plot=False), scale)
+
+    for path in (sample_root + '_correct', sample_root + '_sample', sample_root + '_sample_others',
+                 result_root + '_correct', result_root + '_incorrect'):
+        shutil.rmtree(path, ignore_errors=True)
+    timed(records, scale, 'correct_dataset',
+          lambda: data.correct_dataset(workers=workers, threads=threads), scale * 2)
+    timed(records, scale, 'sample_data',
+          lambda: data.sample_data(max(scale // num_categories // 2, 1), threads=threads), scale * 2)
+    result = timed(records, scale, 'CopeResult.__file_to_dict', lambda: CopeResult(result_root), scale)
+    timed(records, scale, 'CopeResult.reconstruct_result',
+          lambda: result.reconstruct_result(threads=threads), scale)
+
+    if not keep:
+        shutil.rmtree(scale_dir, ignore_errors=True)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark PlayDataset on synthetic VOC datasets.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--work-dir', default=os.path.join('.', 'bench'))
+    parser.add_argument('--output', default=None, help='json lines file, default stdout')
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--keep', action='store_true', help='keep generated data for the next run')
+    args = parser.parse_args(argv)
+
+    records = []
+    for scale in args.scales:
+        records += bench_scale(os.path.abspath(args.work_dir), scale, args.categories,
+                               args.workers, args.threads, args.keep)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    for record in records:
+        out.write(json.dumps(record) + '\n')
+    if args.output:
+        out.close()
+        print('[FINISH] The result has been saved at path: {}'.format(args.output))
+    return records
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: CategoryReport
+@time: 2020/5/16
+@desc: 一次遍历数据集得到多级目录每一层的汇总数量，逐行写出 xlsx(write-only)/csv/json，
+       内存只与目录深度有关，与行数无关
+"""
+import os
+import csv
+import json
+from openpyxl import Workbook
+
+HEADER = ('category', 'level', 'quantity', 'total')
+FORMATS = ('xlsx', 'csv', 'json')
+
+
+def category_rollups(dataset):
+    """
+    :info: 按层级排序后遍历，栈中只保存当前路径上未结束的目录；
+           子目录先于父目录输出(后序)，最后一行为全部数量 (category 为 '', level 为 0)
+    :param dataset: {category: [file_name]}
+    :return: 生成 (category, level, 本目录数量, 包含子目录的总数量)
+    """
+    # [目录名, 本目录数量, 总数量]
+    stack = [['', 0, 0]]
+
+    def close():
+        part, quantity, total = stack.pop()
+        stack[-1][2] += total
+        return os.sep.join(node[0] for node in stack[1:] + [[part]]), len(stack), quantity, total
+
+    for category in sorted(dataset, key=lambda c: c.split(os.sep)):
+        parts = category.split(os.sep)
+        common = 0
+        while common < len(parts) and common + 1 < len(stack) and stack[common + 1][0] == parts[common]:
+            common += 1
+        while len(stack) > common + 1:
+            yield close()
+        stack.extend([part, 0, 0] for part in parts[common:])
+        quantity = len(dataset[category])
+        stack[-1][1] += quantity
+        stack[-1][2] += quantity
+    while len(stack) > 1:
+        yield close()
+    yield '', 0, stack[0][1], stack[0][2]
+
+
+def write_category_report(rows, output_path, fmt='xlsx'):
+    """
+    :param rows: category_rollups 生成的行
+    :param output_path: 输出文件
+    :param fmt: 'xlsx' | 'csv' | 'json'
+    :return: 写出的行数
+    """
+    if fmt not in FORMATS:
+        raise ValueError('fmt must be one of {}, got {}'.format(FORMATS, fmt))
+    cnt = 0
+    if fmt == 'xlsx':
+        wb = Workbook(write_only=True)
+        sheet = wb.create_sheet('Category Quantity')
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+            cnt += 1
+        wb.save(output_path)
+        wb.close()
+    elif fmt == 'csv':
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            for row in rows:
+                writer.writerow(row)
+                cnt += 1
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for row in rows:
+                f.write((',\n' if cnt else '\n') + json.dumps(dict(zip(HEADER, row)), ensure_ascii=False))
+                cnt += 1
+            f.write('\n]\n')
+    return cnt
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: CocoExport
+@time: 2020/5/6
+@desc: 由 AnnotationStore 的列数据导出 COCO json 或列式 npz，按块流式写出，不在内存中构造整个字典
+"""
+import os
+import json
+import numpy as np
+
+
+def merged_classes(store, category_map=None):
+    """
+    :info: 对象类别按 merge_category 的合并关系映射后重新编号
+    :return: (类别名称列表, 对象类别 -> 新类别编号的数组)
+    """
+    category_map = category_map or {}
+    names = [category_map.get(name, name) for name in store.classes]
+    classes = sorted(set(names))
+    class_idx = {name: idx for idx, name in enumerate(classes)}
+    return classes, np.array([class_idx[name] for name in names], dtype=np.int64)
+
+
+def _dump_rows(f, rows, first):
+    """
+    :info: 把一块记录写成 json 数组元素，first 表示是否为数组中的第一块
+    """
+    if not rows:
+        return first
+    f.write(('' if first else ',\n') + ',\n'.join(json.dumps(row, ensure_ascii=False) for row in rows))
+    return False
+
+
+def export_coco(store, output_path, img_format='.jpg', category_map=None, chunk=10000):
+    """
+    :info: image id 为 store 中的图片序号+1，category id 为合并后类别名称排序后的序号+1，
+           数据集与合并关系不变时id稳定
+    :param store: AnnotationStore
+    :param output_path: 输出 json 路径
+    :param category_map: {原类别: 合并后的类别}
+    :param chunk: 每次写出的图片数
+    :return: (图片数, 对象数)
+    """
+    classes, class_remap = merged_classes(store, category_map)
+    images = store.images
+    objects = store.objects
+    starts = images['obj_start']
+    num_obj = images['num_obj']
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"info": {"description": %s},\n"categories": [\n' % json.dumps(store.sample_root))
+        _dump_rows(f, [{'id': idx + 1, 'name': name, 'supercategory': 'defect'}
+                       for idx, name in enumerate(classes)], True)
+
+        f.write('],\n"images": [\n')
+        first = True
+        for start in range(0, len(store), chunk):
+            stop = min(start + chunk, len(store))
+            rows = [{'id': image_id + 1,
+                     'file_name': os.path.join(store.category(image_id), store.file_name(image_id) + img_format),
+                     'width': width, 'height': height}
+                    for image_id, width, height in zip(range(start, stop),
+                                                       images['width'][start:stop].tolist(),
+                                                       images['height'][start:stop].tolist())]
+            first = _dump_rows(f, rows, first)
+
+        f.write('],\n"annotations": [\n')
+        first = True
+        for start in range(0, len(store), chunk):
+            stop = min(start + chunk, len(store))
+            obj_start = int(starts[start])
+            obj_stop = int(starts[stop - 1] + num_obj[stop - 1])
+            part = slice(obj_start, obj_stop)
+            xmin = objects['xmin'][part].astype(np.int64)
+            ymin = objects['ymin'][part].astype(np.int64)
+            width = objects['xmax'][part] - xmin + 1
+            height = objects['ymax'][part] - ymin + 1
+            rows = [{'id': obj_id + 1, 'image_id': image_id + 1, 'category_id': class_id + 1,
+                     'bbox': [x, y, w, h], 'area': w * h, 'iscrowd': 0, 'difficult': difficult}
+                    for obj_id, image_id, class_id, x, y, w, h, difficult in zip(
+                        range(obj_start, obj_stop), objects['image_id'][part].tolist(),
+                        class_remap[objects['class_id'][part]].tolist(), xmin.tolist(), ymin.tolist(),
+                        width.tolist(), height.tolist(), objects['difficult'][part].tolist())]
+            first = _dump_rows(f, rows, first)
+        f.write(']}\n')
+    os.replace(tmp_path, output_path)
+    print('[FINISH] Exported {} images and {} objects at path: {}'.format(len(store), store.num_objects, output_path))
+    return len(store), store.num_objects
+
+
+def export_npz(store, output_path, img_format='.jpg', category_map=None):
+    """
+    :info: 列式导出，图片表与对象表各为一组等长数组，id 规则与 export_coco 一致
+    :return: (图片数, 对象数)
+    """
+    category_map = category_map or {}
+    classes, class_remap = merged_classes(store, category_map)
+    image_categories = sorted({category_map.get(category, category) for category in store.categories})
+    image_category_idx = {name: idx for idx, name in enumerate(image_categories)}
+    dir_remap = np.array([image_category_idx[category_map.get(category, category)]
+                          for category in store.categories], dtype=np.int32)
+    file_names = [os.path.join(store.category(image_id), store.file_name(image_id) + img_format)
+                  for image_id in range(len(store))]
+    objects = store.objects
+    np.savez(output_path,
+             classes=np.array(classes, dtype=str),
+             image_categories=np.array(image_categories, dtype=str),
+             img_id=np.arange(1, len(store) + 1, dtype=np.int64),
+             img_file_name=np.array(file_names, dtype=str),
+             img_category_id=dir_remap[store.images['category_id']],
+             img_width=store.images['width'],
+             img_height=store.images['height'],
+             obj_image_id=objects['image_id'].astype(np.int64) + 1,
+             obj_category_id=class_remap[objects['class_id']] + 1,
+             obj_xmin=objects['xmin'], obj_ymin=objects['ymin'],
+             obj_xmax=objects['xmax'], obj_ymax=objects['ymax'],
+             obj_difficult=objects['difficult'])
+    print('[FINISH] Exported {} images and {} objects at path: {}'.format(len(store), store.num_objects, output_path))
+    return len(store), store.num_objects
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: CompactDataset
+@time: 2020/5/15
+@desc: 紧凑的数据集字典：category 编号化，文件名存放在连续的 utf-8 字节数组中，删除只打墓碑标记；
+       合并类别后仍记录每个文件所在的磁盘目录；保持 {category: [file_name]} 的字典/列表用法
+"""
+from collections.abc import MutableMapping
+import numpy as np
+
+
+def _encode(stems):
+    return np.array([stem.encode('utf-8') for stem in stems], dtype='S') if len(stems) else np.zeros(0, dtype='S1')
+
+
+class StemList(object):
+    def __init__(self, stems=(), is_sorted=False):
+        """
+        :info: 文件名存放在定长 'S' 数组中，宽度为该类别最长文件名的字节数，短的文件名会补零；
+               定长才能用 searchsorted/isin 做向量化查找与删除。同一类别的文件名通常长度相近，
+               长度差异很大时占用会高于变长存储
+        :param stems: 文件名列表
+        :param is_sorted: 文件名已经有序，按名称删除时使用二分查找
+        """
+        self._pool = _encode(list(stems))
+        self._alive = np.ones(len(self._pool), dtype=bool)
+        self._size = len(self._pool)
+        self._sorted = is_sorted
+        self._positions = None
+        self._alive_idx = None
+        # append 的文件名先放在列表中，下次读取时一次拼接，避免每次 append 都复制整个 pool
+        self._tail = []
+        # 所在的 CompactDataset 类别编号，即文件所在的磁盘目录；-1 表示未加入 CompactDataset
+        self.home = -1
+        # 合并了其他类别后，每个文件所在目录的类别编号；为 None 时都在 home 中
+        self._origin = None
+
+    @classmethod
+    def from_pool(cls, pool, is_sorted=False):
+        stems = cls()
+        stems._pool = pool
+        stems._alive = np.ones(len(pool), dtype=bool)
+        stems._size = len(pool)
+        stems._sorted = is_sorted
+        return stems
+
+    def _flush(self):
+        if self._tail:
+            tail, self._tail = self._tail, []
+            self.extend(tail)
+
+    def __len__(self):
+        return self._size + len(self._tail)
+
+    def __iter__(self):
+        self._flush()
+        if self._size == len(self._pool):
+            return (stem.decode('utf-8') for stem in self._pool.tolist())
+        return (stem.decode('utf-8') for stem in self._pool[self._alive].tolist())
+
+    def _index(self):
+        """
+        :return: 未删除文件名在 pool 中的位置
+        """
+        self._flush()
+        if self._alive_idx is None:
+            self._alive_idx = np.flatnonzero(self._alive)
+        return self._alive_idx
+
+    def __getitem__(self, item):
+        self._flush()
+        if isinstance(item, slice):
+            return [stem.decode('utf-8') for stem in self._pool[self._index()[item]].tolist()]
+        if self._size == len(self._pool):
+            return self._pool[item].decode('utf-8')
+        return self._pool[self._index()[item]].decode('utf-8')
+
+    def __contains__(self, stem):
+        return self._find(stem) >= 0
+
+    def __eq__(self, other):
+        return self.tolist() == list(other)
+
+    def __repr__(self):
+        return 'StemList({})'.format(self.tolist())
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    @property
+    def nbytes(self):
+        self._flush()
+        return self._pool.nbytes + self._alive.nbytes + (self._origin.nbytes if self._origin is not None else 0)
+
+    def tolist(self):
+        return list(iter(self))
+
+    def _find(self, stem):
+        """
+        :return: 未删除的文件名所在位置，不存在时为 -1
+        """
+        self._flush()
+        key = stem.encode('utf-8')
+        if self._sorted:
+            pos = int(np.searchsorted(self._pool, key))
+            while pos < len(self._pool) and self._pool[pos] == key:
+                if self._alive[pos]:
+                    return pos
+                pos += 1
+            return -1
+        if self._positions is None:
+            self._positions = {}
+            for pos, value in enumerate(self._pool.tolist()):
+                self._positions.setdefault(value, []).append(pos)
+        for pos in self._positions.get(key, ()):
+            if self._alive[pos]:
+                return pos
+        return -1
+
+    def discard_at(self, pos):
+        if self._alive[pos]:
+            self._alive[pos] = False
+            self._alive_idx = None
+            self._size -= 1
+            if self._size * 2 < len(self._pool) and len(self._pool) > 1024:
+                self.compact()
+
+    def remove(self, stem):
+        pos = self._find(stem)
+        if pos < 0:
+            raise ValueError('{} is not in list'.format(stem))
+        self.discard_at(pos)
+
+    def discard_many(self, stems, origins=None):
+        """
+        :info: 批量删除，一次向量化比较
+        :param origins: 只删除位于这些磁盘目录(类别编号)中的文件，默认不限
+        :return: 删除的数量
+        """
+        self._flush()
+        mask = self._alive & np.isin(self._pool, _encode(list(stems)))
+        if origins is not None:
+            mask &= np.isin(self.origins(), list(origins))
+        self._alive &= ~mask
+        self._alive_idx = None
+        removed = int(mask.sum())
+        self._size -= removed
+        if self._size * 2 < len(self._pool) and len(self._pool) > 1024:
+            self.compact()
+        return removed
+
+    def append(self, stem):
+        self._tail.append(stem)
+
+    def origins(self):
+        """
+        :return: pool 中每个位置所在磁盘目录的类别编号
+        """
+        self._flush()
+        if self._origin is None:
+            return np.full(len(self._pool), self.home, dtype=np.int32)
+        return self._origin
+
+    def extend(self, stems):
+        self._flush()
+        origin = None
+        if isinstance(stems, StemList):
+            stems._flush()
+            pool = stems._pool[stems._alive]
+            if stems._origin is not None or (stems.home >= 0 and stems.home != self.home):
+                origin = stems.origins()[stems._alive]
+                origin = np.where(origin < 0, self.home, origin).astype(np.int32)
+        else:
+            pool = _encode(list(stems))
+        if len(pool) == 0:
+            return
+        self.compact()
+        if origin is not None or self._origin is not None:
+            if origin is None:
+                origin = np.full(len(pool), self.home, dtype=np.int32)
+            self._origin = np.concatenate((self.origins(), origin))
+        self._pool = np.concatenate((self._pool, pool)) if len(self._pool) else pool
+        self._alive = np.ones(len(self._pool), dtype=bool)
+        self._size = len(self._pool)
+        self._sorted = False
+        self._positions = None
+        self._alive_idx = None
+
+    def compact(self):
+        """
+        :info: 清除墓碑，释放已删除文件名占用的空间
+        """
+        if self._size == len(self._pool):
+            return
+        self._pool = self._pool[self._alive]
+        if self._origin is not None:
+            self._origin = self._origin[self._alive]
+        self._alive = np.ones(len(self._pool), dtype=bool)
+        self._positions = None
+        self._alive_idx = None
+
+    def by_origin(self):
+        """
+        :info: 按文件所在的磁盘目录拆分
+        :return: {类别编号: StemList}，没有合并过其他类别时只有 home 一项且为自身
+        """
+        self._flush()
+        if self._origin is None:
+            return {self.home: self}
+        result = {}
+        origin = self._origin[self._alive]
+        pool = self._pool[self._alive]
+        for code in np.unique(origin).tolist():
+            stems = StemList.from_pool(pool[origin == code])
+            stems.home = code
+            result[code] = stems
+        return result
+
+
+class CompactDataset(MutableMapping):
+    def __init__(self, dataset=None):
+        """
+        :param dataset: {category: [file_name]}
+        """
+        # 编号 -> category，删除后编号不复用
+        self.categories = []
+        self._ids = {}
+        self._lists = []
+        for category, name_lst in (dataset or {}).items():
+            self[category] = name_lst
+
+    @classmethod
+    def from_index(cls, index, keep_empty=True):
+        """
+        :info: 由 DatasetIndex 直接生成，规则与 DatasetIndex.to_dict 一致
+        """
+        dataset = cls()
+        for category in sorted(index.entries):
+            entry = index.entries[category]
+            if entry['files'] == 0:
+                continue
+            if entry['stems'] or keep_empty:
+                dataset[category] = StemList.from_pool(_encode(entry['stems']), is_sorted=True)
+        return dataset
+
+    def category_id(self, category):
+        return self._ids[category]
+
+    def __getitem__(self, category):
+        return self._lists[self._ids[category]]
+
+    def __setitem__(self, category, name_lst):
+        if not isinstance(name_lst, StemList):
+            name_lst = StemList(name_lst)
+        category_id = self._ids.get(category)
+        if category_id is None:
+            category_id = self._ids[category] = len(self.categories)
+            self.categories.append(category)
+            self._lists.append(name_lst)
+        else:
+            self._lists[category_id] = name_lst
+        if name_lst.home < 0:
+            name_lst.home = category_id
+            if name_lst._origin is not None:
+                name_lst._origin[name_lst._origin < 0] = category_id
+
+    def __delitem__(self, category):
+        self._lists[self._ids.pop(category)] = None
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def nbytes(self):
+        return sum(name_lst.nbytes for name_lst in self._lists if name_lst is not None)
+
+    def to_dict(self):
+        return {category: self[category].tolist() for category in self}
+
+    def source_ids(self, source):
+        """
+        :return: 名称为 source 的磁盘目录曾经使用过的类别编号
+        """
+        return [category_id for category_id, category in enumerate(self.categories) if category == source]
+
+    def discard(self, category, source, stems):
+        """
+        :info: 从 category 中删除位于磁盘目录 source 下的文件，合并后其他目录中的同名文件不受影响
+        :return: 删除的数量
+        """
+        return self[category].discard_many(stems, self.source_ids(source))
+
+    def physical(self):
+        """
+        :info: 按磁盘目录还原合并前的数据集字典，没有合并过的类别直接返回原列表
+        :return: {目录category: StemList}
+        """
+        dataset = {}
+        for category in self:
+            for code, name_lst in self[category].by_origin().items():
+                source = self.categories[code]
+                if source in dataset:
+                    name_lst = StemList(dataset[source].tolist() + name_lst.tolist())
+                dataset[source] = name_lst
+        return dataset
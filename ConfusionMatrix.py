@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: ConfusionMatrix
+@time: 2020/4/20
+@desc: 直接从 [fold]/<gt>/<pred>/xxx.jpg 的目录索引计算混淆矩阵，不拷贝任何文件
+"""
+import os
+import csv
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from DatasetIndex import DatasetIndex
+
+
+class ConfusionMatrix(object):
+    def __init__(self, classes):
+        """
+        :param classes: 类别列表，矩阵的行为真实类别(gt)，列为预测类别(pred)
+        """
+        self.classes = list(classes)
+        self.matrix = np.zeros((len(self.classes), len(self.classes)), dtype=np.int64)
+        # (gt, pred) -> 相对结果目录的图片路径，只记录预测错误的格子
+        self.files = {}
+
+    @staticmethod
+    def from_dataset(dataset, img_format='.jpg', classes=None):
+        """
+        :info: 由 {category: [file_name]} 计算混淆矩阵，category 的最后两级为 gt/pred
+        :param classes: 类别列表，默认为出现过的所有类别
+        """
+        cells = []
+        for category, name_lst in dataset.items():
+            parts = category.split(os.sep)
+            if len(parts) < 2:
+                print('[SKIP] {} is not a <gt>/<pred> directory.'.format(category))
+                continue
+            cells.append((parts[-2], parts[-1], category, name_lst))
+        if classes is None:
+            classes = sorted({gt for gt, _, _, _ in cells} | {pred for _, pred, _, _ in cells})
+        result = ConfusionMatrix(classes)
+        class_idx = {name: idx for idx, name in enumerate(result.classes)}
+        cells = [cell for cell in cells if cell[0] in class_idx and cell[1] in class_idx]
+        if not cells:
+            return result
+        gt_ids = np.array([class_idx[gt] for gt, _, _, _ in cells], dtype=np.int64)
+        pred_ids = np.array([class_idx[pred] for _, pred, _, _ in cells], dtype=np.int64)
+        counts = np.array([len(name_lst) for _, _, _, name_lst in cells], dtype=np.int64)
+        np.add.at(result.matrix, (gt_ids, pred_ids), counts)
+        for gt, pred, category, name_lst in cells:
+            if gt != pred and name_lst:
+                result.files.setdefault((gt, pred), []).extend(
+                    os.path.join(category, file_name + img_format) for file_name in name_lst)
+        return result
+
+    def merge(self, other):
+        """
+        :info: 合并另一个混淆矩阵，类别取并集
+        """
+        classes = self.classes + [name for name in other.classes if name not in set(self.classes)]
+        if len(classes) != len(self.classes):
+            matrix = np.zeros((len(classes), len(classes)), dtype=np.int64)
+            matrix[:len(self.classes), :len(self.classes)] = self.matrix
+            self.classes, self.matrix = classes, matrix
+        class_idx = {name: idx for idx, name in enumerate(self.classes)}
+        idx = np.array([class_idx[name] for name in other.classes], dtype=np.int64)
+        self.matrix[np.ix_(idx, idx)] += other.matrix
+        for cell, file_lst in other.files.items():
+            self.files.setdefault(cell, []).extend(file_lst)
+        return self
+
+    @property
+    def total(self):
+        return int(self.matrix.sum())
+
+    @property
+    def accuracy(self):
+        return float(np.trace(self.matrix)) / self.total if self.total else 0.
+
+    @property
+    def precision(self):
+        """
+        :info: 每个类别的精确率 TP / 预测为该类别的数量，没有预测时为0
+        """
+        pred_sum = self.matrix.sum(axis=0)
+        return np.divide(np.diag(self.matrix), pred_sum, out=np.zeros(len(self.classes)), where=pred_sum > 0)
+
+    @property
+    def recall(self):
+        """
+        :info: 每个类别的召回率 TP / 该类别的真实数量，没有样本时为0
+        """
+        gt_sum = self.matrix.sum(axis=1)
+        return np.divide(np.diag(self.matrix), gt_sum, out=np.zeros(len(self.classes)), where=gt_sum > 0)
+
+    def to_dict(self):
+        """
+        :info: 转为可以直接 json.dump 的字典
+        """
+        return {'classes': self.classes,
+                'matrix': self.matrix.tolist(),
+                'accuracy': self.accuracy,
+                'precision': dict(zip(self.classes, self.precision.tolist())),
+                'recall': dict(zip(self.classes, self.recall.tolist()))}
+
+    def save(self, output_dir, name):
+        """
+        :info: 输出 name_confusion.csv(混淆矩阵), name_precision_recall.csv, name_incorrect_files.json
+        :return: 输出文件路径列表
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        matrix_path = os.path.join(output_dir, name + '_confusion.csv')
+        with open(matrix_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['gt\\pred'] + self.classes)
+            for class_name, row in zip(self.classes, self.matrix.tolist()):
+                writer.writerow([class_name] + row)
+
+        metric_path = os.path.join(output_dir, name + '_precision_recall.csv')
+        gt_sum = self.matrix.sum(axis=1)
+        pred_sum = self.matrix.sum(axis=0)
+        with open(metric_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['class', 'gt', 'pred', 'correct', 'precision', 'recall'])
+            for idx, class_name in enumerate(self.classes):
+                writer.writerow([class_name, int(gt_sum[idx]), int(pred_sum[idx]), int(self.matrix[idx, idx]),
+                                 round(float(self.precision[idx]), 4), round(float(self.recall[idx]), 4)])
+
+        files_path = os.path.join(output_dir, name + '_incorrect_files.json')
+        with open(files_path, 'w', encoding='utf-8') as f:
+            json.dump([{'gt': gt, 'pred': pred, 'files': file_lst}
+                       for (gt, pred), file_lst in sorted(self.files.items())], f, ensure_ascii=False, indent=1)
+        print('[FINISH] The result has been saved at path: {}'.format(output_dir))
+        return [matrix_path, metric_path, files_path]
+
+
+def confusion_of_root(result_root, img_format='.jpg', classes=None):
+    """
+    :info: 扫描一个结果目录并计算混淆矩阵，文件路径相对于 result_root 的上一级目录
+    """
+    return _confusion_of_index(DatasetIndex(result_root, img_format, img_only=True).build(), img_format, classes)
+
+
+def _confusion_of_index(index, img_format='.jpg', classes=None):
+    result_root = index.sample_root
+    dataset = index.to_dict(keep_empty=False)
+    prefix = os.path.basename(os.path.normpath(result_root))
+    # 加前缀之前先去掉不是 <gt>/<pred> 的目录，否则前缀会被当作 gt
+    for category in [category for category in dataset if len(category.split(os.sep)) < 2]:
+        print('[SKIP] {} is not a <gt>/<pred> directory.'.format(category))
+        del dataset[category]
+    return ConfusionMatrix.from_dataset({os.path.join(prefix, category): name_lst
+                                         for category, name_lst in dataset.items()}, img_format, classes)
+
+
+def confusion_of_roots(result_roots, img_format='.jpg', classes=None, workers=4):
+    """
+    :info: 多个 fold 结果目录用线程并行扫描(scandir 不占用 GIL)，计数在主线程中完成，合并为一个混淆矩阵
+    :param workers: 扫描目录的线程数
+    :return: (合并后的 ConfusionMatrix, {result_root: ConfusionMatrix})
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        indexes = list(pool.map(lambda root: DatasetIndex(root, img_format, img_only=True).build(), result_roots))
+    parts = [_confusion_of_index(index, img_format, classes) for index in indexes]
+    total = ConfusionMatrix(classes or [])
+    for part in parts:
+        total.merge(part)
+    return total, dict(zip(result_roots, parts))
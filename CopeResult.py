@@ -10,41 +10,34 @@ author: liusili
 @desc: 
 """
 import os
-import shutil
 from tqdm import tqdm
-from time import sleep
+from DatasetIndex import DatasetIndex
+from CompactDataset import CompactDataset
+from FileTransfer import TransferExecutor
+from ConfusionMatrix import ConfusionMatrix
+from Instrument import Instrumentation, instrumented
 
 
 class CopeResult(object):
-    def __init__(self, sample_root, img_format='.jpg'):
+    def __init__(self, sample_root, img_format='.jpg', instrument=None):
         """
         :param sample_root: 结果目录
         :param img_format: 结果图片格式，默认.jpg
+        :param instrument: Instrumentation，记录各方法分阶段的耗时、文件数与字节数
         """
         self.sample_root = sample_root
         self.img_format = img_format
-        self.dataset = self.__file_to_dict()
+        self.instrument = instrument or Instrumentation()
+        self.folds = {}
+        with self.instrument.method(type(self).__name__, '__init__'):
+            self.dataset = self.__file_to_dict()
 
     def __file_to_dict(self):
-        dataset = {}
-        cnt = 0
-        for root, _, file_lst in os.walk(self.sample_root):
-            if len(file_lst) > 0:
-                category = root.split(self.sample_root + '\\')[-1]
-                dataset[category] = []
-                for file in file_lst:
-                    file_name = os.path.splitext(file)[0]
-                    image_path = os.path.join(root, file_name + self.img_format)
-                    if file_name not in dataset[category] \
-                            and os.path.isfile(image_path):
-                        dataset[category].append(file_name)
-                        cnt += 1
-        for category, file_lst in list(dataset.items()):
-            if len(file_lst) == 0: 
-                del dataset[category]
-                
-        print('The quantity of all valid images is {}'.format(cnt))
-        return dataset
+        with self.instrument.phase('scan') as phase:
+            index = DatasetIndex(self.sample_root, self.img_format, img_only=True).build()
+            phase.add(files=index.num_valid)
+        index.summary()
+        return CompactDataset.from_index(index, keep_empty=False)
 
     def filter_correct(self):
         """
@@ -53,52 +46,99 @@ class CopeResult(object):
         """
         cnt = 0
         for category, file_list in list(self.dataset.items()):
-            if category.split('\\')[-1] == category.split('\\')[-2]:
+            parts = category.split(os.sep)
+            if len(parts) < 2:
+                print('[SKIP] {} is not a <gt>/<pred> directory.'.format(category))
+                del self.dataset[category]
+            elif parts[-1] == parts[-2]:
                 del self.dataset[category]
             else:
                 cnt += len(file_list)
         print('The quantity of incorrect prediction is {}'.format(cnt))
 
-    def merge_incorrect_data(self):
+    @instrumented
+    def confusion_matrix(self, classes=None, output_dir=None):
+        """
+        :info: 由目录索引直接计算混淆矩阵，不拷贝文件；存在多个 fold 目录时按 fold 分别计算后合并
+        :param classes: 类别列表，默认为出现过的所有类别
+        :param output_dir: 不为 None 时输出混淆矩阵、精确率/召回率以及预测错误的文件列表
+        :return: ConfusionMatrix，每个 fold 的结果保存在 self.folds
+        """
+        folds = {}
+        for category, file_list in self.dataset.items():
+            fold = os.path.dirname(os.path.dirname(category))
+            folds.setdefault(fold, {})[category] = file_list
+        fold_names = sorted(folds)
+        parts = [ConfusionMatrix.from_dataset(folds[fold], self.img_format, classes) for fold in fold_names]
+        self.folds = dict(zip(fold_names, parts))
+        result = ConfusionMatrix(classes or [])
+        for part in parts:
+            result.merge(part)
+        print('The accuracy of {} predictions is {:.4f}'.format(result.total, result.accuracy))
+        if output_dir is not None:
+            result.save(output_dir, os.path.basename(os.path.normpath(self.sample_root)))
+        return result
+
+    @instrumented
+    def merge_incorrect_data(self, threads=8, queue_depth=64, mode='copy'):
+        """
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
+        """
         self.filter_correct()
         new_path = self.sample_root + '_incorrect'
         print('---Start merging incorrect data---')
-        sleep(0.5)
-        pbar = tqdm(self.dataset.items())
-        for category, file_list in pbar:
-            predict_cat = category.split('\\')[-1]
-            ori_cat = category.split('\\')[-2]
-            new_category_path = os.path.join(new_path, ori_cat, predict_cat)
-            os.makedirs(new_category_path, exist_ok=True)
-            for file_name in file_list:
-                img_path = os.path.join(self.sample_root, category, file_name + self.img_format)
-                new_img_path = os.path.join(new_category_path, file_name + self.img_format)
-                shutil.copy(img_path, new_img_path)
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(0.5)
+        with TransferExecutor(threads, queue_depth, 'merge', mode, self.instrument) as transfer:
+            pbar = tqdm(self.dataset.items())
+            for category, file_list in pbar:
+                parts = category.split(os.sep)
+                if len(parts) < 2:
+                    print('[SKIP] {} is not a <gt>/<pred> directory.'.format(category))
+                    continue
+                predict_cat, ori_cat = parts[-1], parts[-2]
+                new_category_path = os.path.join(new_path, ori_cat, predict_cat)
+                os.makedirs(new_category_path, exist_ok=True)
+                for file_name in file_list:
+                    img_path = os.path.join(self.sample_root, category, file_name + self.img_format)
+                    new_img_path = os.path.join(new_category_path, file_name + self.img_format)
+                    transfer.submit(img_path, new_img_path)
+                pbar.set_description('Processing category:{}'.format(category))
         print('---End merging incorrect data---')
+        return transfer
 
-    def reconstruct_result(self):
+    @instrumented
+    def reconstruct_result(self, threads=8, queue_depth=64, mode='copy'):
+        """
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
+        """
         correct_path = self.sample_root + '_correct'
         incorrect_path = self.sample_root + '_incorrect'
         print('---Start reconstructing results---')
-        sleep(0.5)
-        pbar = tqdm(self.dataset.items())
-        for category, file_list in pbar:
-            predict_cat = category.split('\\')[-1]
-            ori_cat = category.split('\\')[-2]
-            if predict_cat == ori_cat:
-                new_category_path = os.path.join(correct_path, predict_cat)
-            else:
-                new_category_path = os.path.join(incorrect_path, ori_cat, predict_cat)
-            os.makedirs(new_category_path, exist_ok=True)
-            for file_name in file_list:
-                img_path = os.path.join(self.sample_root, category, file_name + self.img_format)
-                new_img_path = os.path.join(new_category_path, file_name + self.img_format)
-                shutil.copy(img_path, new_img_path)
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(0.5)
+        with TransferExecutor(threads, queue_depth, 'reconstruct', mode, self.instrument) as transfer:
+            pbar = tqdm(self.dataset.items())
+            for category, file_list in pbar:
+                parts = category.split(os.sep)
+                if len(parts) < 2:
+                    print('[SKIP] {} is not a <gt>/<pred> directory.'.format(category))
+                    continue
+                predict_cat, ori_cat = parts[-1], parts[-2]
+                if predict_cat == ori_cat:
+                    new_category_path = os.path.join(correct_path, predict_cat)
+                else:
+                    new_category_path = os.path.join(incorrect_path, ori_cat, predict_cat)
+                os.makedirs(new_category_path, exist_ok=True)
+                for file_name in file_list:
+                    img_path = os.path.join(self.sample_root, category, file_name + self.img_format)
+                    new_img_path = os.path.join(new_category_path, file_name + self.img_format)
+                    transfer.submit(img_path, new_img_path)
+                pbar.set_description('Processing category:{}'.format(category))
         print('---End reconstructing results---')
+        return transfer
 
 
 if __name__ == '__main__':
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetIndex
+@time: 2020/3/20
+@desc: 数据集目录索引，一次 os.scandir 完成图片与标签的配对
+"""
+import os
+import pickle
+
+INDEX_VERSION = 3
+
+
+def get_cache_dir(sample_root):
+    """
+    :info: 数据集缓存目录，与数据集同级，例如 xxx -> xxx_cache
+    """
+    return sample_root.rstrip('\\').rstrip('/') + '_cache'
+
+
+def scan_directory(dir_path, img_format='.jpg', img_only=False):
+    """
+    :info: 对单个目录做一次 scandir，按文件名(stem)哈希分组配对图片与xml；
+           扩展名按 os.path.normcase 比较：Windows 下不区分大小写，Linux 下区分大小写，
+           保证 file_name + img_format 拼出的路径一定能打开
+    :param dir_path: 目录路径
+    :param img_format: 图片格式
+    :param img_only: 数据只包含图片
+    :return: 目录条目字典 {mtime, stems, orphan_img, orphan_xml, dirs, files}
+    """
+    # 先取mtime再扫描，扫描过程中发生的修改会在下次刷新时被发现
+    mtime = os.stat(dir_path).st_mtime_ns
+    images = set()
+    xmls = set()
+    sub_dirs = []
+    files = 0
+    img_format = os.path.normcase(img_format)
+    xml_format = os.path.normcase('.xml')
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(entry.name)
+                continue
+            files += 1
+            stem, ext = os.path.splitext(entry.name)
+            ext = os.path.normcase(ext)
+            if ext == img_format:
+                images.add(stem)
+            elif ext == xml_format:
+                xmls.add(stem)
+
+    if img_only:
+        stems = images
+        orphan_img = []
+    else:
+        stems = images & xmls
+        orphan_img = sorted(images - xmls)
+    orphan_xml = sorted(xmls - images)
+    return {'mtime': mtime,
+            'stems': sorted(stems),
+            'orphan_img': orphan_img,
+            'orphan_xml': orphan_xml,
+            'dirs': sorted(sub_dirs),
+            'files': files}
+
+
+class DatasetIndex(object):
+    def __init__(self, sample_root, img_format='.jpg', img_only=False):
+        """
+        :param sample_root: 数据集根目录
+        :param img_format: 数据图片格式，默认.jpg
+        :param img_only: 数据只包含图片 默认False
+        """
+        self.sample_root = sample_root
+        self.img_format = img_format
+        self.img_only = img_only
+        # 相对目录 -> scan_directory 的结果
+        self.entries = {}
+        self.rescanned = 0
+        self.index_path = os.path.join(get_cache_dir(sample_root), 'index.pkl')
+
+    def build(self):
+        """
+        :info: 自顶向下全量扫描，每个目录只做一次 scandir
+        """
+        self.entries = {}
+        return self.refresh()
+
+    def refresh(self, dirty=()):
+        """
+        :info: 增量刷新，只重新扫描mtime发生变化的目录，其余目录沿用已有结果
+        :param dirty: 无论mtime是否变化都重新扫描的目录，例如 inotify 报告有变化的目录
+        """
+        self.entries, self.rescanned = self.scan(dirty)
+        return self
+
+    def scan(self, dirty=()):
+        """
+        :info: 与 refresh 相同的增量扫描，但不修改 self.entries，便于在锁外扫描后再替换
+        :return: (新的 entries, 重新扫描的目录数)
+        """
+        cached = self.entries
+        entries = {}
+        rescanned = 0
+        stack = [os.curdir]
+        while stack:
+            rel_dir = stack.pop()
+            dir_path = self.abspath(rel_dir)
+            entry = cached.get(rel_dir)
+            if entry is None or rel_dir in dirty or os.stat(dir_path).st_mtime_ns != entry['mtime']:
+                entry = scan_directory(dir_path, self.img_format, self.img_only)
+                rescanned += 1
+            entries[rel_dir] = entry
+            stack.extend(self.join(rel_dir, d) for d in reversed(entry['dirs']))
+        return entries, rescanned
+
+    def scan_dirty(self, dirty):
+        """
+        :info: 只重新扫描 dirty 中的目录，不遍历整个目录树；新出现的子目录整棵扫描，消失的子目录整棵删除
+        :param dirty: 已知发生变化的相对目录，例如 inotify 报告的目录
+        :return: (新的 entries, 重新扫描的目录数)
+        """
+        entries = dict(self.entries)
+        rescanned = 0
+        stack = [rel_dir for rel_dir in dirty if rel_dir in entries]
+        while stack:
+            rel_dir = stack.pop()
+            old = entries.get(rel_dir)
+            try:
+                entry = scan_directory(self.abspath(rel_dir), self.img_format, self.img_only)
+            except FileNotFoundError:
+                # 目录已被删除，由上级目录的变化负责清理
+                continue
+            rescanned += 1
+            entries[rel_dir] = entry
+            for name in entry['dirs']:
+                sub_dir = self.join(rel_dir, name)
+                if sub_dir not in entries:
+                    stack.append(sub_dir)
+            for name in set(old['dirs'] if old else ()) - set(entry['dirs']):
+                sub_dir = self.join(rel_dir, name)
+                prefix = os.path.join(sub_dir, '')
+                for key in [key for key in entries if key == sub_dir or key.startswith(prefix)]:
+                    del entries[key]
+        return entries, rescanned
+
+    def load(self):
+        """
+        :info: 读取持久化索引，格式或参数不一致时视为冷缓存
+        :return: 是否成功读取
+        """
+        try:
+            with open(self.index_path, 'rb') as f:
+                header, entries = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False
+        if header != self._header():
+            return False
+        self.entries = entries
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((self._header(), self.entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, rebuild=False):
+        """
+        :info: 读取持久化索引并增量刷新，冷缓存或 rebuild=True 时全量扫描，结束后写回磁盘
+        :param rebuild: 强制全量重建
+        """
+        if rebuild or not self.load():
+            self.build()
+        else:
+            self.refresh()
+        if self.rescanned > 0:
+            self.save()
+        return self
+
+    def _header(self):
+        return INDEX_VERSION, self.img_format, self.img_only
+
+    def abspath(self, rel_dir):
+        if rel_dir == os.curdir:
+            return self.sample_root
+        return os.path.join(self.sample_root, rel_dir)
+
+    @staticmethod
+    def join(rel_dir, name):
+        if rel_dir == os.curdir:
+            return name
+        return os.path.join(rel_dir, name)
+
+    @property
+    def num_valid(self):
+        return sum(len(entry['stems']) for entry in self.entries.values())
+
+    @property
+    def num_orphan_img(self):
+        return sum(len(entry['orphan_img']) for entry in self.entries.values())
+
+    @property
+    def num_orphan_xml(self):
+        return sum(len(entry['orphan_xml']) for entry in self.entries.values())
+
+    def orphans(self):
+        """
+        :info: 返回每个目录下缺少配对文件的图片与xml
+        :return: {category: (orphan_img, orphan_xml)}
+        """
+        return {category: (entry['orphan_img'], entry['orphan_xml'])
+                for category, entry in self.entries.items()
+                if entry['orphan_img'] or entry['orphan_xml']}
+
+    def to_dict(self, keep_empty=True):
+        """
+        :info: 生成 {category: [file_name]} 形式的数据集字典
+        :param keep_empty: 是否保留没有有效数据但包含文件的目录
+        """
+        dataset = {}
+        for category in sorted(self.entries):
+            entry = self.entries[category]
+            if entry['files'] == 0:
+                continue
+            if entry['stems'] or keep_empty:
+                dataset[category] = list(entry['stems'])
+        return dataset
+
+    def summary(self):
+        print('The quantity of all valid images is {}'.format(self.num_valid))
+        print('Rescanned {} of {} directories.'.format(self.rescanned, len(self.entries)))
+        if self.num_orphan_img or self.num_orphan_xml:
+            print('Orphan images without xml: {}, orphan xml without image: {}'
+                  .format(self.num_orphan_img, self.num_orphan_xml))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetJoin
+@time: 2020/4/22
+@desc: 两个数据集按 (category, file_name) 做哈希连接，代替逐个文件的列表查找与 stat
+"""
+
+
+class JoinResult(object):
+    def __init__(self):
+        # [(source_category, target_category, file_name)]
+        self.matched = []
+        # 目标中有而源中没有的 {(target_category, file_name)}
+        self.source_missing = set()
+        # 源中有而目标中没有的 {(source_category, file_name)}
+        self.target_missing = set()
+
+    def matched_by_source(self):
+        """
+        :info: 按源类别分组 {source_category: [(target_category, file_name)]}
+        """
+        groups = {}
+        for source_category, target_category, file_name in self.matched:
+            groups.setdefault(source_category, []).append((target_category, file_name))
+        return groups
+
+    def summary(self):
+        print('Matched: {}, missing in source: {}, missing in target: {}'.format(
+            len(self.matched), len(self.source_missing), len(self.target_missing)))
+
+
+def join_datasets(source, target, source_key=None):
+    """
+    :info: 两边各建一次哈希表后连接
+    :param source: 源数据集 {category: [file_name]}
+    :param target: 目标数据集 {category: [file_name]}
+    :param source_key: 把源类别映射为目标类别的函数，默认两边类别相同
+    :return: JoinResult
+    """
+    target_keys = set()
+    for category, name_lst in target.items():
+        target_keys.update((category, file_name) for file_name in name_lst)
+
+    result = JoinResult()
+    found = set()
+    for category, name_lst in source.items():
+        key_category = category if source_key is None else source_key(category)
+        for file_name in name_lst:
+            key = (key_category, file_name)
+            if key in target_keys:
+                result.matched.append((category, key_category, file_name))
+                found.add(key)
+            else:
+                result.target_missing.add((category, file_name))
+    result.source_missing = target_keys - found
+    return result
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetQuery
+@time: 2020/5/13
+@desc: 在 AnnotationStore 的列数据上建立排序索引，按类别、对象数、面积、difficult、图片大小筛选图片，
+       结果可以直接交给拷贝/移动/采样方法
+       data.query().objects(cls='A2WBD', max_area=400) & data.query().num_objects(min_num=4)
+"""
+import numpy as np
+
+
+class Selection(object):
+    def __init__(self, store, image_ids):
+        """
+        :param store: AnnotationStore
+        :param image_ids: 有序且不重复的图片id
+        """
+        self.store = store
+        self.image_ids = np.asarray(image_ids, dtype=np.int64)
+        # 图片id只在 store 的同一版本内有效，store 重新同步后行号可能指向其他文件
+        self.version = store.version
+
+    def _check(self, other=None):
+        for selection in (self, other):
+            if selection is not None and selection.version != self.store.version:
+                raise ValueError('The selection is out of date, the annotations have been refreshed '
+                                 'since it was made. Please query again.')
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    def __and__(self, other):
+        self._check(other)
+        return Selection(self.store, np.intersect1d(self.image_ids, other.image_ids, assume_unique=True))
+
+    def __or__(self, other):
+        self._check(other)
+        return Selection(self.store, np.union1d(self.image_ids, other.image_ids))
+
+    def __sub__(self, other):
+        self._check(other)
+        return Selection(self.store, np.setdiff1d(self.image_ids, other.image_ids, assume_unique=True))
+
+    def __invert__(self):
+        self._check()
+        return Selection(self.store, np.setdiff1d(np.arange(len(self.store)), self.image_ids, assume_unique=True))
+
+    def to_dataset(self):
+        """
+        :return: {category: [file_name]}，可以代替 self.dataset 传给拷贝/移动/采样方法
+        """
+        self._check()
+        dataset = {}
+        store = self.store
+        for image_id in self.image_ids.tolist():
+            dataset.setdefault(store.category(image_id), []).append(store.file_name(image_id))
+        return dataset
+
+
+class AnnotationQuery(object):
+    def __init__(self, store):
+        """
+        :param store: 已与数据集同步的 AnnotationStore
+        """
+        self.store = store
+        self._sorted = {}
+        self._area = None
+
+    def _sort(self, name, values):
+        """
+        :info: 缓存某一列的排序结果 (order, 排序后的值)
+        """
+        if name not in self._sorted:
+            order = np.argsort(values, kind='stable')
+            self._sorted[name] = (order, values[order])
+        return self._sorted[name]
+
+    def _range(self, name, values, low=None, high=None):
+        """
+        :info: 二分查找取得 low <= value <= high 的行号，结果有序
+        """
+        order, sorted_values = self._sort(name, values)
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side='right')
+        return np.sort(order[start:stop])
+
+    def _images(self, image_ids):
+        return Selection(self.store, np.unique(image_ids))
+
+    @property
+    def area(self):
+        if self._area is None:
+            objects = self.store.objects
+            self._area = ((objects['xmax'].astype(np.int64) - objects['xmin'] + 1) *
+                          (objects['ymax'].astype(np.int64) - objects['ymin'] + 1))
+        return self._area
+
+    def all(self):
+        return Selection(self.store, np.arange(len(self.store)))
+
+    def category(self, *categories):
+        """
+        :info: 位于指定目录类别中的图片
+        """
+        ids = [self.store.categories.index(category) for category in categories if category in self.store.categories]
+        values = self.store.images['category_id']
+        return Selection(self.store, np.sort(np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [self._range('category_id', values, i, i) for i in ids])))
+
+    def num_objects(self, min_num=None, max_num=None):
+        """
+        :info: 对象数在 [min_num, max_num] 之间的图片
+        """
+        return Selection(self.store, self._range('num_obj', self.store.images['num_obj'], min_num, max_num))
+
+    def image_size(self, min_width=None, max_width=None, min_height=None, max_height=None):
+        """
+        :info: 图片宽高(xml中的size)在给定范围内的图片
+        """
+        images = self.store.images
+        width = self._range('width', images['width'], min_width, max_width)
+        height = self._range('height', images['height'], min_height, max_height)
+        return Selection(self.store, np.intersect1d(width, height, assume_unique=True))
+
+    def objects(self, cls=None, min_area=None, max_area=None, difficult=None):
+        """
+        :info: 至少有一个对象同时满足所有条件的图片
+        :param cls: 对象标签名称或名称列表
+        :param min_area: 最小面积(像素)
+        :param max_area: 最大面积(像素)
+        :param difficult: 0 或 1
+        """
+        objects = self.store.objects
+        obj_ids = None
+        if cls is not None:
+            names = [cls] if isinstance(cls, str) else list(cls)
+            class_ids = [self.store.classes.index(name) for name in names if name in self.store.classes]
+            obj_ids = np.sort(np.concatenate([np.zeros(0, dtype=np.int64)] + [
+                self._range('class_id', objects['class_id'], i, i) for i in class_ids]))
+        if min_area is not None or max_area is not None:
+            ids = self._range('area', self.area, min_area, max_area)
+            obj_ids = ids if obj_ids is None else np.intersect1d(obj_ids, ids, assume_unique=True)
+        if difficult is not None:
+            ids = self._range('difficult', objects['difficult'], difficult, difficult)
+            obj_ids = ids if obj_ids is None else np.intersect1d(obj_ids, ids, assume_unique=True)
+        if obj_ids is None:
+            return self.num_objects(min_num=1)
+        return self._images(objects['image_id'][obj_ids])
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetSplit
+@time: 2020/4/27
+@desc: 按类别分层、可复现的 train/val/test 以及 k-fold 划分，结果写成清单文件而不拷贝图片
+"""
+import os
+import json
+import numpy as np
+
+
+class DatasetSplit(object):
+    def __init__(self, dataset, names, seed, category_map=None):
+        """
+        :param dataset: {category: [file_name]}，category 为磁盘上的目录
+        :param names: 划分名称，例如 ('train', 'val', 'test') 或 ('fold0', 'fold1', ...)
+        :param seed: 随机种子
+        :param category_map: merge_category 的合并关系 {目录: 合并后的类别}，按合并后的类别分层，
+                             清单路径与 subset 仍使用文件所在的目录
+        """
+        category_map = category_map or {}
+        groups = {}
+        for source in dataset:
+            groups.setdefault(category_map.get(source, source), []).append(source)
+        self.categories = sorted(groups)
+        self.names = list(names)
+        self.seed = seed
+        self.sources = []
+        self.file_names = []
+        source_ids = []
+        counts = []
+        for category in self.categories:
+            count = 0
+            for source in sorted(groups[category]):
+                name_lst = list(dataset[source])
+                source_ids.append(np.full(len(name_lst), len(self.sources), dtype=np.int32))
+                self.sources.append(source)
+                self.file_names.extend(name_lst)
+                count += len(name_lst)
+            counts.append(count)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.category_id = np.repeat(np.arange(len(self.categories), dtype=np.int32), self.counts)
+        # 每张图所在的磁盘目录编号
+        self.source_id = np.concatenate([np.zeros(0, dtype=np.int32)] + source_ids)
+        # 每张图所属划分的编号，-1 表示超过配额未被使用
+        self.assign = np.full(len(self.file_names), -1, dtype=np.int16)
+
+    def permute(self):
+        """
+        :info: 每个类别内部的随机排名 0..n-1
+        """
+        rng = np.random.default_rng(self.seed)
+        return np.concatenate([np.zeros(0, dtype=np.int64)] +
+                              [rng.permutation(count) for count in self.counts.tolist()])
+
+    def used(self, num_of_samples=None, quotas=None):
+        """
+        :info: 每个类别参与划分的图片数，num_of_samples 为默认上限，quotas 中可以单独指定某些类别
+        """
+        used = self.counts.copy()
+        if num_of_samples is not None:
+            used = np.minimum(used, num_of_samples)
+        for category, quota in (quotas or {}).items():
+            assert category in self.categories, 'category:{} does not exist.'.format(category)
+            if not isinstance(quota, (tuple, list)):
+                idx = self.categories.index(category)
+                used[idx] = min(self.counts[idx], quota)
+        return used
+
+    def counts_of_split(self):
+        """
+        :return: {category: {name: 数量}}
+        """
+        table = np.zeros((len(self.categories), len(self.names) + 1), dtype=np.int64)
+        np.add.at(table, (self.category_id, self.assign), 1)
+        return {category: dict(zip(self.names, row[:-1].tolist()))
+                for category, row in zip(self.categories, table)}
+
+    def subset(self, name):
+        """
+        :info: 某个划分对应的数据集字典 {目录category: [file_name]}
+        """
+        split_id = self.names.index(name)
+        result = {}
+        for idx in np.flatnonzero(self.assign == split_id).tolist():
+            result.setdefault(self.sources[self.source_id[idx]], []).append(self.file_names[idx])
+        return result
+
+    def _write_list(self, file_path, ids, img_format):
+        prefixes = [os.path.join(source, '') for source in self.sources]
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(prefixes[source_id] + self.file_names[idx] + img_format + '\n'
+                            for idx, source_id in zip(ids.tolist(), self.source_id[ids].tolist())))
+
+    def write_manifests(self, output_dir, img_format='.jpg', kfold=False):
+        """
+        :info: 每个划分写一个清单文件，每行一个相对于 sample_root 的图片路径；k-fold 时每折写 train/val 两个清单
+        :return: 清单文件路径列表
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for split_id, name in enumerate(self.names):
+            if kfold:
+                lists = [(name + '_train.txt', np.flatnonzero((self.assign >= 0) & (self.assign != split_id))),
+                         (name + '_val.txt', np.flatnonzero(self.assign == split_id))]
+            else:
+                lists = [(name + '.txt', np.flatnonzero(self.assign == split_id))]
+            for file_name, ids in lists:
+                file_path = os.path.join(output_dir, file_name)
+                self._write_list(file_path, ids, img_format)
+                paths.append(file_path)
+        info_path = os.path.join(output_dir, 'split.json')
+        with open(info_path, 'w', encoding='utf-8') as f:
+            json.dump({'seed': self.seed, 'names': self.names, 'kfold': kfold,
+                       'counts': self.counts_of_split()}, f, ensure_ascii=False, indent=1)
+        paths.append(info_path)
+        print('[FINISH] The manifests have been saved at path: {}'.format(output_dir))
+        return paths
+
+
+def split_dataset(dataset, ratios=(0.8, 0.1, 0.1), names=('train', 'val', 'test'), seed=0,
+                  num_of_samples=None, quotas=None, category_map=None):
+    """
+    :info: 每个类别内按比例划分
+    :param ratios: 各划分的比例，会被归一化
+    :param num_of_samples: 每个类别参与划分的最大数量，默认全部
+    :param quotas: 特殊类别的配额 {category: 数量} 或 {category: (train数量, val数量, test数量)}
+    :param category_map: {目录: 合并后的类别}，按合并后的类别分层
+    :return: DatasetSplit
+    """
+    assert len(ratios) == len(names), 'ratios and names should have the same length.'
+    split = DatasetSplit(dataset, names, seed, category_map)
+    used = split.used(num_of_samples, quotas)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    # 每个类别各划分的累计结束位置
+    ends = np.round(np.outer(used, np.cumsum(ratios) / ratios.sum())).astype(np.int64)
+    ends[:, -1] = used
+    for category, quota in (quotas or {}).items():
+        if isinstance(quota, (tuple, list)):
+            assert len(quota) == len(names), 'quota of {} should have {} numbers.'.format(category, len(names))
+            idx = split.categories.index(category)
+            assert sum(quota) <= split.counts[idx], 'category:{} only has {} images.'.format(
+                category, split.counts[idx])
+            ends[idx] = np.cumsum(quota)
+    rank = split.permute()
+    assign = (rank[:, None] >= ends[split.category_id]).sum(axis=1)
+    assign[assign == len(names)] = -1
+    split.assign[:] = assign
+    return split
+
+
+def kfold_dataset(dataset, k=5, seed=0, num_of_samples=None, quotas=None, category_map=None):
+    """
+    :info: 每个类别内按随机排名轮流分配到 k 折，各折数量最多相差1
+    :param quotas: 特殊类别参与划分的数量 {category: 数量}
+    :param category_map: {目录: 合并后的类别}，按合并后的类别分层
+    :return: DatasetSplit，names 为 fold0 ... fold{k-1}
+    """
+    for category, quota in (quotas or {}).items():
+        assert not isinstance(quota, (tuple, list)), \
+            'quota of {} should be a single number in k-fold, got {}.'.format(category, quota)
+    split = DatasetSplit(dataset, ['fold{}'.format(fold) for fold in range(k)], seed, category_map)
+    used = split.used(num_of_samples, quotas)
+    rank = split.permute()
+    assign = rank % k
+    assign[rank >= used[split.category_id]] = -1
+    split.assign[:] = assign
+    return split
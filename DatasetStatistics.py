@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetStatistics
+@time: 2020/4/7
+@desc: 流式统计，内存只与直方图大小有关，与bbox数量无关，可跨进程合并；
+       中心点直方图以图片大小与 MAX_CENTER 为界，异常坐标只计数
+"""
+import numpy as np
+
+# 面积直方图固定使用2的幂作为边界: [0, 1), [1, 2), [2, 4), ... [2^29, 2^30)
+AREA_EDGES = np.concatenate(([0], 2 ** np.arange(31, dtype=np.int64)))
+# 中心点直方图覆盖的最大坐标，超出的bbox只计数，保证直方图大小有上限
+MAX_CENTER = 16384
+
+
+class CategoryStats(object):
+    def __init__(self, num_area_bins, cell, max_points):
+        self.count = 0
+        # 中心点超出图片或 MAX_CENTER 的bbox数量，不计入中心点直方图与散点
+        self.out_of_range = 0
+        self.area_hist = np.zeros(num_area_bins, dtype=np.int64)
+        # 中心点二维直方图，每格 cell x cell 像素，按需扩展
+        self.center_hist = np.zeros((0, 0), dtype=np.int64)
+        self.cell = cell
+        self.max_points = max_points
+        self.points_x = np.zeros(0, dtype=np.int32)
+        self.points_y = np.zeros(0, dtype=np.int32)
+
+    @property
+    def truncated(self):
+        """
+        :info: 保留的中心点是否少于实际数量
+        """
+        return len(self.points_x) < self.count
+
+    def _grow(self, rows, cols):
+        old_rows, old_cols = self.center_hist.shape
+        if rows <= old_rows and cols <= old_cols:
+            return
+        hist = np.zeros((max(rows, old_rows), max(cols, old_cols)), dtype=np.int64)
+        hist[:old_rows, :old_cols] = self.center_hist
+        self.center_hist = hist
+
+    def update(self, area_idx, center_x, center_y, valid):
+        """
+        :param valid: 中心点在范围内的bbox
+        """
+        self.count += len(area_idx)
+        self.area_hist += np.bincount(area_idx, minlength=len(self.area_hist))
+        self.out_of_range += int(len(valid) - np.count_nonzero(valid))
+        center_x = center_x[valid]
+        center_y = center_y[valid]
+        if len(center_x) == 0:
+            return
+        col = center_x // self.cell
+        row = center_y // self.cell
+        self._grow(int(row.max()) + 1, int(col.max()) + 1)
+        flat = np.bincount(row * self.center_hist.shape[1] + col, minlength=self.center_hist.size)
+        self.center_hist += flat.reshape(self.center_hist.shape)
+        room = self.max_points - len(self.points_x)
+        if room > 0:
+            self.points_x = np.concatenate((self.points_x, center_x[:room].astype(np.int32)))
+            self.points_y = np.concatenate((self.points_y, center_y[:room].astype(np.int32)))
+
+    def merge(self, other):
+        self.count += other.count
+        self.out_of_range += other.out_of_range
+        self.area_hist += other.area_hist
+        self._grow(*other.center_hist.shape)
+        rows, cols = other.center_hist.shape
+        self.center_hist[:rows, :cols] += other.center_hist
+        room = self.max_points - len(self.points_x)
+        if room > 0:
+            self.points_x = np.concatenate((self.points_x, other.points_x[:room]))
+            self.points_y = np.concatenate((self.points_y, other.points_y[:room]))
+
+
+class DatasetStats(object):
+    def __init__(self, cell=16, max_points=20000, area_edges=AREA_EDGES):
+        """
+        :param cell: 中心点二维直方图每格的像素大小
+        :param max_points: 每个类别最多保留的中心点数量，用于绘制散点图
+        :param area_edges: 面积直方图边界
+        """
+        self.cell = cell
+        self.max_points = max_points
+        self.area_edges = np.asarray(area_edges, dtype=np.int64)
+        self.num_images = 0
+        self.num_objects = 0
+        self.width_min = self.height_min = self.bbox_xmin = self.bbox_ymin = 100000
+        self.width_max = self.height_max = self.bbox_xmax = self.bbox_ymax = 0
+        self.categories = {}
+
+    def _category(self, category):
+        stats = self.categories.get(category)
+        if stats is None:
+            stats = self.categories[category] = CategoryStats(len(self.area_edges) - 1, self.cell, self.max_points)
+        return stats
+
+    def update_images(self, width, height):
+        """
+        :info: 累加一批图片的宽高
+        """
+        if len(width) == 0:
+            return
+        self.num_images += len(width)
+        self.width_min = min(self.width_min, int(width.min()))
+        self.width_max = max(self.width_max, int(width.max()))
+        self.height_min = min(self.height_min, int(height.min()))
+        self.height_max = max(self.height_max, int(height.max()))
+
+    def update_objects(self, category, xmin, ymin, xmax, ymax, width=None, height=None):
+        """
+        :info: 累加某个类别的一批bbox
+        :param width: 每个bbox所在图片的宽，中心点超出图片的bbox不计入中心点直方图
+        :param height: 每个bbox所在图片的高
+        """
+        if len(xmin) == 0:
+            return
+        xmin = np.asarray(xmin, dtype=np.int64)
+        ymin = np.asarray(ymin, dtype=np.int64)
+        xmax = np.asarray(xmax, dtype=np.int64)
+        ymax = np.asarray(ymax, dtype=np.int64)
+        self.num_objects += len(xmin)
+        self.bbox_xmin = min(self.bbox_xmin, int(xmin.min()))
+        self.bbox_ymin = min(self.bbox_ymin, int(ymin.min()))
+        self.bbox_xmax = max(self.bbox_xmax, int(xmax.max()))
+        self.bbox_ymax = max(self.bbox_ymax, int(ymax.max()))
+        area = (xmax - xmin + 1) * (ymax - ymin + 1)
+        area_idx = np.clip(np.searchsorted(self.area_edges, area, side='right') - 1, 0, len(self.area_edges) - 2)
+        center_x = (xmin + xmax) // 2
+        center_y = (ymin + ymax) // 2
+        valid = (center_x >= 0) & (center_y >= 0) & (center_x < MAX_CENTER) & (center_y < MAX_CENTER)
+        if width is not None:
+            valid &= (center_x <= np.asarray(width, dtype=np.int64)) & (center_y <= np.asarray(height, dtype=np.int64))
+        self._category(category).update(area_idx, center_x, center_y, valid)
+
+    def merge(self, other):
+        """
+        :info: 合并另一个(例如其他进程产生的)统计结果
+        """
+        assert self.cell == other.cell and np.array_equal(self.area_edges, other.area_edges)
+        self.num_images += other.num_images
+        self.num_objects += other.num_objects
+        self.width_min = min(self.width_min, other.width_min)
+        self.width_max = max(self.width_max, other.width_max)
+        self.height_min = min(self.height_min, other.height_min)
+        self.height_max = max(self.height_max, other.height_max)
+        self.bbox_xmin = min(self.bbox_xmin, other.bbox_xmin)
+        self.bbox_ymin = min(self.bbox_ymin, other.bbox_ymin)
+        self.bbox_xmax = max(self.bbox_xmax, other.bbox_xmax)
+        self.bbox_ymax = max(self.bbox_ymax, other.bbox_ymax)
+        for category, stats in other.categories.items():
+            self._category(category).merge(stats)
+        return self
+
+    @property
+    def out_of_range(self):
+        return sum(stats.out_of_range for stats in self.categories.values())
+
+    @property
+    def area_hist(self):
+        hist = np.zeros(len(self.area_edges) - 1, dtype=np.int64)
+        for stats in self.categories.values():
+            hist += stats.area_hist
+        return hist
+
+    def to_dict(self):
+        """
+        :info: 转为可以直接 json.dump 的字典
+        """
+        return {'num_images': self.num_images,
+                'num_objects': self.num_objects,
+                'width': [self.width_min, self.width_max],
+                'height': [self.height_min, self.height_max],
+                'bbox': [self.bbox_xmin, self.bbox_ymin, self.bbox_xmax, self.bbox_ymax],
+                'area_edges': self.area_edges.tolist(),
+                'area_hist': self.area_hist.tolist(),
+                'cell': self.cell,
+                'out_of_range': self.out_of_range,
+                'categories': {category: {'count': stats.count,
+                                          'out_of_range': stats.out_of_range,
+                                          'area_hist': stats.area_hist.tolist(),
+                                          'center_hist': stats.center_hist.tolist()}
+                               for category, stats in sorted(self.categories.items())}}
+
+
+def statistics_of_store(store, chunk=1000000, **kwargs):
+    """
+    :info: 从 AnnotationStore 的列数据按类别、按块累加统计
+    :param chunk: 每块的最大对象数
+    :param kwargs: DatasetStats 的参数
+    """
+    stats = DatasetStats(**kwargs)
+    stats.update_images(store.images['width'], store.images['height'])
+    objects = store.objects
+    obj_category = store.image_of_objects('category_id')
+    obj_width = store.image_of_objects('width')
+    obj_height = store.image_of_objects('height')
+    order = np.argsort(obj_category, kind='stable')
+    bounds = np.searchsorted(obj_category[order], np.arange(len(store.categories) + 1))
+    for category_id, category in enumerate(store.categories):
+        idx = order[bounds[category_id]:bounds[category_id + 1]]
+        for start in range(0, len(idx), chunk):
+            part = idx[start:start + chunk]
+            stats.update_objects(category, objects['xmin'][part], objects['ymin'][part],
+                                 objects['xmax'][part], objects['ymax'][part], obj_width[part], obj_height[part])
+    return stats
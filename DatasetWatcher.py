@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DatasetWatcher
+@time: 2020/5/11
+@desc: 常驻进程，持续保持数据集索引最新：定时按目录mtime增量刷新，Linux下用inotify立即感知变化；
+       通过进程内接口或本地 socket (每行一个json请求/响应) 查询数量与文件列表
+       python DatasetWatcher.py D:\\data\\sample_root --port 8765
+"""
+import os
+import sys
+import json
+import struct
+import select
+import socket
+import argparse
+import threading
+import socketserver
+import ctypes
+import ctypes.util
+from DatasetIndex import DatasetIndex
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify(object):
+    def __init__(self):
+        """
+        :info: 通过 ctypes 调用 libc 的 inotify，不可用时抛出 OSError
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux.')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # wd -> 相对目录
+        self.watches = {}
+
+    def add(self, path, rel_dir):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = rel_dir
+        return wd
+
+    def remove(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+        self.watches.pop(wd, None)
+
+    def read(self):
+        """
+        :return: (发生变化的相对目录集合, 是否溢出)
+        """
+        dirty = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, pos)
+                pos += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                rel_dir = self.watches.get(wd)
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                elif rel_dir is not None:
+                    dirty.add(rel_dir)
+        return dirty, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DatasetWatcher(object):
+    def __init__(self, sample_root, img_format='.jpg', img_only=False, interval=2.0, use_inotify=True):
+        """
+        :param sample_root: 数据集根目录
+        :param img_format: 数据图片格式，默认.jpg
+        :param img_only: 数据只包含图片 默认False
+        :param interval: 轮询间隔(秒)，有 inotify 时作为兜底的全量刷新间隔
+        :param use_inotify: Linux 下使用 inotify 立即感知变化
+        """
+        self.sample_root = sample_root
+        self.index = DatasetIndex(sample_root, img_format, img_only)
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.inotify = None
+        self.version = 0
+        self._counts = None
+        # 保护 index.entries 的替换与查询，扫描本身不持有该锁
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def start(self, address=None):
+        """
+        :param address: (host, port)，不为 None 时同时启动本地 socket 服务
+        """
+        self.index.update()
+        self.version += 1
+        if self.use_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError as e:
+                print('[WARNING] inotify is not available, fall back to polling: {}'.format(e))
+        self._sync_watches()
+        self._thread = threading.Thread(target=self._run, name='DatasetWatcher', daemon=True)
+        self._thread.start()
+        if address is not None:
+            self.serve(address)
+        print('[WATCH] Watching {} ({}).'.format(self.sample_root, 'inotify' if self.inotify else 'polling'))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+        self.index.save()
+        print('[FINISH] Stop watching {}.'.format(self.sample_root))
+
+    def _sync_watches(self):
+        if self.inotify is None:
+            return
+        watched = {rel_dir: wd for wd, rel_dir in self.inotify.watches.items()}
+        for rel_dir in self.index.entries:
+            if rel_dir not in watched:
+                self.inotify.add(self.index.abspath(rel_dir), rel_dir)
+        for rel_dir, wd in watched.items():
+            if rel_dir not in self.index.entries:
+                self.inotify.remove(wd)
+
+    def _run(self):
+        while not self._stop.is_set():
+            dirty = set()
+            full = True
+            if self.inotify is not None:
+                ready, _, _ = select.select([self.inotify.fd], [], [], self.interval)
+                if ready:
+                    dirty, overflow = self.inotify.read()
+                    # 有事件时只扫描变化的目录，溢出或超时时按mtime全量刷新
+                    full = overflow
+            else:
+                self._stop.wait(self.interval)
+            if self._stop.is_set():
+                break
+            self.refresh(dirty, full)
+
+    def refresh(self, dirty=(), full=True):
+        """
+        :info: 增量刷新一次，在锁外扫描，只在替换索引时持有锁，查询不会等待扫描；
+               扫描过程中目录被删除时等下一次刷新
+        :param dirty: 需要重新扫描的相对目录
+        :param full: True 时按mtime检查整个目录树，False 时只扫描 dirty 中的目录
+        :return: 本次重新扫描的目录数
+        """
+        with self._scan_lock:
+            try:
+                entries, rescanned = self.index.scan(dirty) if full else self.index.scan_dirty(dirty)
+            except FileNotFoundError:
+                return 0
+            if rescanned > 0:
+                with self._lock:
+                    self.index.entries = entries
+                    self.index.rescanned = rescanned
+                    self.version += 1
+                    self._counts = None
+            self._sync_watches()
+            return rescanned
+
+    def counts(self):
+        """
+        :return: {category: 数量}，与 count_category 统计的目录一致
+        """
+        with self._lock:
+            if self._counts is None:
+                self._counts = {category: len(name_lst) for category, name_lst in self.index.to_dict().items()}
+            return dict(self._counts)
+
+    def files(self, category):
+        with self._lock:
+            entry = self.index.entries.get(category)
+            return list(entry['stems']) if entry is not None else []
+
+    def dataset(self):
+        """
+        :return: 当前的数据集字典 {category: [file_name]}
+        """
+        with self._lock:
+            return self.index.to_dict()
+
+    def orphans(self):
+        with self._lock:
+            return self.index.orphans()
+
+    def handle(self, request):
+        """
+        :info: 处理一个请求 {"op": "counts" | "files" | "dataset" | "orphans" | "version", ...}
+        """
+        op = request.get('op')
+        if op == 'counts':
+            return {'version': self.version, 'counts': self.counts()}
+        if op == 'files':
+            return {'version': self.version, 'files': self.files(request['category'])}
+        if op == 'dataset':
+            return {'version': self.version, 'dataset': self.dataset()}
+        if op == 'orphans':
+            return {'version': self.version, 'orphans': self.orphans()}
+        if op == 'version':
+            return {'version': self.version}
+        return {'error': 'unknown op: {}'.format(op)}
+
+    def serve(self, address=('127.0.0.1', 8765)):
+        """
+        :info: 在后台线程中启动本地 socket 服务，每行一个json请求，返回一行json
+        """
+        watcher = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = watcher.handle(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        response = {'error': str(e)}
+                    self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        self._server = WatcherServer(address, Handler)
+        threading.Thread(target=self._server.serve_forever, name='DatasetWatcherServer', daemon=True).start()
+        print('[WATCH] Serving on {}:{}.'.format(*self._server.server_address))
+        return self._server.server_address
+
+
+class WatcherServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def query(address, op, **kwargs):
+    """
+    :info: 向 DatasetWatcher 的 socket 服务发送一个请求
+    """
+    request = dict(kwargs, op=op)
+    with socket.create_connection(address) as sock:
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep a PlayDataset index live and serve it on a local socket.')
+    parser.add_argument('sample_root')
+    parser.add_argument('--img-format', default='.jpg')
+    parser.add_argument('--img-only', action='store_true')
+    parser.add_argument('--interval', type=float, default=2.0)
+    parser.add_argument('--no-inotify', action='store_true')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    watcher = DatasetWatcher(args.sample_root, args.img_format, args.img_only, args.interval, not args.no_inotify)
+    watcher.start((args.host, args.port))
+    try:
+        watcher._stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,137 +10,171 @@ author: liusili
 @desc:
 """
 import os
-import shutil
 import xml.etree.ElementTree as ET
-from time import sleep
+from DatasetIndex import DatasetIndex, get_cache_dir
+from VocReader import get_and_check
+from FileTransfer import TransferExecutor
+from MoveJournal import run_moves, rollback_moves
+from DatasetJoin import join_datasets
+from Instrument import Instrumentation, instrumented
 
 
 class DifficultDataset(object):
-    def __init__(self, sample_root, img_format='.jpg'):
+    def __init__(self, sample_root, img_format='.jpg', instrument=None):
         """
         :param sample_root: 数据集根目录
         :param img_format: 数据图片格式，默认.JPG
+        :param instrument: Instrumentation，记录各方法分阶段的耗时、文件数与字节数
         :rank: 数据集目录层级 默认2
         """
         self.sample_root = sample_root[:-1] if sample_root.endswith('\\') else sample_root
         self.name = self.sample_root.split('\\')[-1]
         self.img_format = img_format
-        self.dataset = self.file_to_dict()
+        self.instrument = instrument or Instrumentation()
+        with self.instrument.method(type(self).__name__, '__init__'):
+            self.dataset = self.file_to_dict()
 
     def file_to_dict(self):
+        """
+        :info: {code: [file_name]}，包含 code 下各级子目录中的图片；只收录 img_format 图片的文件名，
+               不再像逐个 os.walk 时那样把xml等其他文件的文件名也算进来
+        """
+        with self.instrument.phase('scan') as phase:
+            self.index = DatasetIndex(self.sample_root, self.img_format, img_only=True).build()
+            phase.add(files=self.index.num_valid)
+        self.index.summary()
         Dataset = {}
-        cnt = 0
-        for code in os.listdir(self.sample_root):
-            Dataset[code] = []
-            code_path = os.path.join(self.sample_root, code)
-            for _, _, img_lst in os.walk(code_path):
-                if len(img_lst) > 0:
-                    cnt += len(img_lst)
-                    for img in img_lst:
-                        img_name = os.path.splitext(img)[0]
-                        if img_name not in Dataset[code]:
-                            Dataset[code].append(img_name)
-        print('The quantity of all valid images is {}'.format(cnt))
-        return Dataset
+        for category, entry in self.index.entries.items():
+            if category == os.curdir:
+                Dataset.update((code, {}) for code in entry['dirs'])
+                continue
+            code = category.split(os.sep)[0]
+            Dataset[code].update(dict.fromkeys(entry['stems']))
+        return {code: list(names) for code, names in Dataset.items()}
 
-    def move_difficult_data(self, target_path):
+    @instrumented
+    def move_difficult_data(self, target_path, batch_size=1000, resume=True):
         """
         :info: 将困难样本文件夹中的图片，对应的目标文件夹中的图片以及标签信息移动到新的文件夹中
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
+        :return: JoinResult，未完成的日志续跑时为 None
         """
         target_path = target_path[:-1] if target_path.endswith('\\') else target_path
         new_path = target_path + '_difficult'
-        os.makedirs(new_path, exist_ok=True)
-        for code in os.listdir(target_path):
-            if code not in self.dataset: continue
-            code_path = os.path.join(target_path, code)
-            new_code_path = os.path.join(new_path, code)
-            os.makedirs(new_code_path)
-            for file in os.listdir(code_path):
-                file_name = os.path.splitext(file)[0]
-                file_path = os.path.join(code_path, file)
-                new_file_path = os.path.join(new_code_path, file)
-                if file_name in self.dataset[code]:
-                    print('[MOVE] file {} to new directory.'.format(file))
-                    shutil.move(file_path, new_file_path)
+        result = {}
+
+        def plan():
+            # 目标目录只扫描一次，按 (code, 文件名) 与困难样本哈希连接
+            with self.instrument.phase('scan') as phase:
+                target_index = DatasetIndex(target_path, self.img_format).build()
+                phase.add(files=target_index.num_valid)
+            images = {}
+            xmls = {}
+            for code in self.dataset:
+                entry = target_index.entries.get(code)
+                if entry is None:
+                    continue
+                images[code] = set(entry['stems']).union(entry['orphan_img'])
+                xmls[code] = set(entry['stems']).union(entry['orphan_xml'])
+            target = {code: images[code] | xmls[code] for code in images}
+            join = result['join'] = join_datasets(self.dataset, target)
+            join.summary()
+            moves = []
+            for code, _, file_name in join.matched:
+                code_path = os.path.join(target_path, code)
+                new_code_path = os.path.join(new_path, code)
+                for ext, stems in ((self.img_format, images[code]), ('.xml', xmls[code])):
+                    if file_name in stems:
+                        moves.append((os.path.join(code_path, file_name + ext),
+                                      os.path.join(new_code_path, file_name + ext)))
+            return moves
+
+        journal_dir = os.path.join(get_cache_dir(self.sample_root), 'journal')
+        run_moves(journal_dir, 'move_difficult_data', plan, batch_size, resume, self.instrument,
+                  {'target_path': target_path})
         print('[FINISH]')
+        return result.get('join')
 
-    def move_file(self, target_path):
+    @instrumented
+    def move_file(self, target_path, batch_size=1000, resume=True):
+        """
+        :info: 按照困难样本的类别，将目标文件夹中对应的图片以及标签移动到 target_path_new 下
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
+        """
         target_path = target_path[:-1] if target_path.endswith('\\') else target_path
         new_path = target_path + '_new'
-        os.makedirs(new_path, exist_ok=True)
-        for code, file_name_lst in self.dataset.items():
-            new_code_path = os.path.join(new_path, code)
-            os.makedirs(new_code_path, exist_ok=True)
-            for file_name in file_name_lst:
-                xml_path = os.path.join(target_path, file_name + '.xml')
-                img_path = os.path.join(target_path, file_name + self.img_format)
-                new_xml_path = os.path.join(new_code_path, file_name + '.xml')
-                new_img_path = os.path.join(new_code_path, file_name + self.img_format)
-                if os.path.isfile(img_path) and os.path.isfile(xml_path):
-                    shutil.move(img_path, new_img_path)
-                    shutil.move(xml_path, new_xml_path)
-        sleep(1)
-        print('[FINISH]')
 
+        def plan():
+            moves = []
+            for code, file_name_lst in self.dataset.items():
+                new_code_path = os.path.join(new_path, code)
+                for file_name in file_name_lst:
+                    xml_path = os.path.join(target_path, file_name + '.xml')
+                    img_path = os.path.join(target_path, file_name + self.img_format)
+                    if os.path.isfile(img_path) and os.path.isfile(xml_path):
+                        moves.append((img_path, os.path.join(new_code_path, file_name + self.img_format)))
+                        moves.append((xml_path, os.path.join(new_code_path, file_name + '.xml')))
+            return moves
 
+        journal_dir = os.path.join(get_cache_dir(self.sample_root), 'journal')
+        run_moves(journal_dir, 'move_file', plan, batch_size, resume, self.instrument, {'target_path': target_path})
+        print('[FINISH]')
 
-    @staticmethod
-    def get_and_check(root, name, length):
+    def rollback_moves(self, op='move_file'):
         """
-        :param root: Element-tree 根节点
-        :param name: 需要返回的子节点名称
-        :param length: 确认子节点长度
+        :info: 回滚最近一次带日志的移动操作
+        :param op: 操作名称 'move_file' 或 'move_difficult_data'
         """
-        var_lst = root.findall(name)
-        if len(var_lst) == 0:
-            raise NotImplementedError('Can not find %s in %s.' % (name, root.tag))
-        if (length > 0) and (len(var_lst) != length):
-            raise NotImplementedError('The size of %s is supposed to be %d, but is %d.'
-                                      % (name, length, len(var_lst)))
-        if length == 1:
-            var_lst = var_lst[0]
-        return var_lst
+        return rollback_moves(os.path.join(get_cache_dir(self.sample_root), 'journal'), op)
 
-    def correct_dataset(self):
+    @instrumented
+    def correct_dataset(self, threads=8, queue_depth=64, mode='copy'):
         """
         :info: 将所有文件按照xml标签中的类别进行分类
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
         """
         new_path = self.sample_root + '_correct'
         os.makedirs(new_path, exist_ok=True)
-        for code, name_lst in self.dataset.items():
-            code_path = os.path.join(self.sample_root, code)
-            for file_name in name_lst:
-                xml_path = os.path.join(code_path, file_name + '.xml')
-                img_path = os.path.join(code_path, file_name + self.img_format)
+        with TransferExecutor(threads, queue_depth, 'correct', mode, self.instrument) as transfer:
+            for code, name_lst in self.dataset.items():
+                code_path = os.path.join(self.sample_root, code)
+                for file_name in name_lst:
+                    xml_path = os.path.join(code_path, file_name + '.xml')
+                    img_path = os.path.join(code_path, file_name + self.img_format)
 
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
+                    tree = ET.parse(xml_path)
+                    root = tree.getroot()
 
-                area = 0
-                difficult = 0
-                for obj in root.findall('object'):
-                    diff = int(self.get_and_check(obj, 'difficult', 1).text)
-                    if diff == 1: difficult = 1
-                    bbox = self.get_and_check(obj, 'bndbox', 1)
-                    xmin = int(self.get_and_check(bbox, 'xmin', 1).text)
-                    ymin = int(self.get_and_check(bbox, 'ymin', 1).text)
-                    xmax = int(self.get_and_check(bbox, 'xmax', 1).text)
-                    ymax = int(self.get_and_check(bbox, 'ymax', 1).text)
-                    bbox_area = (xmax - xmin + 1) * (ymax - ymin + 1)
-                    if bbox_area > area:
-                        area = bbox_area
-                        category = self.get_and_check(obj, 'name', 1).text
+                    area = 0
+                    difficult = 0
+                    for obj in root.findall('object'):
+                        diff = int(get_and_check(obj, 'difficult', 1).text)
+                        if diff == 1: difficult = 1
+                        bbox = get_and_check(obj, 'bndbox', 1)
+                        xmin = int(get_and_check(bbox, 'xmin', 1).text)
+                        ymin = int(get_and_check(bbox, 'ymin', 1).text)
+                        xmax = int(get_and_check(bbox, 'xmax', 1).text)
+                        ymax = int(get_and_check(bbox, 'ymax', 1).text)
+                        bbox_area = (xmax - xmin + 1) * (ymax - ymin + 1)
+                        if bbox_area > area:
+                            area = bbox_area
+                            category = get_and_check(obj, 'name', 1).text
 
-                new_code_path = os.path.join(new_path, category)
-                if difficult == 1:
-                    new_code_path = os.path.join(new_path, 'difficult', category)
-                os.makedirs(new_code_path, exist_ok=True)
-                new_xml_path = os.path.join(new_code_path, file_name + '.xml')
-                new_img_path = os.path.join(new_code_path, file_name + self.img_format)
-                print('[COPY] file {0} xml and {1} to new directory.'.format(file_name, self.img_format[1:]))
-                shutil.copy(xml_path, new_xml_path)
-                shutil.copy(img_path, new_img_path)
+                    new_code_path = os.path.join(new_path, category)
+                    if difficult == 1:
+                        new_code_path = os.path.join(new_path, 'difficult', category)
+                    os.makedirs(new_code_path, exist_ok=True)
+                    new_xml_path = os.path.join(new_code_path, file_name + '.xml')
+                    new_img_path = os.path.join(new_code_path, file_name + self.img_format)
+                    transfer.submit(xml_path, new_xml_path)
+                    transfer.submit(img_path, new_img_path)
         print('[FINISH]')
+        return transfer
 
 if __name__ == '__main__':
     sample_root = '/home/opzealot/Documents/working/Tianma/whtm/V2/difficult'
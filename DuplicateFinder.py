@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: DuplicateFinder
+@time: 2020/4/24
+@desc: 查找内容完全相同的图片：先按文件大小分组，只对大小相同的文件分块计算哈希，哈希值按 (路径, 大小, mtime) 缓存
+"""
+import os
+import json
+import pickle
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from DatasetIndex import get_cache_dir
+
+HASH_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    :info: 分块读取文件计算 blake2b 摘要，hashlib 在计算时释放GIL，适合多线程
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache(object):
+    def __init__(self, sample_root):
+        """
+        :info: 摘要缓存 {相对路径: (size, mtime_ns, digest)}，保存在 sample_root_cache/hashes.pkl
+        """
+        self.sample_root = sample_root
+        self.cache_path = os.path.join(get_cache_dir(sample_root), 'hashes.pkl')
+        self.digests = {}
+        self.changed = False
+
+    def load(self):
+        if not os.path.isfile(self.cache_path):
+            return self
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            print('[WARNING] Hash cache is broken, rebuild it.')
+            return self
+        if data.get('version') == HASH_VERSION:
+            self.digests = data['digests']
+        return self
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': HASH_VERSION, 'digests': self.digests}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+        self.changed = False
+
+    def get(self, rel_path, size, mtime):
+        cached = self.digests.get(rel_path)
+        if cached is not None and cached[0] == size and cached[1] == mtime:
+            return cached[2]
+        return None
+
+    def put(self, rel_path, size, mtime, digest):
+        self.digests[rel_path] = (size, mtime, digest)
+        self.changed = True
+
+
+class DuplicateReport(object):
+    def __init__(self, groups, num_files, num_hashed):
+        """
+        :param groups: [[(category, file_name)]]，每组内容相同，组内按路径排序
+        """
+        self.groups = groups
+        self.num_files = num_files
+        self.num_hashed = num_hashed
+
+    @property
+    def within(self):
+        """
+        :info: 所有副本都在同一个类别中的重复组
+        """
+        return [group for group in self.groups if len({category for category, _ in group}) == 1]
+
+    @property
+    def across(self):
+        """
+        :info: 副本分布在不同类别中的重复组
+        """
+        return [group for group in self.groups if len({category for category, _ in group}) > 1]
+
+    @property
+    def redundant(self):
+        """
+        :info: 每组保留第一个，其余为多余的副本
+        """
+        return [item for group in self.groups for item in group[1:]]
+
+    def summary(self):
+        print('Hashed {} of {} images.'.format(self.num_hashed, self.num_files))
+        print('Duplicate groups within category: {}, across categories: {}, redundant images: {}'
+              .format(len(self.within), len(self.across), len(self.redundant)))
+
+    def save(self, file_path):
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({'within': self.within, 'across': self.across}, f, ensure_ascii=False, indent=1)
+        print('[FINISH] The result has been saved at path: {}'.format(file_path))
+
+
+def find_duplicates(sample_root, dataset, img_format='.jpg', threads=8, use_cache=True):
+    """
+    :param sample_root: 数据集根目录
+    :param dataset: {category: [file_name]}
+    :param threads: 计算哈希的线程数
+    :param use_cache: 使用并更新 sample_root_cache/hashes.pkl
+    :return: DuplicateReport
+    """
+    # 一次 scandir 取得大小与 mtime
+    by_size = {}
+    num_files = 0
+    # 与 DatasetIndex 相同，扩展名按 os.path.normcase 比较
+    img_format_case = os.path.normcase(img_format)
+    for category, name_lst in dataset.items():
+        name_set = set(name_lst)
+        category_path = os.path.join(sample_root, category)
+        with os.scandir(category_path) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if os.path.normcase(ext) != img_format_case or stem not in name_set or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                by_size.setdefault(stat.st_size, []).append((category, stem, stat.st_mtime_ns))
+                num_files += 1
+
+    cache = HashCache(sample_root)
+    if use_cache:
+        cache.load()
+    # 大小唯一的文件不可能重复，不需要读取内容
+    candidates = []
+    for size, items in by_size.items():
+        if len(items) > 1:
+            candidates.extend((size, category, stem, mtime) for category, stem, mtime in items)
+    digests = [None] * len(candidates)
+    todo = []
+    for idx, (size, category, stem, mtime) in enumerate(candidates):
+        digests[idx] = cache.get(os.path.join(category, stem + img_format), size, mtime)
+        if digests[idx] is None:
+            todo.append(idx)
+
+    def work(idx):
+        _, category, stem, _ = candidates[idx]
+        return file_digest(os.path.join(sample_root, category, stem + img_format))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for idx, digest in zip(todo, pool.map(work, todo)):
+            size, category, stem, mtime = candidates[idx]
+            cache.put(os.path.join(category, stem + img_format), size, mtime, digest)
+            digests[idx] = digest
+    if use_cache:
+        cache.save()
+
+    by_digest = {}
+    for (size, category, stem, _), digest in zip(candidates, digests):
+        by_digest.setdefault((size, digest), []).append((category, stem))
+    groups = sorted(sorted(group) for group in by_digest.values() if len(group) > 1)
+    return DuplicateReport(groups, num_files, len(todo))
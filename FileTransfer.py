@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: FileTransfer
+@time: 2020/3/27
+@desc: 并发文件拷贝，有界线程池 + 有界队列，统计吞吐并收集单文件错误
+"""
+import os
+import errno
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ('copy', 'hardlink', 'symlink', 'reflink')
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """
+    :info: 写时复制克隆(btrfs/xfs)，不支持时抛出 OSError
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, 'reflink is not supported on this platform')
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            f_dst.close()
+            os.remove(dst)
+            raise
+
+
+def _unshare(dst):
+    """
+    :info: 目标是链接(软链接或硬链接)时先删除，避免写入时通过链接改到原文件
+    """
+    if os.path.islink(dst) or (os.path.exists(dst) and os.stat(dst).st_nlink > 1):
+        os.remove(dst)
+
+
+def _copy(src, dst):
+    _unshare(dst)
+    shutil.copy(src, dst)
+    return 'copy'
+
+
+def _link(src, dst, mode):
+    if mode == 'hardlink':
+        os.link(src, dst)
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+    else:
+        _unshare(dst)
+        reflink(src, dst)
+
+
+def materialize(src, dst, mode='copy', same_device=True):
+    """
+    :info: 按指定方式在 dst 生成 src 的文件，链接失败或跨设备时退回拷贝；目标已存在时各方式都覆盖；
+           xml 标签总是拷贝，之后原地修改标签不会改到原数据集
+    :param mode: 'copy', 'hardlink', 'symlink', 'reflink'
+    :param same_device: src 与 dst 是否在同一设备，跨设备时 hardlink/reflink 直接拷贝
+    :return: 实际使用的方式
+    """
+    if os.path.splitext(src)[1].lower() == '.xml':
+        mode = 'copy'
+    if mode in ('hardlink', 'reflink') and not same_device:
+        mode = 'copy'
+    if mode == 'copy':
+        return _copy(src, dst)
+    try:
+        try:
+            _link(src, dst, mode)
+        except FileExistsError:
+            os.remove(dst)
+            _link(src, dst, mode)
+        return mode
+    except FileNotFoundError:
+        raise
+    except OSError:
+        pass
+    return _copy(src, dst)
+
+
+class TransferExecutor(object):
+    def __init__(self, threads=8, queue_depth=64, name='transfer', mode='copy', instrument=None):
+        """
+        :param threads: 拷贝线程数
+        :param queue_depth: 已提交但未完成的最大任务数，超过时 submit 阻塞
+        :param name: 任务名称，用于输出统计
+        :param mode: 'copy', 'hardlink', 'symlink', 'reflink'；只链接图片，xml 总是拷贝
+        :param instrument: Instrumentation，结束时记录一条 transfer 阶段
+        """
+        assert mode in MODES, 'mode should be one of {}.'.format(MODES)
+        self.threads = threads
+        self.queue_depth = max(queue_depth, threads)
+        self.name = name
+        self.mode = mode
+        self.modes = dict.fromkeys(MODES, 0)
+        self.files = 0
+        self.bytes = 0
+        self.errors = []
+        self.elapsed = 0.
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._pool = None
+        self._start = None
+        self._devices = {}
+        self.instrument = instrument
+        self._phase_cm = None
+
+    def __enter__(self):
+        if self.instrument is not None:
+            self._phase_cm = self.instrument.phase('transfer')
+            self._phase = self._phase_cm.__enter__()
+        self._pool = ThreadPoolExecutor(max_workers=self.threads)
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._pool.shutdown(wait=True)
+        self.elapsed = time.time() - self._start
+        self.report()
+        if self._phase_cm is not None:
+            self._phase.add(self.files, self.bytes)
+            self._phase_cm.__exit__(exc_type, exc_val, exc_tb)
+        return False
+
+    def submit(self, src, dst):
+        """
+        :info: 提交一个拷贝任务，队列已满时等待
+        """
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._transfer, src, dst)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _device(self, path):
+        device = self._devices.get(path)
+        if device is None:
+            device = self._devices[path] = os.stat(path).st_dev
+        return device
+
+    def _transfer(self, src, dst):
+        try:
+            same_device = True
+            if self.mode in ('hardlink', 'reflink'):
+                same_device = self._device(os.path.dirname(src)) == self._device(os.path.dirname(dst))
+            mode = materialize(src, dst, self.mode, same_device)
+            size = os.stat(dst).st_size
+        except OSError as e:
+            with self._lock:
+                self.errors.append((src, dst, repr(e)))
+            return
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.modes[mode] += 1
+
+    @property
+    def files_per_second(self):
+        return self.files / self.elapsed if self.elapsed > 0 else 0.
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / 1024 / 1024 / self.elapsed if self.elapsed > 0 else 0.
+
+    def report(self):
+        print('[{}] {} files, {:.1f} MB in {:.1f}s ({:.1f} files/s, {:.1f} MB/s), {} errors.'
+              .format(self.name.upper(), self.files, self.bytes / 1024 / 1024, self.elapsed,
+                      self.files_per_second, self.mb_per_second, len(self.errors)))
+        if self.mode != 'copy':
+            print('[{}] mode={}, {}'.format(self.name.upper(), self.mode,
+                                            ', '.join('{}: {}'.format(k, v) for k, v in self.modes.items() if v)))
+        for src, dst, error in self.errors[:10]:
+            print('[ERROR] {} -> {}: {}'.format(src, dst, error))
+        if len(self.errors) > 10:
+            print('[ERROR] ... {} more errors.'.format(len(self.errors) - 10))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: Instrument
+@time: 2020/4/17
+@desc: 按阶段(scan, parse, transfer, write)记录每个方法的耗时、文件数与字节数，通过回调输出
+"""
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+PHASES = ('scan', 'parse', 'transfer', 'write')
+
+
+class PhaseRecord(object):
+    def __init__(self, owner, method, phase):
+        self.owner = owner
+        self.method = method
+        self.phase = phase
+        self.files = 0
+        self.bytes = 0
+        self.start = time.time()
+        self.seconds = 0.
+
+    def add(self, files=0, num_bytes=0):
+        self.files += files
+        self.bytes += num_bytes
+
+    def to_dict(self):
+        return {'class': self.owner, 'method': self.method, 'phase': self.phase,
+                'start': round(self.start, 3), 'seconds': round(self.seconds, 4),
+                'files': self.files, 'bytes': self.bytes}
+
+
+class Instrumentation(object):
+    def __init__(self, hooks=None):
+        """
+        :param hooks: 回调列表，每条记录(dict)结束时调用 hook(record)
+        """
+        self.hooks = list(hooks or [])
+        self._local = threading.local()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def emit(self, record):
+        for hook in self.hooks:
+            hook(record)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def method(self, owner, method):
+        """
+        :info: 方法级别的记录，phase 为 'total'，文件数与字节数为各阶段之和
+        """
+        stack = self._stack()
+        record = PhaseRecord(owner, method, 'total')
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record.seconds = time.time() - record.start
+            self.emit(record.to_dict())
+
+    @contextmanager
+    def phase(self, phase, files=0, num_bytes=0):
+        """
+        :info: 阶段级别的记录，可以在 with 块内通过 record.add 累加文件数与字节数
+        :param phase: 'scan', 'parse', 'transfer', 'write'
+        """
+        stack = self._stack()
+        owner, method = (stack[-1].owner, stack[-1].method) if stack else (None, None)
+        record = PhaseRecord(owner, method, phase)
+        record.add(files, num_bytes)
+        try:
+            yield record
+        finally:
+            record.seconds = time.time() - record.start
+            if stack:
+                stack[-1].add(record.files, record.bytes)
+            self.emit(record.to_dict())
+
+
+class JsonLinesSink(object):
+    def __init__(self, path):
+        """
+        :param path: 追加写入的 json lines 文件
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def instrumented(func):
+    """
+    :info: 方法装饰器，要求对象有 instrument 属性
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self.instrument.method(type(self).__name__, func.__name__):
+            return func(self, *args, **kwargs)
+    return wrapper
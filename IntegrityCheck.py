@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: IntegrityCheck
+@time: 2020/5/8
+@desc: 只读取 JPEG/PNG 文件头得到真实宽高并检查结束标记，与xml中的 size 以及 bndbox 交叉校验，不解码图片
+"""
+import os
+import csv
+import struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+# SOF0 ~ SOF15，去掉 DHT(C4), JPG(C8), DAC(CC)
+JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# 没有长度字段的标记
+JPEG_STANDALONE = set(range(0xD0, 0xD8)) | {0x01}
+
+ISSUES = ('unreadable', 'truncated', 'size_mismatch', 'bbox_out_of_bounds', 'bbox_invalid')
+
+
+def _jpeg_size(f):
+    """
+    :info: 从 SOI 之后逐个跳过标记段，直到 SOFn，只读取每段的长度字段
+    """
+    while True:
+        byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in JPEG_STANDALONE:
+            continue
+        length_data = f.read(2)
+        if len(length_data) < 2 or marker == 0xD9:
+            return None
+        length = struct.unpack('>H', length_data)[0]
+        if marker in JPEG_SOF:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>xHH', data)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+        byte = f.read(1)
+        if byte != b'\xff':
+            return None
+        f.seek(-1, os.SEEK_CUR)
+
+
+def image_header(img_path):
+    """
+    :return: (width, height, complete)，无法识别时 width, height 为 None
+    """
+    with open(img_path, 'rb') as f:
+        head = f.read(24)
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        if head.startswith(b'\xff\xd8'):
+            f.seek(2)
+            size = _jpeg_size(f)
+            # 允许 EOI 之后有少量填充
+            f.seek(max(file_size - 64, 0))
+            complete = f.read().rstrip(b'\x00').endswith(b'\xff\xd9')
+        elif head.startswith(PNG_SIGNATURE) and head[12:16] == b'IHDR':
+            size = struct.unpack('>II', head[16:24])
+            f.seek(max(file_size - 12, 0))
+            complete = f.read() == PNG_IEND
+        else:
+            return None, None, False
+    if size is None:
+        return None, None, complete
+    return size[0], size[1], complete
+
+
+class IntegrityReport(object):
+    def __init__(self, issues, num_files):
+        """
+        :param issues: [(category, file_name, issue, detail)]
+        """
+        self.issues = issues
+        self.num_files = num_files
+
+    @property
+    def bad(self):
+        """
+        :return: 有问题的 (category, file_name)，保持顺序去重
+        """
+        return list(dict.fromkeys((category, file_name) for category, file_name, _, _ in self.issues))
+
+    def count(self):
+        counts = dict.fromkeys(ISSUES, 0)
+        for _, _, issue, _ in self.issues:
+            counts[issue] += 1
+        return counts
+
+    def summary(self):
+        print('Checked {} images, {} of them have problems.'.format(self.num_files, len(self.bad)))
+        for issue, cnt in self.count().items():
+            if cnt:
+                print('The number of [{}]: {}'.format(issue, cnt))
+
+    def save(self, file_path):
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['category', 'file_name', 'issue', 'detail'])
+            writer.writerows(self.issues)
+        print('[FINISH] The result has been saved at path: {}'.format(file_path))
+
+
+def check_integrity(sample_root, dataset, img_format='.jpg', store=None, threads=8):
+    """
+    :param sample_root: 数据集根目录
+    :param dataset: {category: [file_name]}
+    :param store: AnnotationStore，与 dataset 同步；为 None 时只检查图片
+    :param threads: 读取文件头的线程数
+    :return: IntegrityReport
+    """
+    if store is not None:
+        keys = [(store.category(image_id), store.file_name(image_id)) for image_id in range(len(store))]
+    else:
+        keys = [(category, file_name) for category in sorted(dataset) for file_name in dataset[category]]
+
+    def work(key):
+        # 打不开的文件记为 unreadable，不中断整个扫描
+        try:
+            return image_header(os.path.join(sample_root, key[0], key[1] + img_format)) + (None,)
+        except OSError as e:
+            return None, None, False, repr(e)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        headers = list(pool.map(work, keys))
+
+    issues = []
+    real_width = np.zeros(len(keys), dtype=np.int64)
+    real_height = np.zeros(len(keys), dtype=np.int64)
+    for idx, (width, height, complete, error) in enumerate(headers):
+        category, file_name = keys[idx]
+        if width is None:
+            issues.append((category, file_name, 'unreadable', error or 'no JPEG/PNG size header'))
+            continue
+        real_width[idx], real_height[idx] = width, height
+        if not complete:
+            issues.append((category, file_name, 'truncated', 'missing end marker'))
+    if store is None:
+        return IntegrityReport(issues, len(keys))
+
+    readable = real_width > 0
+    xml_width = store.images['width'].astype(np.int64)
+    xml_height = store.images['height'].astype(np.int64)
+    for idx in np.flatnonzero(readable & ((xml_width != real_width) | (xml_height != real_height))).tolist():
+        issues.append(keys[idx] + ('size_mismatch', 'xml {}x{}, image {}x{}'.format(
+            xml_width[idx], xml_height[idx], real_width[idx], real_height[idx])))
+
+    # 图片无法读取时以xml中的宽高为界
+    bound_width = np.where(readable, real_width, xml_width)
+    bound_height = np.where(readable, real_height, xml_height)
+    objects = store.objects
+    image_id = objects['image_id']
+    xmin, ymin, xmax, ymax = (objects[name].astype(np.int64) for name in ('xmin', 'ymin', 'xmax', 'ymax'))
+    invalid = (xmin > xmax) | (ymin > ymax)
+    outside = (xmin < 0) | (ymin < 0) | (xmax > bound_width[image_id]) | (ymax > bound_height[image_id])
+    for issue, mask in (('bbox_invalid', invalid), ('bbox_out_of_bounds', outside & ~invalid)):
+        for obj_id in np.flatnonzero(mask).tolist():
+            idx = int(image_id[obj_id])
+            issues.append(keys[idx] + (issue, 'bbox ({}, {}, {}, {}) in {}x{}'.format(
+                xmin[obj_id], ymin[obj_id], xmax[obj_id], ymax[obj_id], bound_width[idx], bound_height[idx])))
+    return IntegrityReport(issues, len(keys))
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: MoveJournal
+@time: 2020/4/10
+@desc: 批量移动文件的日志：先生成移动计划，再分批执行并追加提交记录，中断后可续跑，完成后可回滚
+"""
+import os
+import glob
+import json
+import hashlib
+import shutil
+import time
+import uuid
+from tqdm import tqdm
+
+
+class MoveJournal(object):
+    def __init__(self, journal_path):
+        """
+        :param journal_path: 日志文件路径(.jsonl)，移动计划保存在 journal_path + '.plan'
+        """
+        self.journal_path = journal_path
+        self.plan_path = journal_path + '.plan'
+        self.moves = []
+        self.committed = 0
+        self.status = 'new'
+        self.key = None
+        self.skipped = []
+
+    @staticmethod
+    def latest(journal_dir, op, unfinished_only=False, key=None):
+        """
+        :info: 查找某个操作最近的一次日志
+        :param unfinished_only: 只查找未完成的日志
+        :param key: 只查找计划参数相同的日志，见 plan_key
+        :return: MoveJournal 或 None
+        """
+        for journal_path in sorted(glob.glob(os.path.join(journal_dir, op + '-*.jsonl')), reverse=True):
+            # 先只读很小的日志判断状态与参数，只有选中的日志才读取完整的移动计划
+            journal = MoveJournal(journal_path).load_status()
+            if unfinished_only and journal.status != 'running':
+                continue
+            if key is not None and journal.key != key:
+                continue
+            return journal.load()
+        return None
+
+    @staticmethod
+    def create(journal_dir, op, moves, key=None):
+        """
+        :info: 写入移动计划并创建新的日志，文件名带毫秒与随机后缀，同一秒内的多次运行不会互相覆盖
+        :param moves: [(src, dst)]
+        :param key: 计划参数的摘要
+        """
+        os.makedirs(journal_dir, exist_ok=True)
+        now = time.time()
+        journal_path = os.path.join(journal_dir, '{}-{}{:03d}-{}.jsonl'.format(
+            op, time.strftime('%Y%m%d-%H%M%S', time.localtime(now)), int(now * 1000) % 1000, uuid.uuid4().hex[:8]))
+        journal = MoveJournal(journal_path)
+        tmp_path = journal.plan_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for src, dst in moves:
+                f.write(json.dumps([src, dst], ensure_ascii=False) + '\n')
+        os.replace(tmp_path, journal.plan_path)
+        journal.moves = list(moves)
+        journal._append({'status': 'running', 'total': len(journal.moves), 'key': key})
+        journal.status = 'running'
+        journal.key = key
+        return journal
+
+    def load(self):
+        """
+        :info: 读取移动计划与日志
+        """
+        with open(self.plan_path, encoding='utf-8') as f:
+            self.moves = [tuple(json.loads(line)) for line in f]
+        return self.load_status()
+
+    def load_status(self):
+        """
+        :info: 只读取日志中的状态、进度与参数摘要，不读取移动计划
+        """
+        self.committed = 0
+        self.status = 'new'
+        self.skipped = []
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时写了一半的记录
+                    break
+                if 'end' in record:
+                    self.committed = record['end']
+                if 'status' in record:
+                    self.status = record['status']
+                if 'key' in record:
+                    self.key = record['key']
+                self.skipped += record.get('skipped', [])
+        return self
+
+    def _append(self, record):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _move(src, dst):
+        """
+        :info: 幂等的移动，上次中断前已经移动过的文件直接跳过
+        :return: 'moved'，已移动过为 'done'，源文件不存在为 'skipped'
+        """
+        if not os.path.exists(src):
+            return 'done' if os.path.exists(dst) else 'skipped'
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src, dst)
+        return 'moved'
+
+    def execute(self, batch_size=1000):
+        """
+        :info: 从最后一个已提交的批次继续执行，每批结束追加一条提交记录
+        :return: 本次实际移动的文件数
+        """
+        if self.status != 'running':
+            print('[SKIP] Journal {} is {}.'.format(self.journal_path, self.status))
+            return 0
+        moved = 0
+        pbar = tqdm(range(self.committed, len(self.moves), batch_size))
+        for start in pbar:
+            end = min(start + batch_size, len(self.moves))
+            skipped = []
+            for src, dst in self.moves[start:end]:
+                result = self._move(src, dst)
+                if result == 'moved':
+                    moved += 1
+                elif result == 'skipped':
+                    skipped.append(src)
+            record = {'start': start, 'end': end}
+            if skipped:
+                record['skipped'] = skipped
+                self.skipped += skipped
+            self._append(record)
+            self.committed = end
+            pbar.set_description('Committed {}/{}'.format(end, len(self.moves)))
+        self._append({'status': 'done'})
+        self.status = 'done'
+        if self.skipped:
+            print('[WARNING] {} files no longer exist and were skipped.'.format(len(self.skipped)))
+        return moved
+
+    def rollback(self):
+        """
+        :info: 按相反顺序把已经移动的文件移回原位置
+        :return: 移回的文件数
+        """
+        restored = 0
+        for src, dst in tqdm(list(reversed(self.moves))):
+            if os.path.exists(dst) and not os.path.exists(src):
+                os.makedirs(os.path.dirname(src), exist_ok=True)
+                shutil.move(dst, src)
+                restored += 1
+        self._append({'status': 'rolled_back'})
+        self.status = 'rolled_back'
+        return restored
+
+
+def plan_key(op, args=None):
+    """
+    :info: 操作名称与计划参数的摘要，参数不同的未完成日志不会被续跑
+    """
+    text = json.dumps([op, args], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def run_moves(journal_dir, op, plan, batch_size=1000, resume=True, instrument=None, args=None):
+    """
+    :info: 执行一次带日志的批量移动，存在参数相同的未完成日志时从断点续跑而不重新生成计划
+    :param journal_dir: 日志目录
+    :param op: 操作名称
+    :param plan: 无参函数，返回 [(src, dst)]
+    :param batch_size: 每批移动的文件数
+    :param resume: 是否续跑未完成的日志
+    :param instrument: Instrumentation，移动记录为 transfer 阶段
+    :param args: 生成计划的参数(可json序列化)，只续跑参数相同的日志
+    :return: MoveJournal，计划为空时为不写入磁盘的空日志
+    """
+    key = plan_key(op, args)
+    journal = MoveJournal.latest(journal_dir, op, unfinished_only=True, key=key) if resume else None
+    if journal is not None:
+        print('[RESUME] {} from {}/{} moves.'.format(journal.journal_path, journal.committed, len(journal.moves)))
+    else:
+        if resume and MoveJournal.latest(journal_dir, op, unfinished_only=True) is not None:
+            print('[WARNING] An unfinished {} journal has different arguments, start a new one.'.format(op))
+        moves = plan()
+        if not moves:
+            # 没有需要移动的文件时不创建日志，返回的空日志不写入磁盘
+            print('[SKIP] Nothing to move for {}.'.format(op))
+            journal = MoveJournal(os.path.join(journal_dir, op + '.jsonl'))
+            journal.status = 'done'
+            return journal
+        journal = MoveJournal.create(journal_dir, op, moves, key)
+    if instrument is None:
+        moved = journal.execute(batch_size)
+    else:
+        with instrument.phase('transfer') as phase:
+            moved = journal.execute(batch_size)
+            phase.add(files=moved)
+    print('[FINISH] Moved {} files, journal: {}'.format(moved, journal.journal_path))
+    return journal
+
+
+def rollback_moves(journal_dir, op):
+    """
+    :info: 回滚某个操作最近的一次批量移动
+    """
+    journal = MoveJournal.latest(journal_dir, op)
+    if journal is None or journal.status == 'rolled_back':
+        print('Nothing to roll back for {}.'.format(op))
+        return None
+    restored = journal.rollback()
+    print('[FINISH] Restored {} files, journal: {}'.format(restored, journal.journal_path))
+    return journal
@@ -12,14 +12,31 @@ author: liusili
 import os
 import shutil
 from tqdm import tqdm
-from time import sleep
 import random
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
+from matplotlib.colors import LogNorm
 import numpy as np
 import xml.etree.ElementTree as ET
-from openpyxl import Workbook
 import time
+from DatasetIndex import DatasetIndex, get_cache_dir
+from VocReader import get_and_check
+from CompactDataset import CompactDataset
+from AnnotationStore import AnnotationStore
+from FileTransfer import TransferExecutor
+from XmlPipeline import XmlPipeline
+from DatasetStatistics import statistics_of_store
+from MoveJournal import run_moves, rollback_moves
+from DatasetJoin import join_datasets
+from DuplicateFinder import find_duplicates
+from DatasetSplit import split_dataset, kfold_dataset
+from ShardExport import export_shards
+from CocoExport import export_coco, export_npz
+from CategoryReport import category_rollups, write_category_report
+from IntegrityCheck import check_integrity
+from DatasetWatcher import DatasetWatcher
+from DatasetQuery import AnnotationQuery, Selection
+from Instrument import Instrumentation, instrumented
 
 
 def convert_img_format(sample_root, img_format=None, tar_format='.jpg'):
@@ -36,138 +53,264 @@ def convert_img_format(sample_root, img_format=None, tar_format='.jpg'):
 
 
 class PlayDataset(object):
-    def __init__(self, sample_root, img_format='.jpg', img_only=False):
+    def __init__(self, sample_root, img_format='.jpg', img_only=False,
+                 use_cache=True, rebuild=False, headless=False, output_dir=os.path.join('.', 'output'),
+                 instrument=None):
         """
         :param sample_root: 数据集根目录
         :param img_format: 数据图片格式，默认.jpg
         :param img_only: 数据只包含图片 默认False
-        """
-        self.sample_root = sample_root.rstrip("\\")
-        self.name = self.sample_root.split('\\')[-1]
+        :param use_cache: 使用 sample_root_cache 中的持久化索引，仅重新扫描有变化的目录
+        :param rebuild: 忽略已有索引强制全量扫描
+        :param headless: 无显示环境(定时任务/服务器)，只用Agg后端保存图片，不调用 show()
+        :param output_dir: 图片等输出文件的目录
+        :param instrument: Instrumentation，记录各方法分阶段的耗时、文件数与字节数
+        """
+        self.sample_root = sample_root.rstrip("\\").rstrip("/")
+        self.name = os.path.basename(self.sample_root)
         self.img_format = img_format
         self.img_only = img_only
-        self.dataset = self.__file_to_dict()
+        self.use_cache = use_cache
+        self.rebuild = rebuild
+        self.headless = headless
+        self.output_dir = output_dir
+        if headless:
+            plt.switch_backend('Agg')
+        self.annotations = None
+        # query() 的缓存，数据集或xml被本对象修改后置为 None
+        self.annotation_query = None
+        # merge_category 的合并关系 {原category: 合并后的category}
+        self.category_map = {}
+        self.instrument = instrument or Instrumentation()
+        with self.instrument.method(type(self).__name__, '__init__'):
+            self.dataset = self.__file_to_dict()
         self.time = time.strftime('(%Y-%m-%d)', time.localtime())
 
     def __file_to_dict(self):
-        dataset = {}
-        cnt = 0
-        for root, _, file_lst in os.walk(self.sample_root):
-            if len(file_lst) > 0:
-                category = root.split(self.sample_root + '\\')[-1]
-                dataset[category] = []
-                for file in file_lst:
-                    file_name = os.path.splitext(file)[0]
-                    image_path = os.path.join(root, file_name + self.img_format)
-                    xml_path = os.path.join(root, file_name + '.xml')
-                    if file_name not in dataset[category] and \
-                            (os.path.isfile(xml_path) or self.img_only)\
-                            and os.path.isfile(image_path):
-                        dataset[category].append(file_name)
-                        cnt += 1
-        print('The quantity of all valid images is {}'.format(cnt))
-        return dataset
-
-    def count_category(self):
-        """
-        :info: 统计每类数量，如果是多级文件则统计所有子类数量，并且输出xlsx表格文件
-        """
-        output_dir = '.\\output'
-        table_path = os.path.join(output_dir, self.name+'_category_quantity.xlsx')
-        wb = Workbook()
-        sheet = wb.active
-        sheet.title = 'Category Quantity'
-        for category, name_lst in self.dataset.items():
-            quantity = len(name_lst)
-            print('Quantity of category [{}]: {}'.format(category, quantity))
-            row = category.split('\\') + [quantity]
-            sheet.append(row)
-        wb.save(table_path)
-        wb.close()
-        print("[FINISH] The result has been saved at path: {}".format(table_path))
-
-    def gather_data(self):
+        # 索引中的文件名是 str 列表，只用于生成紧凑字典，不随对象保留
+        index = DatasetIndex(self.sample_root, self.img_format, self.img_only)
+        with self.instrument.phase('scan') as phase:
+            if self.use_cache:
+                index.update(rebuild=self.rebuild)
+            else:
+                index.build()
+            phase.add(files=index.num_valid)
+        index.summary()
+        return CompactDataset.from_index(index)
+
+    def watch(self, interval=2.0, address=None, use_inotify=True):
+        """
+        :info: 启动后台线程持续更新数据集索引，通过返回对象的 counts(), files(), dataset() 查询
+        :param interval: 轮询间隔(秒)
+        :param address: (host, port)，不为 None 时同时启动本地 socket 服务
+        :param use_inotify: Linux 下使用 inotify 立即感知变化
+        :return: DatasetWatcher，使用完后调用 stop()
+        """
+        watcher = DatasetWatcher(self.sample_root, self.img_format, self.img_only, interval, use_inotify)
+        return watcher.start(address)
+
+    @instrumented
+    def count_category(self, fmt='xlsx', output_path=None):
+        """
+        :info: 统计每类数量，如果是多级文件则同时统计每一层父目录的汇总数量，逐行写出表格文件；
+               表格列为 category, level, quantity, total，按目录层级排序，子目录在父目录之前，
+               与原来每行为 category 各级名称加数量的格式不同
+        :param fmt: 'xlsx' | 'csv' | 'json'
+        :param output_path: 输出文件，默认 output_dir/name_category_quantity.fmt
+        :return: 输出文件路径
+        """
+        if output_path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            output_path = os.path.join(self.output_dir, '{}_category_quantity.{}'.format(self.name, fmt))
+
+        def rows():
+            for row in category_rollups(self.dataset):
+                if row[0] in self.dataset:
+                    print('Quantity of category [{}]: {}'.format(row[0], row[2]))
+                yield row
+
+        with self.instrument.phase('write') as phase:
+            phase.add(files=write_category_report(rows(), output_path, fmt))
+        print("[FINISH] The result has been saved at path: {}".format(output_path))
+        return output_path
+
+    @instrumented
+    def gather_data(self, threads=8, queue_depth=64, mode='copy', dataset=None):
         """
         :info: 将所有子文件的数据放到同一个目录下
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :param dataset: 只处理其中的数据，{category: [file_name]} 或 query() 得到的 Selection，默认整个数据集
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
         """
         new_path = os.path.join(self.sample_root+'_gather', 'all')
         os.makedirs(new_path, exist_ok=False)
-        pbar = tqdm(self.dataset.items())
-        for category, file_lst in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            for file_name in file_lst:
-                image_path = os.path.join(category_path, file_name + self.img_format)
-                new_image = os.path.join(new_path, file_name + self.img_format)
-                shutil.copyfile(image_path, new_image)
-                if not self.img_only:
-                    xml_path = os.path.join(category_path, file_name + '.xml')
-                    new_xml = os.path.join(new_path, file_name + '.xml')
-                    shutil.copyfile(xml_path, new_xml)
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(0.5)
+        with TransferExecutor(threads, queue_depth, 'gather', mode, self.instrument) as transfer:
+            pbar = tqdm(self.__select(dataset).items())
+            for category, file_lst in pbar:
+                category_path = os.path.join(self.sample_root, category)
+                for file_name in file_lst:
+                    image_path = os.path.join(category_path, file_name + self.img_format)
+                    new_image = os.path.join(new_path, file_name + self.img_format)
+                    transfer.submit(image_path, new_image)
+                    if not self.img_only:
+                        xml_path = os.path.join(category_path, file_name + '.xml')
+                        new_xml = os.path.join(new_path, file_name + '.xml')
+                        transfer.submit(xml_path, new_xml)
+                pbar.set_description('Processing category:{}'.format(category))
         print('[FINISH] Gathering the data is done.')
+        return transfer
 
+    @instrumented
     def sample_data(self,
                     num_of_samples,
                     dir_name='sample',
+                    threads=8,
+                    queue_depth=64,
+                    mode='copy',
+                    seed=None,
+                    dataset=None,
                     **sample_dict):
         """
         :info: 对数据集进行随机采样，生成新的数据集
         :param dir_name: 采样文件夹的名称后缀
         :param num_of_samples:采样数量
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :param seed: 随机种子，不影响全局 random 状态，也不改变 self.dataset
+        :param dataset: 只从其中采样，{category: [file_name]} 或 query() 得到的 Selection，默认整个数据集
         :param sample_dict: 这里可以添加特殊category的采样数量，比如类似 A2WBD=800
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
         """
+        rng = random.Random(seed)
         new_path = self.sample_root + '_' + dir_name
         others_path = new_path + '_others'
         os.makedirs(new_path, exist_ok=False)
         os.makedirs(others_path, exist_ok=False)
 
-        for category, sample_lst in self.dataset.items():
-            category_path = os.path.join(self.sample_root, category)
-            sample_category_path = os.path.join(new_path, category)
-            sample_others_category_path = os.path.join(others_path, category)
-            os.makedirs(sample_category_path, exist_ok=True)
-
-            if category in sample_dict:
-                num_of_samples = sample_dict[category]
-
-            random.shuffle(sample_lst)
-            sample_others_lst = None
-            if len(sample_lst) > num_of_samples:
-                # 截取未抽样到的图片到others
-                sample_others_lst = sample_lst[num_of_samples:]
-                sample_lst = sample_lst[:num_of_samples]
-
-            print("---Start sampling dataset---")
-            pbar = tqdm(sample_lst)
-            for file_name in pbar:
-                image_path = os.path.join(category_path, file_name + self.img_format)
-                new_image = os.path.join(sample_category_path, file_name + self.img_format)
-                shutil.copyfile(image_path, new_image)
-                if not self.img_only:
-                    xml_path = os.path.join(category_path, file_name + '.xml')
-                    new_xml = os.path.join(sample_category_path, file_name + '.xml')
-                    shutil.copyfile(xml_path, new_xml)
-
-                pbar.set_description('Processing category:{}'.format(category))
-
-            if not sample_others_lst:
-                continue
-            os.makedirs(sample_others_category_path, exist_ok=True)
-            print("---Start saving other data---")
-            pbar = tqdm(sample_others_lst)
-            for file_name in pbar:
-                image_path = os.path.join(category_path, file_name + self.img_format)
-                new_image = os.path.join(sample_others_category_path, file_name + self.img_format)
-                shutil.copyfile(image_path, new_image)
-                if not self.img_only:
-                    xml_path = os.path.join(category_path, file_name + '.xml')
-                    new_xml = os.path.join(sample_others_category_path, file_name + '.xml')
-                    shutil.copyfile(xml_path, new_xml)
-
-                pbar.set_description('Processing category:{}'.format(category))
-        sleep(0.5)
+        with TransferExecutor(threads, queue_depth, 'sample', mode, self.instrument) as transfer:
+            for category, name_lst in self.__select(dataset).items():
+                category_path = os.path.join(self.sample_root, category)
+                sample_category_path = os.path.join(new_path, category)
+                sample_others_category_path = os.path.join(others_path, category)
+                os.makedirs(sample_category_path, exist_ok=True)
+
+                quota = sample_dict.get(category, num_of_samples)
+
+                sample_lst = list(name_lst)
+                rng.shuffle(sample_lst)
+                sample_others_lst = None
+                if len(sample_lst) > quota:
+                    # 截取未抽样到的图片到others
+                    sample_others_lst = sample_lst[quota:]
+                    sample_lst = sample_lst[:quota]
+
+                print("---Start sampling dataset---")
+                pbar = tqdm(sample_lst)
+                for file_name in pbar:
+                    image_path = os.path.join(category_path, file_name + self.img_format)
+                    new_image = os.path.join(sample_category_path, file_name + self.img_format)
+                    transfer.submit(image_path, new_image)
+                    if not self.img_only:
+                        xml_path = os.path.join(category_path, file_name + '.xml')
+                        new_xml = os.path.join(sample_category_path, file_name + '.xml')
+                        transfer.submit(xml_path, new_xml)
+
+                    pbar.set_description('Processing category:{}'.format(category))
+
+                if not sample_others_lst:
+                    continue
+                os.makedirs(sample_others_category_path, exist_ok=True)
+                print("---Start saving other data---")
+                pbar = tqdm(sample_others_lst)
+                for file_name in pbar:
+                    image_path = os.path.join(category_path, file_name + self.img_format)
+                    new_image = os.path.join(sample_others_category_path, file_name + self.img_format)
+                    transfer.submit(image_path, new_image)
+                    if not self.img_only:
+                        xml_path = os.path.join(category_path, file_name + '.xml')
+                        new_xml = os.path.join(sample_others_category_path, file_name + '.xml')
+                        transfer.submit(xml_path, new_xml)
+
+                    pbar.set_description('Processing category:{}'.format(category))
         print('[FINISH] Data sampling has been finished.')
+        return transfer
+
+    @instrumented
+    def split_dataset(self, ratios=(0.8, 0.1, 0.1), names=('train', 'val', 'test'), seed=0,
+                      num_of_samples=None, output_dir=None, **sample_dict):
+        """
+        :info: 按类别分层划分 train/val/test，只写清单文件不拷贝图片
+        :param ratios: 各划分的比例
+        :param names: 划分名称
+        :param seed: 随机种子，相同的数据集与种子得到相同的划分
+        :param num_of_samples: 每个类别参与划分的最大数量，默认全部
+        :param output_dir: 清单目录，默认 sample_root_split
+        :param sample_dict: 特殊category的配额，例如 A2WBD=800 或 A2WBD=(600, 100, 100)
+        :return: DatasetSplit
+        """
+        split = split_dataset(self.physical_dataset(), ratios, names, seed, num_of_samples, sample_dict,
+                              self.category_map)
+        split.write_manifests(output_dir or self.sample_root + '_split', self.img_format)
+        return split
+
+    @instrumented
+    def kfold_dataset(self, k=5, seed=0, num_of_samples=None, output_dir=None, **sample_dict):
+        """
+        :info: 按类别分层的 k-fold 划分，每折写 foldN_train.txt 与 foldN_val.txt 两个清单
+        :param k: 折数
+        :param seed: 随机种子
+        :param num_of_samples: 每个类别参与划分的最大数量，默认全部
+        :param output_dir: 清单目录，默认 sample_root_kfold
+        :param sample_dict: 特殊category参与划分的数量，例如 A2WBD=800
+        :return: DatasetSplit
+        """
+        split = kfold_dataset(self.physical_dataset(), k, seed, num_of_samples, sample_dict, self.category_map)
+        split.write_manifests(output_dir or self.sample_root + '_kfold', self.img_format, kfold=True)
+        return split
+
+    @instrumented
+    def export_annotations(self, output_path=None, fmt='coco', workers=1, chunk=10000):
+        """
+        :info: 导出整个数据集的标注，xml由 load_annotations 并行解析(未变化的直接使用缓存)，按 merge_category 合并类别
+        :param output_path: 输出文件，默认 output_dir/name_coco.json 或 output_dir/name_annotations.npz
+        :param fmt: 'coco' 或 'npz'
+        :param workers: 解析xml的进程数
+        :param chunk: coco 格式每次写出的图片数
+        :return: 输出文件路径
+        """
+        assert fmt in ('coco', 'npz'), 'fmt should be coco or npz.'
+        store = self.load_annotations(workers)
+        if output_path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            suffix = '_coco.json' if fmt == 'coco' else '_annotations.npz'
+            output_path = os.path.join(self.output_dir, self.name + suffix)
+        with self.instrument.phase('write') as phase:
+            if fmt == 'coco':
+                export_coco(store, output_path, self.img_format, self.category_map, chunk)
+            else:
+                export_npz(store, output_path, self.img_format, self.category_map)
+            phase.add(files=len(store), num_bytes=os.path.getsize(output_path))
+        return output_path
+
+    @instrumented
+    def export_shards(self, output_dir=None, samples_per_shard=10000, workers=4, dataset=None):
+        """
+        :info: 把图片原始字节与解析后的标注打包成大文件，训练时用 ShardReader 读取
+        :param output_dir: 输出目录，默认 sample_root_shards
+        :param samples_per_shard: 每个 shard 的样本数
+        :param workers: 进程数，每个 shard 由一个进程写出
+        :param dataset: 只导出其中的数据，例如 split.subset('train')，默认整个数据集(合并前的目录)
+        :return: 输出目录
+        """
+        output_dir = output_dir or self.sample_root + '_shards'
+        with self.instrument.phase('write') as phase:
+            num = export_shards(self.sample_root, dataset or self.physical_dataset(), output_dir, self.img_format,
+                                self.img_only, samples_per_shard, workers)
+            phase.add(files=num)
+        return output_dir
 
     def merge_category(self, **merge_dict):
         """
@@ -180,14 +323,28 @@ class PlayDataset(object):
             for category in category_lst:
                 if category in self.dataset and category != merge_category:
                     self.dataset[merge_category] += self.dataset.pop(category)
+                    for source, target in self.category_map.items():
+                        if target == category:
+                            self.category_map[source] = merge_category
+                    self.category_map[category] = merge_category
                 else:
                     print('Skip merging category {}.'.format(category))
 
+    def physical_dataset(self):
+        """
+        :info: 按磁盘上的目录还原合并前的数据集字典，合并后删除/移走的文件不包含在内
+        :return: {目录category: [file_name]}
+        """
+        if not self.category_map:
+            return self.dataset
+        return self.dataset.physical()
+
     def plot_dist_of_dataset(self, control_line):
         """
         :info: 绘制缺陷数量分布图
         :param control_line: 数量控制线
         """
+        start = time.time()
         labels = []
         count = []
         for category in sorted(self.dataset.keys()):
@@ -225,242 +382,409 @@ class PlayDataset(object):
                         ha='center', va='bottom')
 
         fig.tight_layout()
-        output_dir = '.\\output'
-        os.makedirs(output_dir, exist_ok=True)
-        save_path = os.path.join(output_dir, self.name + '_categoryCount.png')
-        plt.savefig(save_path, facecolor='papayawhip', bbox_inches='tight', dpi=300)
-        plt.show()
-
-    @staticmethod
-    def get_and_check(root, name, length):
-        """
-        :param root: Element-tree 根节点
-        :param name: 需要返回的子节点名称
-        :param length: 确认子节点长度
-        """
-        var_lst = root.findall(name)
-        if len(var_lst) == 0:
-            raise NotImplementedError('Can not find %s in %s.' % (name, root.tag))
-        if (length > 0) and (len(var_lst) != length):
-            raise NotImplementedError('The size of %s is supposed to be %d, but is %d.'
-                                      % (name, length, len(var_lst)))
-        if length == 1:
-            var_lst = var_lst[0]
-        return var_lst
-
-    def info_img_and_category(self):
+        self.__save_figure(fig, '_categoryCount.png', len(labels), start)
+
+    def __save_figure(self, fig, file_name, points, start):
         """
-        :info: 打印图片以及类别的基本特征，大小以及bbox的坐标分布范围
+        :info: 保存图片并记录绘制耗时与点数，非 headless 模式下显示
         """
-        assert not self.img_only, "This method needs xml files."
-        width_min = height_min = bbox_xmin = bbox_ymin = 100000
-        width_max = height_max = bbox_xmax = bbox_ymax = 0
-        bbox_center_x_dict = {}
-        bbox_center_y_dict = {}
-
-        area_lst = []
-        for category, name_lst in self.dataset.items():
-            category_path = os.path.join(self.sample_root, category)
-            bbox_center_x_dict[category] = []
-            bbox_center_y_dict[category] = []
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-                size = self.get_and_check(root, 'size', 1)
-                width = int(self.get_and_check(size, 'width', 1).text)
-                height = int(self.get_and_check(size, 'height', 1).text)
-
-                width_min = min(width, width_min)
-                width_max = max(width, width_max)
-                height_min = min(height, height_min)
-                height_max = max(height, height_max)
+        os.makedirs(self.output_dir, exist_ok=True)
+        save_path = os.path.join(self.output_dir, self.name + file_name)
+        fig.savefig(save_path, facecolor='papayawhip', bbox_inches='tight', dpi=300)
+        print('[RENDER] {} points in {:.2f}s, saved at path: {}'.format(points, time.time() - start, save_path))
+        if not self.headless:
+            plt.show()
+        plt.close(fig)
+        return save_path
 
-                for obj in root.findall('object'):
-                    bbox = self.get_and_check(obj, 'bndbox', 1)
-                    xmin = int(self.get_and_check(bbox, 'xmin', 1).text)
-                    ymin = int(self.get_and_check(bbox, 'ymin', 1).text)
-                    xmax = int(self.get_and_check(bbox, 'xmax', 1).text)
-                    ymax = int(self.get_and_check(bbox, 'ymax', 1).text)
-
-                    area = (xmax - xmin + 1) * (ymax - ymin + 1)
-                    area_lst.append(area)
-
-                    center_x = (xmin + xmax) // 2
-                    center_y = (ymin + ymax) // 2
+    def query(self, workers=1, refresh=False):
+        """
+        :info: 在标注列数据上建立排序索引的查询，例如
+               data.query().objects(cls='A2WBD', max_area=400) & data.query().num_objects(min_num=4)
+        :param workers: 解析xml的进程数
+        :param refresh: 重新与磁盘同步，xml在本对象之外被修改时使用
+        :return: AnnotationQuery，各查询返回 Selection；多次调用返回同一个对象，排序索引只建一次；
+                 标注重新同步且行号变化后，之前的 Selection 在使用时抛出 ValueError
+        """
+        if self.annotation_query is None or refresh:
+            store = self.load_annotations(workers)
+            if self.annotation_query is None or self.annotation_query.store is not store:
+                self.annotation_query = AnnotationQuery(store)
+        return self.annotation_query
 
-                    bbox_center_x_dict[category].append(center_x)
-                    bbox_center_y_dict[category].append(center_y)
+    def __select(self, dataset):
+        """
+        :info: 把 Selection 或数据集字典统一为数据集字典，None 表示整个数据集
+        """
+        if dataset is None:
+            return self.dataset
+        if isinstance(dataset, Selection):
+            return dataset.to_dataset()
+        return dataset
 
-                    bbox_xmin = min(xmin, bbox_xmin)
-                    bbox_ymin = min(ymin, bbox_ymin)
-                    bbox_xmax = max(xmax, bbox_xmax)
-                    bbox_ymax = max(ymax, bbox_ymax)
+    def pipeline(self):
+        """
+        :info: 创建xml流水线，将多个操作合并为一次遍历，例如
+               data.pipeline().correct_category().reset_difficult().delete_no_bbox_xml().correct_dataset().run()
+        :return: XmlPipeline
+        """
+        return XmlPipeline(self)
 
-        # 绘制bbox中心散点图
-        fig, ax = plt.subplots()
-        fig.set_facecolor('papayawhip')
-        ax.set_xlim(left=0, right=width_max)
-        ax.set_ylim(bottom=height_max, top=0)
-        ax.xaxis.tick_top()  # 将x坐标轴移到上方
-        ax.set_title('<{}> Distribution of BundingBox Center'.format(self.name))
-        plt.grid(alpha=0.75, linestyle='--')
-        for category in sorted(bbox_center_x_dict.keys()):
-            ax.scatter(bbox_center_x_dict[category], bbox_center_y_dict[category],
-                       marker='.', label=category)
-        plt.legend(bbox_to_anchor=(1.05, 0), loc=3, borderaxespad=0)
-
-        output_dir = '.\\output'
-        os.makedirs(output_dir, exist_ok=True)
-        save_path = os.path.join(output_dir, self.name + '_CodeDistribution.png')
-        plt.savefig(save_path, facecolor='papayawhip', bbox_inches='tight', dpi=300)
-        plt.show()
-
-        # 绘制缺陷面积分布直方图
-        fig, ax = plt.subplots()
-        fig.set_facecolor('papayawhip')
-        n, bins, patches = ax.hist(x=area_lst, bins=15, color='SkyBlue', edgecolor='k')
-        plt.grid(axis='y', alpha=0.75)
-        for index, num in enumerate(n):
-            num = int(num)
-            ax.annotate('{}'.format(num), xy=((bins[index] + bins[index + 1]) / 2, num),
-                        xytext=(0, 0), textcoords="offset points",
-                        ha='center', va='bottom')
-        ax.set_xticks(bins)
-        ax = plt.gca()
-        for label in ax.xaxis.get_ticklabels():
-            label.set_rotation(45)
-        ax.set_xlabel('CodeArea')
-        ax.set_ylabel('Frequency')
-        ax.set_title('<{}> Code Area Frequency'.format(self.name))
-        save_path = os.path.join(output_dir, self.name + '_CodeAreaFrequency.png')
-        plt.savefig(save_path, facecolor='papayawhip', bbox_inches='tight', dpi=300)
-        plt.show()
-
-        if width_min == width_max and height_min == height_max:
-            print('图片的大小恒定为：width={}像素，height={}像素'.format(width_min, height_min))
+    def load_annotations(self, workers=1):
+        """
+        :info: 读取列式标注缓存并与当前数据集同步，只重新解析有变化的xml
+        :param workers: 解析xml的进程数
+        :return: AnnotationStore
+        """
+        assert not self.img_only, "This method needs xml files."
+        if self.annotations is None:
+            self.annotations = AnnotationStore(self.sample_root)
+        version = self.annotations.version
+        with self.instrument.phase('parse') as phase:
+            self.annotations.update(self.physical_dataset(), workers)
+            # 与缓存核对过的xml都计入，重新解析的数量见 AnnotationStore.parsed
+            phase.add(files=len(self.annotations))
+        # 行号变化后，之前得到的 Selection 在使用时会报错，需要重新查询
+        if self.annotations.changed or self.annotations.version != version:
+            self.annotation_query = None
+        return self.annotations
+
+    @instrumented
+    def info_img_and_category(self, workers=1, plot=True, density_threshold=20000):
+        """
+        :info: 打印图片以及类别的基本特征，大小以及bbox的坐标分布范围
+        :param workers: 解析xml的进程数
+        :param plot: 是否绘制bbox中心分布图以及面积直方图
+        :param density_threshold: bbox数量超过该值时中心分布以密度图代替散点图
+        :return: DatasetStats，包含尺寸范围、面积直方图以及每类的中心点二维直方图
+        """
+        assert not self.img_only, "This method needs xml files."
+        store = self.load_annotations(workers)
+        stats = statistics_of_store(store, max_points=density_threshold)
+
+        if plot:
+            # 绘制bbox中心分布图，点数较多时绘制二维直方图(密度图)
+            start = time.time()
+            fig, ax = plt.subplots()
+            fig.set_facecolor('papayawhip')
+            ax.set_title('<{}> Distribution of BundingBox Center'.format(self.name))
+            truncated = any(c.truncated for c in stats.categories.values())
+            if truncated or stats.num_objects > density_threshold:
+                rows = max([c.center_hist.shape[0] for c in stats.categories.values()] + [1])
+                cols = max([c.center_hist.shape[1] for c in stats.categories.values()] + [1])
+                density = np.zeros((rows, cols), dtype=np.int64)
+                for category_stats in stats.categories.values():
+                    r, c = category_stats.center_hist.shape
+                    density[:r, :c] += category_stats.center_hist
+                image = ax.imshow(np.ma.masked_equal(density, 0), cmap='viridis', norm=LogNorm(),
+                                  extent=(0, cols * stats.cell, rows * stats.cell, 0),
+                                  interpolation='nearest', aspect='auto')
+                fig.colorbar(image, ax=ax, label='Count')
+            else:
+                for category in sorted(stats.categories.keys()):
+                    category_stats = stats.categories[category]
+                    ax.scatter(category_stats.points_x, category_stats.points_y,
+                               marker='.', label=category)
+                plt.legend(bbox_to_anchor=(1.05, 0), loc=3, borderaxespad=0)
+            ax.set_xlim(left=0, right=stats.width_max)
+            ax.set_ylim(bottom=stats.height_max, top=0)
+            ax.xaxis.tick_top()  # 将x坐标轴移到上方
+            ax.grid(alpha=0.75, linestyle='--')
+            self.__save_figure(fig, '_CodeDistribution.png', stats.num_objects, start)
+
+            # 绘制缺陷面积分布直方图，横轴为固定的2的幂区间
+            area_hist = stats.area_hist
+            nonzero = np.flatnonzero(area_hist)
+            first, last = (nonzero[0], nonzero[-1] + 1) if len(nonzero) else (0, 1)
+            n = area_hist[first:last]
+            bins = stats.area_edges[first:last + 1]
+            x = np.arange(len(n))
+            start = time.time()
+            fig, ax = plt.subplots()
+            fig.set_facecolor('papayawhip')
+            ax.bar(x, n, width=1, align='edge', color='SkyBlue', edgecolor='k')
+            plt.grid(axis='y', alpha=0.75)
+            for index, num in enumerate(n):
+                ax.annotate('{}'.format(int(num)), xy=(index + 0.5, num),
+                            xytext=(0, 0), textcoords="offset points",
+                            ha='center', va='bottom')
+            ax.set_xticks(np.arange(len(bins)))
+            ax.set_xticklabels(bins, rotation=45)
+            ax.set_xlabel('CodeArea')
+            ax.set_ylabel('Frequency')
+            ax.set_title('<{}> Code Area Frequency'.format(self.name))
+            self.__save_figure(fig, '_CodeAreaFrequency.png', len(n), start)
+
+        if stats.width_min == stats.width_max and stats.height_min == stats.height_max:
+            print('图片的大小恒定为：width={}像素，height={}像素'.format(stats.width_min, stats.height_min))
         else:
             print('图片大小不恒定：width_max={}，width_min={}; height_max={}, height_min={}'
-                  .format(width_max, width_min, height_max, height_min))
+                  .format(stats.width_max, stats.width_min, stats.height_max, stats.height_min))
 
         print('BundingBox的取值范围：bbox_xmin={}, bbox_ymin={}, bbox_xmax={}, bbox_ymax={}'
-              .format(bbox_xmin, bbox_ymin, bbox_xmax, bbox_ymax))
+              .format(stats.bbox_xmin, stats.bbox_ymin, stats.bbox_xmax, stats.bbox_ymax))
+        if stats.out_of_range:
+            print('[WARNING] {} bounding boxes have centers outside the image and are not in the center histogram.'
+                  .format(stats.out_of_range))
+        return stats
 
+    @instrumented
     def delete_no_bbox_xml(self):
         """
         :info: 删除没有bbox信息的XML文件
         """
         assert not self.img_only, "This method needs xml files."
+        store = self.load_annotations()
+        empty = {}
+        for image_id in np.flatnonzero(store.images['num_obj'] == 0).tolist():
+            empty.setdefault(store.category(image_id), []).append(store.file_name(image_id))
         cnt = 0
-        sleep(0.5)
         print("---Start deleting no bbox xml---")
-        pbar = tqdm(self.dataset.items())
-        for category, name_lst in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-                if len(root.findall('object')) == 0:
-                    os.remove(xml_path)
-                    self.dataset[category].remove(file_name)
+        pbar = tqdm(list(empty.items()))
+        with self.instrument.phase('write') as phase:
+            for source, name_lst in pbar:
+                # store 中是磁盘目录，合并后按合并关系找到数据集中的类别，先更新数据集再删除文件
+                self.dataset.discard(self.category_map.get(source, source), source, name_lst)
+                for file_name in name_lst:
+                    os.remove(os.path.join(self.sample_root, source, file_name + '.xml'))
                     cnt += 1
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(0.5)
+                pbar.set_description('Processing category:{}'.format(source))
+            phase.add(files=cnt)
+        self.annotation_query = None
         if cnt == 0:
             print('Nothing has been deleted.')
         print("---End deleting no bbox xml---")
         print('[FINISH] Delete XML file without bunding box.')
 
-    def move_file_lack_info(self):
+    def __journal_dir(self):
+        return os.path.join(get_cache_dir(self.sample_root), 'journal')
+
+    def __forget(self, moves):
+        """
+        :info: 从数据集中去掉已经移出 sample_root 的文件
+        """
+        removed = {}
+        for src, _ in moves:
+            source = os.path.relpath(os.path.dirname(src), self.sample_root)
+            removed.setdefault(source, set()).add(os.path.splitext(os.path.basename(src))[0])
+        # 按 (磁盘目录, 文件名) 删除，合并后其他目录中的同名文件保留
+        for source, name_set in removed.items():
+            category = self.category_map.get(source, source)
+            if category in self.dataset:
+                self.dataset.discard(category, source, name_set)
+        self.annotation_query = None
+
+    def rollback_moves(self, op):
+        """
+        :info: 回滚最近一次带日志的移动操作
+        :param op: 操作名称 'move_file_lack_info', 'move_difficult_data', 'move_multi_defect_data',
+                   'find_duplicates', 'check_integrity' 或 'move_selection'
+        """
+        return rollback_moves(self.__journal_dir(), op)
+
+    @instrumented
+    def move_file_lack_info(self, batch_size=1000, resume=True):
         """
         :info: 移动没有标签的图片或者没有对应图片的标签到新的文件夹下
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
         """
         assert not self.img_only, "This method needs xml files."
         new_path = self.sample_root + '_lack_info'
-        sleep(0.5)
+
+        def plan():
+            moves = []
+            for category in os.listdir(self.sample_root):
+                category_path = os.path.join(self.sample_root, category)
+                new_category_path = os.path.join(new_path, category)
+                name_set = set(self.dataset.get(category, []))
+                for file in os.listdir(category_path):
+                    file_name = os.path.splitext(file)[0]
+                    if file_name not in name_set:
+                        moves.append((os.path.join(category_path, file),
+                                      os.path.join(new_category_path, file)))
+            return moves
+
         print("---Start moving file lack of information---")
-        pbar = tqdm(os.listdir(self.sample_root))
-        for category in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            new_category_path = os.path.join(new_path, category)
-            for file in os.listdir(category_path):
-                file_name = os.path.splitext(file)[0]
-                if file_name not in self.dataset[category]:
-                    os.makedirs(new_category_path, exist_ok=True)
-                    file_path = os.path.join(category_path, file)
-                    new_file_path = os.path.join(new_category_path, file)
-                    shutil.move(file_path, new_file_path)
-            pbar.set_description('Processing category:{}'.format(category))
+        run_moves(self.__journal_dir(), 'move_file_lack_info', plan, batch_size, resume,
+                  self.instrument)
         print("---End moving file lack of information---")
         print('[FINISH] Move file without complete information.')
 
-    def move_difficult_data(self, target_path):
+    @instrumented
+    def check_integrity(self, threads=8, workers=1, quarantine=False, batch_size=1000, resume=True):
+        """
+        :info: 读取图片文件头检查截断、真实宽高与xml中 size 是否一致、bbox 是否超出图片范围
+        :param threads: 读取文件头的线程数
+        :param workers: 解析xml的进程数
+        :param quarantine: 将有问题的图片及标签移动到 sample_root_lack_info 下
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
+        :return: IntegrityReport
+        """
+        store = None if self.img_only else self.load_annotations(workers)
+        with self.instrument.phase('scan') as phase:
+            report = check_integrity(self.sample_root, self.physical_dataset(), self.img_format, store, threads)
+            phase.add(files=report.num_files)
+        report.summary()
+        if not quarantine:
+            return report
+        new_path = self.sample_root + '_lack_info'
+        exts = [self.img_format] if self.img_only else [self.img_format, '.xml']
+
+        def plan():
+            moves = []
+            for category, file_name in report.bad:
+                for ext in exts:
+                    moves.append((os.path.join(self.sample_root, category, file_name + ext),
+                                  os.path.join(new_path, category, file_name + ext)))
+            return moves
+
+        print("---Start moving broken files---")
+        journal = run_moves(self.__journal_dir(), 'check_integrity', plan, batch_size, resume,
+                            self.instrument)
+        self.__forget(journal.moves)
+        print("---End moving broken files---")
+        return report
+
+    @instrumented
+    def move_selection(self, dataset, dir_name='selected', batch_size=1000, resume=True):
+        """
+        :info: 将选中的图片以及标签移动到 sample_root_dir_name 下，保持原有目录结构
+        :param dataset: {category: [file_name]} 或 query() 得到的 Selection
+        :param dir_name: 目标文件夹的名称后缀
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
+        """
+        new_path = self.sample_root + '_' + dir_name
+        exts = [self.img_format] if self.img_only else [self.img_format, '.xml']
+        selected = self.__select(dataset)
+
+        def plan():
+            moves = []
+            for category, name_lst in selected.items():
+                for file_name in name_lst:
+                    for ext in exts:
+                        moves.append((os.path.join(self.sample_root, category, file_name + ext),
+                                      os.path.join(new_path, category, file_name + ext)))
+            return moves
+
+        print("---Start moving selected files---")
+        args = {'dir_name': dir_name,
+                'dataset': {category: sorted(name_lst) for category, name_lst in selected.items()}}
+        journal = run_moves(self.__journal_dir(), 'move_selection', plan, batch_size, resume,
+                            self.instrument, args)
+        self.__forget(journal.moves)
+        print("---End moving selected files---")
+
+    @instrumented
+    def find_duplicates(self, threads=8, use_cache=True, quarantine=False, batch_size=1000, resume=True):
+        """
+        :info: 查找内容完全相同的图片，分别列出类别内以及跨类别的重复
+        :param threads: 计算哈希的线程数
+        :param use_cache: 使用 sample_root_cache 中缓存的哈希值，未变化的文件不再读取
+        :param quarantine: 每组保留第一个，其余图片及标签移动到 sample_root_duplicate 下
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
+        :return: DuplicateReport
+        """
+        with self.instrument.phase('parse') as phase:
+            report = find_duplicates(self.sample_root, self.physical_dataset(), self.img_format, threads, use_cache)
+            phase.add(files=report.num_hashed)
+        report.summary()
+        if not quarantine:
+            return report
+        new_path = self.sample_root + '_duplicate'
+        exts = [self.img_format] if self.img_only else [self.img_format, '.xml']
+
+        def plan():
+            moves = []
+            for category, file_name in report.redundant:
+                for ext in exts:
+                    moves.append((os.path.join(self.sample_root, category, file_name + ext),
+                                  os.path.join(new_path, category, file_name + ext)))
+            return moves
+
+        print("---Start moving duplicate files---")
+        journal = run_moves(self.__journal_dir(), 'find_duplicates', plan, batch_size, resume,
+                            self.instrument)
+        self.__forget(journal.moves)
+        print("---End moving duplicate files---")
+        return report
+
+    @instrumented
+    def move_difficult_data(self, target_path, batch_size=1000, resume=True):
         """
         :info: sample_root 目录结构：/原category/现category/复判图片.jpg; 将target_path中的对应信息存放至新的文件夹下
         :param target_path: 目标文件夹，原数据目录
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
         :return:
         """
-        cnt = 0
         target_path = target_path[:-1] if target_path.endswith('\\') else target_path
         new_path = target_path + '_difficult' + self.time
+
+        def plan():
+            # 原数据目录只建一次索引，与复判数据按 (原category, 文件名) 哈希连接，不再逐个 stat
+            with self.instrument.phase('scan') as phase:
+                target_index = DatasetIndex(target_path, self.img_format).build()
+                phase.add(files=target_index.num_valid)
+            source = {category: name_lst for category, name_lst in self.dataset.items()
+                      if len(category.split(os.sep)) >= 2}
+            join = join_datasets(source, target_index.to_dict(keep_empty=False),
+                                 source_key=lambda category: category.split(os.sep)[0])
+            join.summary()
+            moves = []
+            for category, ori_cate, file_name in join.matched:
+                category_path = os.path.join(target_path, ori_cate)
+                new_category_path = os.path.join(new_path, category.split(os.sep)[1])
+                for ext in ('.xml', self.img_format):
+                    moves.append((os.path.join(category_path, file_name + ext),
+                                  os.path.join(new_category_path, file_name + ext)))
+            return moves
+
         print("---Start moving difficult data---")
-        sleep(1)
-        pbar = tqdm(self.dataset.items())
-        for category, name_lst in pbar:
-            ori_cate = category.split('\\')[0]
-            new_cate = category.split('\\')[1]
-            category_path = os.path.join(target_path, ori_cate)
-            new_category_path = os.path.join(new_path, new_cate)
-            os.makedirs(new_category_path, exist_ok=True)
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-                img_path = os.path.join(category_path, file_name + self.img_format)
-                if os.path.isfile(xml_path) and os.path.isfile(img_path):
-                    cnt += 1
-                    new_xml_path = os.path.join(new_category_path, file_name + '.xml')
-                    new_img_path = os.path.join(new_category_path, file_name + self.img_format)
-                    shutil.move(xml_path, new_xml_path)
-                    shutil.move(img_path, new_img_path)
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(1)
-        print("[FINISH] Moving {} pairs of data.".format(cnt))
+        journal = run_moves(self.__journal_dir(), 'move_difficult_data', plan, batch_size, resume,
+                            self.instrument, {'target_path': target_path})
+        print("[FINISH] Moving {} pairs of data.".format(len(journal.moves) // 2))
         print("---End moving difficult data---")
 
-    def move_multi_defect_data(self):
+    @instrumented
+    def move_multi_defect_data(self, batch_size=1000, resume=True):
         """
         :info: 移动一张图中有多缺陷的图片以及标签到新的文件夹中
+        :param batch_size: 每批移动的文件数，每批完成后写入日志
+        :param resume: 存在未完成的日志时从断点续跑
         """
         assert not self.img_only, "This method needs xml files."
         new_path = self.sample_root + '_multiDefect'
-        os.makedirs(new_path, exist_ok=True)
-        print("---Start moving multi-defects images---")
-        pbar = tqdm(self.dataset.items())
-        for category, name_lst in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-                img_path = os.path.join(category_path, file_name + self.img_format)
 
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-                for obj in root.findall('object'):
-                    name = self.get_and_check(obj, 'name', 1).text
-                    if name != category:
-                        new_category_path = os.path.join(new_path, category)
-                        os.makedirs(new_category_path, exist_ok=True)
-                        new_xml_path = os.path.join(new_category_path, file_name + '.xml')
-                        new_img_path = os.path.join(new_category_path, file_name + self.img_format)
-                        shutil.move(xml_path, new_xml_path)
-                        shutil.move(img_path, new_img_path)
-                        self.dataset[category].remove(file_name)
-                        break
-                pbar.set_description('Processing category:{}'.format(category))
-        sleep(1)
+        def plan():
+            store = self.load_annotations()
+            # 对象标签与所在目录类别不一致的图片
+            class_names = np.array(store.classes, dtype=object)
+            obj_name = class_names[store.objects['class_id']]
+            category_names = np.array(store.categories, dtype=object)
+            obj_category = category_names[store.image_of_objects('category_id')]
+            multi_ids = np.unique(store.objects['image_id'][obj_name != obj_category])
+            moves = []
+            for image_id in multi_ids.tolist():
+                category = store.category(image_id)
+                file_name = store.file_name(image_id)
+                category_path = os.path.join(self.sample_root, category)
+                new_category_path = os.path.join(new_path, category)
+                for ext in ('.xml', self.img_format):
+                    moves.append((os.path.join(category_path, file_name + ext),
+                                  os.path.join(new_category_path, file_name + ext)))
+            return moves
+
+        print("---Start moving multi-defects images---")
+        journal = run_moves(self.__journal_dir(), 'move_multi_defect_data', plan, batch_size, resume,
+                            self.instrument)
+        self.__forget(journal.moves)
         print('---End moving multi-defects files---')
 
+    @instrumented
     def correct_typo(self, category, correct_category):
         """
         :info: 将打标拼写错误的标签纠正
@@ -468,18 +792,22 @@ class PlayDataset(object):
         assert not self.img_only, "This method needs xml files."
         assert category in self.dataset, 'category:{} does not exist.'.format(category)
         category_path = os.path.join(self.sample_root, category)
-        for file_name in self.dataset[category]:
-            xml_path = os.path.join(category_path, file_name + '.xml')
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            for obj in root.findall('object'):
-                name = self.get_and_check(obj, 'name', 1).text
-                if name == category:
-                    self.get_and_check(obj, 'name', 1).text = correct_category
-            print('[Correct] Correct category name of {}.xml file.'.format(file_name))
-            tree.write(xml_path)
+        with self.instrument.phase('write') as phase:
+            for file_name in self.dataset[category]:
+                xml_path = os.path.join(category_path, file_name + '.xml')
+                tree = ET.parse(xml_path)
+                root = tree.getroot()
+                for obj in root.findall('object'):
+                    name = get_and_check(obj, 'name', 1).text
+                    if name == category:
+                        get_and_check(obj, 'name', 1).text = correct_category
+                print('[Correct] Correct category name of {}.xml file.'.format(file_name))
+                tree.write(xml_path)
+                phase.add(files=1)
+        self.annotation_query = None
         print('[FINISH] Correct category of XML file.')
 
+    @instrumented
     def correct_category(self):
         """
         :info: 按照文件目录更改标签
@@ -487,68 +815,78 @@ class PlayDataset(object):
         """
         assert not self.img_only, "This method needs xml files."
         print("---Start correcting category---")
-        sleep(1)
         pbar = tqdm(self.dataset.items())
-        for category, name_lst in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-                for obj in root.findall('object'):
-                    self.get_and_check(obj, 'name', 1).text = category
-                tree.write(xml_path)
-            pbar.set_description('Processing category:{}'.format(category))
-        sleep(1)
+        with self.instrument.phase('write') as phase:
+            for category, name_lst in pbar:
+                category_path = os.path.join(self.sample_root, category)
+                for file_name in name_lst:
+                    xml_path = os.path.join(category_path, file_name + '.xml')
+                    tree = ET.parse(xml_path)
+                    root = tree.getroot()
+                    for obj in root.findall('object'):
+                        get_and_check(obj, 'name', 1).text = category
+                    tree.write(xml_path)
+                phase.add(files=len(name_lst))
+                pbar.set_description('Processing category:{}'.format(category))
+        self.annotation_query = None
         print("---End correcting category---")
 
-    def correct_dataset(self):
+    @instrumented
+    def correct_dataset(self, workers=1, threads=8, queue_depth=64, mode='copy'):
         """
         :info: 将所有文件按照xml标签中的类别进行分类,如果标记有difficult则放入困难样本
+        :param workers: 解析xml的进程数
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'，链接失败或跨设备时自动拷贝
+        :return: TransferExecutor，包含吞吐统计以及拷贝失败的文件
         """
         assert not self.img_only, "This method needs xml files."
         new_path = self.sample_root + '_correct'
         os.makedirs(new_path, exist_ok=True)
+        store = self.load_annotations(workers)
+        objects = store.objects
+        area = (objects['xmax'].astype(np.int64) - objects['xmin'] + 1) * \
+               (objects['ymax'].astype(np.int64) - objects['ymin'] + 1)
+        starts = store.images['obj_start']
+        num_obj = store.images['num_obj']
+        has_obj = num_obj > 0
+        if np.any(objects['difficult'] < 0):
+            raise NotImplementedError('Can not find difficult in object.')
+        # 每张图取面积最大(相同取第一个)的对象类别，以及是否存在difficult
+        best = np.zeros(len(store), dtype=np.int64)
+        difficult = np.zeros(len(store), dtype=bool)
+        if store.num_objects:
+            order = np.lexsort((np.arange(len(area)), -area, objects['image_id']))
+            best[has_obj] = order[starts[has_obj]]
+            difficult[has_obj] = np.maximum.reduceat(objects['difficult'], starts[has_obj]) == 1
+
         print("---Start correcting dataset---")
-        sleep(1)
-        pbar = tqdm(self.dataset.items())
-        for category, name_lst in pbar:
-            category_path = os.path.join(self.sample_root, category)
-            for file_name in name_lst:
+        with TransferExecutor(threads, queue_depth, 'correct', mode, self.instrument) as transfer:
+            pbar = tqdm(range(len(store)))
+            for image_id in pbar:
+                category = store.category(image_id)
+                if not has_obj[image_id]:
+                    continue
+                file_name = store.file_name(image_id)
+                category_path = os.path.join(self.sample_root, category)
                 xml_path = os.path.join(category_path, file_name + '.xml')
                 img_path = os.path.join(category_path, file_name + self.img_format)
-
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-
-                area = 0
-                difficult = 0
-                for obj in root.findall('object'):
-                    diff = int(self.get_and_check(obj, 'difficult', 1).text)
-                    if diff == 1:
-                        difficult = 1
-                    bbox = self.get_and_check(obj, 'bndbox', 1)
-                    xmin = int(self.get_and_check(bbox, 'xmin', 1).text)
-                    ymin = int(self.get_and_check(bbox, 'ymin', 1).text)
-                    xmax = int(self.get_and_check(bbox, 'xmax', 1).text)
-                    ymax = int(self.get_and_check(bbox, 'ymax', 1).text)
-                    bbox_area = (xmax - xmin + 1) * (ymax - ymin + 1)
-                    if bbox_area > area:
-                        area = bbox_area
-                        new_category = self.get_and_check(obj, 'name', 1).text
+                new_category = store.classes[objects['class_id'][best[image_id]]]
 
                 new_category_path = os.path.join(new_path, new_category)
-                if difficult == 1:
+                if difficult[image_id]:
                     new_category_path = os.path.join(new_path, 'difficult', new_category)
                 os.makedirs(new_category_path, exist_ok=True)
                 new_xml_path = os.path.join(new_category_path, file_name + '.xml')
                 new_img_path = os.path.join(new_category_path, file_name + self.img_format)
-                shutil.copy(xml_path, new_xml_path)
-                shutil.copy(img_path, new_img_path)
-            pbar.set_description('Processing raw category:{}'.format(category))
-        sleep(1)
+                transfer.submit(xml_path, new_xml_path)
+                transfer.submit(img_path, new_img_path)
+                pbar.set_description('Processing raw category:{}'.format(category))
         print('---End copying file with correct tag---')
+        return transfer
 
+    @instrumented
     def modify_xml(self, category):
         """
         :info: 对于一些特殊的category，修改bbox信息至全图范围
@@ -556,47 +894,68 @@ class PlayDataset(object):
         assert not self.img_only, "This method needs xml files."
         assert category in self.dataset, 'category:{} does not exist.'.format(category)
         category_path = os.path.join(self.sample_root, category)
-        for file_name in self.dataset[category]:
-            xml_path = os.path.join(category_path, file_name + '.xml')
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            size = self.get_and_check(root, 'size', 1)
-            width = self.get_and_check(size, 'width', 1).text
-            height = self.get_and_check(size, 'height', 1).text
-            obj = self.get_and_check(root, 'object', 1)
-            bbox = self.get_and_check(obj, 'bndbox', 1)
-            # 修改bbox坐标
-            self.get_and_check(bbox, 'xmin', 1).text = '1'
-            self.get_and_check(bbox, 'ymin', 1).text = '1'
-            self.get_and_check(bbox, 'xmax', 1).text = width
-            self.get_and_check(bbox, 'ymax', 1).text = height
-            print('[MODIFY] Modify bunding box of {}.xml file.'.format(file_name))
-            tree.write(xml_path)
+        with self.instrument.phase('write') as phase:
+            for file_name in self.dataset[category]:
+                xml_path = os.path.join(category_path, file_name + '.xml')
+                tree = ET.parse(xml_path)
+                root = tree.getroot()
+                size = get_and_check(root, 'size', 1)
+                width = get_and_check(size, 'width', 1).text
+                height = get_and_check(size, 'height', 1).text
+                obj = get_and_check(root, 'object', 1)
+                bbox = get_and_check(obj, 'bndbox', 1)
+                # 修改bbox坐标
+                get_and_check(bbox, 'xmin', 1).text = '1'
+                get_and_check(bbox, 'ymin', 1).text = '1'
+                get_and_check(bbox, 'xmax', 1).text = width
+                get_and_check(bbox, 'ymax', 1).text = height
+                print('[MODIFY] Modify bunding box of {}.xml file.'.format(file_name))
+                tree.write(xml_path)
+                phase.add(files=1)
+        self.annotation_query = None
         print('[FINISH] Modify bunding box of XML file.')
         
+    @instrumented
     def reset_difficult(self):
         """
         :info: 重置标签xml中difficult信息
         """
         assert not self.img_only, "This method needs xml files."
+        store = self.load_annotations()
+        lookup = store.lookup()
+        # 与逐个解析时一致，缺少 difficult 的对象直接报错
+        missing = np.flatnonzero(store.objects['difficult'] < 0)
+        if len(missing):
+            image_id = int(store.objects['image_id'][missing[0]])
+            raise NotImplementedError('Can not find difficult in object of {}.'.format(
+                os.path.join(self.sample_root, store.category(image_id), store.file_name(image_id) + '.xml')))
+        difficult_ids = set(store.objects['image_id'][store.objects['difficult'] == 1].tolist())
         print("---Start resetting difficult dataset---")
         total_resetting = 0
-        for category, name_lst in self.dataset.items():
-            category_path = os.path.join(self.sample_root, category)
-            cnt = 0
-            for file_name in name_lst:
-                xml_path = os.path.join(category_path, file_name + '.xml')
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-
-                for obj in root.findall('object'):
-                    diff = int(self.get_and_check(obj, 'difficult', 1).text)
-                    if diff == 1:
-                        self.get_and_check(obj, 'difficult', 1).text = '0'
-                        cnt += 1
+        with self.instrument.phase('write') as phase:
+            for category, name_lst in self.physical_dataset().items():
+                category_path = os.path.join(self.sample_root, category)
+                cnt = 0
+                for file_name in name_lst:
+                    if lookup[(category, file_name)] not in difficult_ids:
+                        continue
+                    xml_path = os.path.join(category_path, file_name + '.xml')
+                    tree = ET.parse(xml_path)
+                    root = tree.getroot()
+
+                    modified = False
+                    for obj in root.findall('object'):
+                        diff = int(get_and_check(obj, 'difficult', 1).text)
+                        if diff == 1:
+                            get_and_check(obj, 'difficult', 1).text = '0'
+                            cnt += 1
+                            modified = True
+                    if modified:
                         tree.write(xml_path)
-            print('The number of reset category [{}]: {}'.format(category, cnt))
-            total_resetting += cnt
+                        phase.add(files=1)
+                print('The number of reset category [{}]: {}'.format(category, cnt))
+                total_resetting += cnt
+        self.annotation_query = None
         print('[FINISH] Total number of reset data: {}'.format(total_resetting))
 
 
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: ShardExport
+@time: 2020/4/29
+@desc: 把大量小的 图片+xml 打包成少量大文件(shard)，图片原始字节与解析后的标注依次存放，
+       另存偏移索引；读取时 mmap 整个 shard，按下标或类别返回零拷贝的 memoryview
+"""
+import os
+import json
+import mmap
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from VocReader import read_voc
+
+SHARD_VERSION = 1
+INDEX_NAME = 'index.npz'
+
+
+def shard_name(shard_id):
+    return 'shard-{:05d}.bin'.format(shard_id)
+
+
+def encode_annotation(xml_path):
+    """
+    :info: 解析后的标注编码为 json 字节 {"width", "height", "objects": [[name, xmin, ymin, xmax, ymax, difficult]]}
+    """
+    width, height, objects = read_voc(xml_path)
+    return json.dumps({'width': width, 'height': height, 'objects': objects},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_shard(shard_path, samples):
+    """
+    :info: 写一个 shard，供进程池使用
+    :param samples: [(img_path, xml_path 或 None)]
+    :return: offsets[n, 4]，列为 img_offset, img_size, ann_offset, ann_size
+    """
+    offsets = np.zeros((len(samples), 4), dtype=np.int64)
+    pos = 0
+    tmp_path = shard_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for i, (img_path, xml_path) in enumerate(samples):
+            with open(img_path, 'rb') as img:
+                img_data = img.read()
+            ann_data = encode_annotation(xml_path) if xml_path is not None else b''
+            f.write(img_data)
+            f.write(ann_data)
+            offsets[i] = pos, len(img_data), pos + len(img_data), len(ann_data)
+            pos += len(img_data) + len(ann_data)
+    os.replace(tmp_path, shard_path)
+    return offsets
+
+
+def export_shards(sample_root, dataset, output_dir, img_format='.jpg', img_only=False,
+                  samples_per_shard=10000, workers=4):
+    """
+    :param sample_root: 数据集根目录
+    :param dataset: {category: [file_name]}，可以是整个数据集或者某个划分
+    :param output_dir: 输出目录，包含 shard-xxxxx.bin 以及 index.npz
+    :param samples_per_shard: 每个 shard 的样本数
+    :param workers: 进程数，每个 shard 由一个进程写出
+    :return: 样本数
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    categories = sorted(dataset)
+    category_id = []
+    file_names = []
+    samples = []
+    for idx, category in enumerate(categories):
+        category_path = os.path.join(sample_root, category)
+        for file_name in dataset[category]:
+            category_id.append(idx)
+            file_names.append(file_name)
+            samples.append((os.path.join(category_path, file_name + img_format),
+                            None if img_only else os.path.join(category_path, file_name + '.xml')))
+    bounds = list(range(0, len(samples), samples_per_shard)) + [len(samples)]
+    jobs = [(os.path.join(output_dir, shard_name(shard_id)), samples[bounds[shard_id]:bounds[shard_id + 1]])
+            for shard_id in range(len(bounds) - 1)]
+
+    if workers <= 1 or len(jobs) < 2:
+        results = [write_shard(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(write_shard, *zip(*jobs)))
+    offsets = np.concatenate(results) if results else np.zeros((0, 4), dtype=np.int64)
+    shard = np.repeat(np.arange(len(jobs), dtype=np.int32), [len(job[1]) for job in jobs])
+
+    np.savez(os.path.join(output_dir, INDEX_NAME),
+             version=np.int32(SHARD_VERSION),
+             categories=np.array(categories, dtype=str),
+             category_id=np.array(category_id, dtype=np.int32),
+             file_names=np.array(file_names, dtype=str),
+             img_format=np.array(img_format),
+             shard=shard,
+             offsets=offsets)
+    print('[FINISH] Exported {} samples into {} shards at path: {}'.format(len(samples), len(jobs), output_dir))
+    return len(samples)
+
+
+class ShardReader(object):
+    def __init__(self, shard_dir):
+        """
+        :param shard_dir: export_shards 的输出目录
+        """
+        self.shard_dir = shard_dir
+        with np.load(os.path.join(shard_dir, INDEX_NAME)) as index:
+            assert int(index['version']) == SHARD_VERSION, 'Unsupported shard version.'
+            self.categories = index['categories'].tolist()
+            self.category_id = index['category_id']
+            self.file_names = index['file_names']
+            self.img_format = str(index['img_format'])
+            self.shard = index['shard']
+            self.offsets = index['offsets']
+        # 同一类别的样本在导出时是连续的
+        self.bounds = np.searchsorted(self.category_id, np.arange(len(self.categories) + 1))
+        self._files = {}
+        self._views = {}
+
+    def __len__(self):
+        return len(self.shard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def _view(self, shard_id):
+        view = self._views.get(shard_id)
+        if view is None:
+            f = open(os.path.join(self.shard_dir, shard_name(shard_id)), 'rb')
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            self._files[shard_id] = (f, mm)
+            view = self._views[shard_id] = memoryview(mm)
+        return view
+
+    def __getitem__(self, idx):
+        """
+        :return: (图片字节, 标注json字节)，均为指向 mmap 的 memoryview
+        """
+        img_offset, img_size, ann_offset, ann_size = self.offsets[idx].tolist()
+        view = self._view(int(self.shard[idx]))
+        return view[img_offset:img_offset + img_size], view[ann_offset:ann_offset + ann_size]
+
+    def image(self, idx):
+        return self[idx][0]
+
+    def annotation(self, idx):
+        """
+        :return: 解析后的标注字典，img_only 导出时为 None
+        """
+        data = self[idx][1]
+        return json.loads(bytes(data)) if len(data) else None
+
+    def name(self, idx):
+        """
+        :return: (category, file_name)
+        """
+        return self.categories[self.category_id[idx]], str(self.file_names[idx])
+
+    def ids_of_category(self, category):
+        category_id = self.categories.index(category)
+        return np.arange(self.bounds[category_id], self.bounds[category_id + 1])
+
+    def by_category(self, category):
+        """
+        :info: 依次返回某个类别的 (idx, 图片memoryview, 标注memoryview)
+        """
+        for idx in self.ids_of_category(category).tolist():
+            img, ann = self[idx]
+            yield idx, img, ann
+
+    def close(self):
+        """
+        :info: 关闭前需要释放所有返回的 memoryview，否则 mmap 无法关闭
+        """
+        for view in self._views.values():
+            view.release()
+        for f, mm in self._files.values():
+            if isinstance(mm, mmap.mmap):
+                mm.close()
+            f.close()
+        self._views = {}
+        self._files = {}
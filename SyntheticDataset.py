@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: SyntheticDataset
+@time: 2020/4/14
+@desc: 生成与 PlayDataset / CopeResult 目录结构一致的合成 Pascal VOC 数据集，用于性能测试
+"""
+import os
+import struct
+import random
+
+
+def jpeg_bytes(width, height, padding=0):
+    """
+    :info: 只包含 SOI, SOF0, EOI 的最小 JPEG 文件，头信息中的宽高可以被正常读取
+    :param padding: 额外填充的字节数，用于模拟图片大小
+    """
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    com = b''
+    if padding > 0:
+        chunks = []
+        while padding > 0:
+            size = min(padding, 65533)
+            chunks.append(b'\xff\xfe' + struct.pack('>H', size + 2) + b'\x00' * size)
+            padding -= size
+        com = b''.join(chunks)
+    return b'\xff\xd8' + com + sof0 + b'\xff\xd9'
+
+
+def voc_xml(file_name, width, height, objects):
+    """
+    :param objects: [(name, xmin, ymin, xmax, ymax, difficult)]
+    """
+    obj_str = ''.join('<object><name>{}</name><pose>Unspecified</pose><truncated>0</truncated>'
+                      '<difficult>{}</difficult><bndbox><xmin>{}</xmin><ymin>{}</ymin>'
+                      '<xmax>{}</xmax><ymax>{}</ymax></bndbox></object>'
+                      .format(name, difficult, xmin, ymin, xmax, ymax)
+                      for name, xmin, ymin, xmax, ymax, difficult in objects)
+    return ('<annotation><folder>synthetic</folder><filename>{}</filename>'
+            '<size><width>{}</width><height>{}</height><depth>3</depth></size>'
+            '<segmented>0</segmented>{}</annotation>'.format(file_name, width, height, obj_str))
+
+
+def category_names(num_categories, depth=1):
+    """
+    :info: 生成类别目录名，depth>1 时为多级目录，例如 L0C0/L1C0
+    """
+    names = []
+    for index in range(num_categories):
+        parts = ['C{}'.format(index)]
+        for level in range(1, depth):
+            parts.insert(0, 'L{}G{}'.format(level, index % (level + 1)))
+        names.append(os.path.join(*parts))
+    return names
+
+
+def generate_dataset(sample_root, num_categories=10, num_images=1000, max_objects=3,
+                     depth=1, img_size=(1024, 768), img_format='.jpg', img_padding=0,
+                     other_rate=0.1, difficult_rate=0.05, seed=0):
+    """
+    :info: 生成合成数据集，sample_root/category/xxx.jpg + xxx.xml
+    :param num_categories: 类别数量
+    :param num_images: 图片总数，平均分配到各个类别
+    :param max_objects: 每张图的最大对象数，实际数量在 [0, max_objects] 中随机
+    :param depth: 类别目录的层级
+    :param img_size: 图片宽高
+    :param img_padding: 每张图片额外填充的字节数
+    :param other_rate: 对象标签与所在目录不一致的比例
+    :param difficult_rate: difficult=1 的比例
+    :param seed: 随机种子
+    :return: 类别列表
+    """
+    rng = random.Random(seed)
+    width, height = img_size
+    categories = category_names(num_categories, depth)
+    labels = [os.path.basename(category) for category in categories]
+    img_data = jpeg_bytes(width, height, img_padding)
+    for index in range(num_images):
+        category_id = index % num_categories
+        category_path = os.path.join(sample_root, categories[category_id])
+        if index < num_categories:
+            os.makedirs(category_path, exist_ok=True)
+        file_name = 'IMG{:08d}'.format(index)
+        objects = []
+        for _ in range(rng.randint(0, max_objects)):
+            w = rng.randint(4, width // 4)
+            h = rng.randint(4, height // 4)
+            xmin = rng.randint(1, width - w)
+            ymin = rng.randint(1, height - h)
+            name = labels[category_id] if rng.random() >= other_rate else rng.choice(labels)
+            objects.append((name, xmin, ymin, xmin + w - 1, ymin + h - 1, int(rng.random() < difficult_rate)))
+        with open(os.path.join(category_path, file_name + img_format), 'wb') as f:
+            f.write(img_data)
+        with open(os.path.join(category_path, file_name + '.xml'), 'w') as f:
+            f.write(voc_xml(file_name + img_format, width, height, objects))
+    print('[FINISH] Generated {} images in {} categories at {}.'.format(num_images, num_categories, sample_root))
+    return categories
+
+
+def generate_result(result_root, num_classes=10, num_images=1000, accuracy=0.9,
+                    img_format='.jpg', folds=1, seed=0):
+    """
+    :info: 生成与 CopeResult 一致的预测结果目录 result_root/[fold]/<gt>/<pred>/xxx.jpg
+    :param accuracy: 预测正确的比例
+    :param folds: k-fold 的折数，大于1时第一级目录为 fold0, fold1, ...
+    """
+    rng = random.Random(seed)
+    labels = ['C{}'.format(index) for index in range(num_classes)]
+    img_data = jpeg_bytes(64, 64)
+    made = set()
+    for index in range(num_images):
+        gt = labels[index % num_classes]
+        pred = gt if rng.random() < accuracy else rng.choice(labels)
+        parts = [result_root, gt, pred]
+        if folds > 1:
+            parts.insert(1, 'fold{}'.format(index % folds))
+        dir_path = os.path.join(*parts)
+        if dir_path not in made:
+            os.makedirs(dir_path, exist_ok=True)
+            made.add(dir_path)
+        with open(os.path.join(dir_path, 'IMG{:08d}{}'.format(index, img_format)), 'wb') as f:
+            f.write(img_data)
+    print('[FINISH] Generated {} results of {} classes at {}.'.format(num_images, num_classes, result_root))
+    return labels
+
+
+if __name__ == '__main__':
+    generate_dataset(os.path.join('.', 'synthetic', 'dataset'), num_categories=10, num_images=1000)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: VocReader
+@time: 2020/4/1
+@desc: Pascal VOC 标签的快速读取，优先使用 lxml，没有安装时使用 xml.etree
+"""
+import os
+import time
+import tempfile
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+def get_and_check(root, name, length):
+    """
+    :param root: Element-tree 根节点
+    :param name: 需要返回的子节点名称
+    :param length: 确认子节点长度
+    """
+    var_lst = root.findall(name)
+    if len(var_lst) == 0:
+        raise NotImplementedError('Can not find %s in %s.' % (name, root.tag))
+    if (length > 0) and (len(var_lst) != length):
+        raise NotImplementedError('The size of %s is supposed to be %d, but is %d.'
+                                  % (name, length, len(var_lst)))
+    if length == 1:
+        var_lst = var_lst[0]
+    return var_lst
+
+
+def _read_object(obj):
+    name = get_and_check(obj, 'name', 1).text
+    bbox = get_and_check(obj, 'bndbox', 1)
+    xmin = int(get_and_check(bbox, 'xmin', 1).text)
+    ymin = int(get_and_check(bbox, 'ymin', 1).text)
+    xmax = int(get_and_check(bbox, 'xmax', 1).text)
+    ymax = int(get_and_check(bbox, 'ymax', 1).text)
+    diff = obj.findall('difficult')
+    difficult = int(diff[0].text) if len(diff) == 1 else -1
+    return name, xmin, ymin, xmax, ymax, difficult
+
+
+def parse_voc_tree(xml_path):
+    """
+    :info: 原有的解析方式，ET.parse 建完整的树再逐个 findall，作为基准
+    :return: (width, height, [(name, xmin, ymin, xmax, ymax, difficult)])，缺少difficult时记为-1
+    """
+    root = ET.parse(xml_path).getroot()
+    size = get_and_check(root, 'size', 1)
+    width = int(get_and_check(size, 'width', 1).text)
+    height = int(get_and_check(size, 'height', 1).text)
+    return width, height, [_read_object(obj) for obj in root.findall('object')]
+
+
+def _check(elem, name, var_lst):
+    """
+    :info: 与 get_and_check(elem, name, 1) 相同的校验
+    """
+    if len(var_lst) != 1:
+        if len(var_lst) == 0:
+            raise NotImplementedError('Can not find %s in %s.' % (name, elem.tag))
+        raise NotImplementedError('The size of %s is supposed to be %d, but is %d.'
+                                  % (name, 1, len(var_lst)))
+    return var_lst[0]
+
+
+def _read_bndbox(bbox):
+    xmin = []
+    ymin = []
+    xmax = []
+    ymax = []
+    for child in bbox:
+        tag = child.tag
+        if tag == 'xmin':
+            xmin.append(child)
+        elif tag == 'ymin':
+            ymin.append(child)
+        elif tag == 'xmax':
+            xmax.append(child)
+        elif tag == 'ymax':
+            ymax.append(child)
+    return (int(_check(bbox, 'xmin', xmin).text), int(_check(bbox, 'ymin', ymin).text),
+            int(_check(bbox, 'xmax', xmax).text), int(_check(bbox, 'ymax', ymax).text))
+
+
+def read_voc(xml_path, backend=None):
+    """
+    :info: 整个文件一次读入交给C解析器，每一层子节点只遍历一次，取出 size, object 的 name, bndbox 以及 difficult
+           校验规则以及抛出的异常与 get_and_check 一致
+    :param backend: 'lxml' 或 'etree'，默认有 lxml 时使用 lxml
+    :return: (width, height, [(name, xmin, ymin, xmax, ymax, difficult)])，缺少difficult时记为-1
+    """
+    if backend is None:
+        backend = 'lxml' if lxml_etree is not None else 'etree'
+    fromstring = lxml_etree.fromstring if backend == 'lxml' else ET.fromstring
+    with open(xml_path, 'rb') as f:
+        root = fromstring(f.read())
+
+    size_lst = []
+    obj_lst = []
+    for child in root:
+        tag = child.tag
+        if tag == 'object':
+            obj_lst.append(child)
+        elif tag == 'size':
+            size_lst.append(child)
+
+    size = _check(root, 'size', size_lst)
+    width_lst = []
+    height_lst = []
+    for child in size:
+        tag = child.tag
+        if tag == 'width':
+            width_lst.append(child)
+        elif tag == 'height':
+            height_lst.append(child)
+    width = int(_check(size, 'width', width_lst).text)
+    height = int(_check(size, 'height', height_lst).text)
+
+    objects = []
+    for obj in obj_lst:
+        name_lst = []
+        bbox_lst = []
+        diff_lst = []
+        for child in obj:
+            tag = child.tag
+            if tag == 'name':
+                name_lst.append(child)
+            elif tag == 'bndbox':
+                bbox_lst.append(child)
+            elif tag == 'difficult':
+                diff_lst.append(child)
+        name = _check(obj, 'name', name_lst).text
+        xmin, ymin, xmax, ymax = _read_bndbox(_check(obj, 'bndbox', bbox_lst))
+        difficult = int(diff_lst[0].text) if len(diff_lst) == 1 else -1
+        objects.append((name, xmin, ymin, xmax, ymax, difficult))
+    return width, height, objects
+
+
+def write_sample_xml(xml_path, num_obj=3):
+    objects = ''.join('<object><name>code{0}</name><pose>Unspecified</pose><truncated>0</truncated>'
+                      '<difficult>0</difficult><bndbox><xmin>{1}</xmin><ymin>{1}</ymin>'
+                      '<xmax>{2}</xmax><ymax>{2}</ymax></bndbox></object>'.format(i, 10 * i + 1, 10 * i + 50)
+                      for i in range(num_obj))
+    with open(xml_path, 'w') as f:
+        f.write('<annotation><folder>sample</folder><filename>{0}.jpg</filename>'
+                '<size><width>1024</width><height>768</height><depth>3</depth></size>'
+                '<segmented>0</segmented>{1}</annotation>'.format(os.path.basename(xml_path), objects))
+
+
+def benchmark(xml_paths, repeat=5):
+    """
+    :info: 对比原有解析方式与 read_voc 的耗时
+    :return: {方式: 最短耗时(秒)}
+    """
+    readers = {'ET.parse+findall': parse_voc_tree,
+               'read_voc(etree)': lambda p: read_voc(p, 'etree')}
+    if lxml_etree is not None:
+        readers['read_voc(lxml)'] = lambda p: read_voc(p, 'lxml')
+    result = {}
+    for name, reader in readers.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for xml_path in xml_paths:
+                reader(xml_path)
+            best = min(best, time.perf_counter() - start)
+        result[name] = best
+        print('[BENCH] {:<18} {:.3f}s for {} files ({:.0f} files/s)'
+              .format(name, best, len(xml_paths), len(xml_paths) / best))
+    return result
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_lst = []
+        for index in range(10000):
+            xml_file = os.path.join(tmp_dir, '{:05d}.xml'.format(index))
+            write_sample_xml(xml_file, num_obj=index % 5)
+            xml_lst.append(xml_file)
+        benchmark(xml_lst)
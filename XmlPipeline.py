@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# encoding:utf-8
+"""
+author: liusili
+@l@icense: (C) Copyright 2019, Union Big Data Co. Ltd. All rights reserved.
+@contact: liusili@unionbigdata.com
+@software:
+@file: XmlPipeline
+@time: 2020/4/3
+@desc: 将多个xml修改/移动操作合并成一次遍历：每个文件只解析一次，最多写一次，最后再分发
+"""
+import os
+import xml.etree.ElementTree as ET
+from tqdm import tqdm
+from VocReader import get_and_check
+from FileTransfer import TransferExecutor
+from Instrument import instrumented
+
+
+class XmlJob(object):
+    """
+    :info: 单个文件在流水线中的状态
+    """
+    def __init__(self, category, file_name, xml_path, img_path):
+        self.category = category
+        self.file_name = file_name
+        self.xml_path = xml_path
+        self.img_path = img_path
+        self.tree = ET.parse(xml_path)
+        self.root = self.tree.getroot()
+        self.changed = False
+        self.deleted = False
+        self.route = None
+
+
+class CorrectCategoryStage(object):
+    name = 'correct_category'
+
+    def __call__(self, job):
+        """
+        :info: 按照文件目录更改标签
+        """
+        for obj in job.root.findall('object'):
+            name = get_and_check(obj, 'name', 1)
+            if name.text != job.category:
+                name.text = job.category
+                job.changed = True
+
+
+class CorrectTypoStage(object):
+    name = 'correct_typo'
+
+    def __init__(self, category, correct_category):
+        self.category = category
+        self.correct_category = correct_category
+
+    def __call__(self, job):
+        """
+        :info: 将指定category中打标拼写错误的标签纠正
+        """
+        if job.category != self.category:
+            return
+        for obj in job.root.findall('object'):
+            name = get_and_check(obj, 'name', 1)
+            if name.text == self.category:
+                name.text = self.correct_category
+                job.changed = True
+
+
+class ModifyXmlStage(object):
+    name = 'modify_xml'
+
+    def __init__(self, category):
+        self.category = category
+
+    def __call__(self, job):
+        """
+        :info: 对于指定的category，修改bbox信息至全图范围
+        """
+        if job.category != self.category:
+            return
+        size = get_and_check(job.root, 'size', 1)
+        width = get_and_check(size, 'width', 1).text
+        height = get_and_check(size, 'height', 1).text
+        obj = get_and_check(job.root, 'object', 1)
+        bbox = get_and_check(obj, 'bndbox', 1)
+        for name, value in (('xmin', '1'), ('ymin', '1'), ('xmax', width), ('ymax', height)):
+            node = get_and_check(bbox, name, 1)
+            if node.text != value:
+                node.text = value
+                job.changed = True
+
+
+class ResetDifficultStage(object):
+    name = 'reset_difficult'
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, job):
+        """
+        :info: 重置标签xml中difficult信息
+        """
+        for obj in job.root.findall('object'):
+            diff = get_and_check(obj, 'difficult', 1)
+            if int(diff.text) == 1:
+                diff.text = '0'
+                job.changed = True
+                self.count += 1
+
+
+class DeleteNoBboxStage(object):
+    name = 'delete_no_bbox_xml'
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, job):
+        """
+        :info: 删除没有bbox信息的XML文件，后续阶段不再处理该文件
+        """
+        if len(job.root.findall('object')) == 0:
+            job.deleted = True
+            self.count += 1
+
+
+class CorrectDatasetStage(object):
+    name = 'correct_dataset'
+
+    def __init__(self, new_path):
+        self.new_path = new_path
+
+    def __call__(self, job):
+        """
+        :info: 按照(修改后的)xml标签中面积最大的类别分发，标记有difficult则放入困难样本
+        """
+        area = 0
+        difficult = 0
+        new_category = None
+        for obj in job.root.findall('object'):
+            if int(get_and_check(obj, 'difficult', 1).text) == 1:
+                difficult = 1
+            bbox = get_and_check(obj, 'bndbox', 1)
+            xmin = int(get_and_check(bbox, 'xmin', 1).text)
+            ymin = int(get_and_check(bbox, 'ymin', 1).text)
+            xmax = int(get_and_check(bbox, 'xmax', 1).text)
+            ymax = int(get_and_check(bbox, 'ymax', 1).text)
+            bbox_area = (xmax - xmin + 1) * (ymax - ymin + 1)
+            if bbox_area > area:
+                area = bbox_area
+                new_category = get_and_check(obj, 'name', 1).text
+        if new_category is None:
+            return
+        if difficult == 1:
+            job.route = os.path.join(self.new_path, 'difficult', new_category)
+        else:
+            job.route = os.path.join(self.new_path, new_category)
+
+
+class XmlPipeline(object):
+    def __init__(self, play_dataset):
+        """
+        :param play_dataset: PlayDataset 对象
+        """
+        assert not play_dataset.img_only, "This pipeline needs xml files."
+        self.play_dataset = play_dataset
+        self.instrument = play_dataset.instrument
+        self.stages = []
+
+    def add(self, stage):
+        """
+        :info: 注册一个阶段，阶段是接收 XmlJob 的可调用对象
+        """
+        self.stages.append(stage)
+        return self
+
+    def correct_category(self):
+        return self.add(CorrectCategoryStage())
+
+    def correct_typo(self, category, correct_category):
+        return self.add(CorrectTypoStage(category, correct_category))
+
+    def modify_xml(self, category):
+        return self.add(ModifyXmlStage(category))
+
+    def reset_difficult(self):
+        return self.add(ResetDifficultStage())
+
+    def delete_no_bbox_xml(self):
+        return self.add(DeleteNoBboxStage())
+
+    def correct_dataset(self):
+        return self.add(CorrectDatasetStage(self.play_dataset.sample_root + '_correct'))
+
+    @instrumented
+    def run(self, threads=8, queue_depth=64, mode='copy'):
+        """
+        :info: 每个文件解析一次，依次执行所有阶段，有修改时写一次，最后按 route 拷贝
+        :param threads: 拷贝线程数
+        :param queue_depth: 拷贝队列深度
+        :param mode: 生成文件的方式 'copy', 'hardlink', 'symlink', 'reflink'
+        :return: 统计 {written, deleted, routed}
+        """
+        data = self.play_dataset
+        stat = {'written': 0, 'deleted': 0, 'routed': 0}
+        print('---Start pipeline: {}---'.format(' -> '.join(stage.name for stage in self.stages)))
+        with TransferExecutor(threads, queue_depth, 'pipeline', mode, self.instrument) as transfer:
+            pbar = tqdm(list(data.dataset.items()))
+            for category, name_lst in pbar:
+                category_path = os.path.join(data.sample_root, category)
+                kept = []
+                for file_name in name_lst:
+                    job = XmlJob(category, file_name,
+                                 os.path.join(category_path, file_name + '.xml'),
+                                 os.path.join(category_path, file_name + data.img_format))
+                    for stage in self.stages:
+                        stage(job)
+                        if job.deleted:
+                            break
+                    if job.deleted:
+                        os.remove(job.xml_path)
+                        stat['deleted'] += 1
+                        continue
+                    kept.append(file_name)
+                    if job.changed:
+                        job.tree.write(job.xml_path)
+                        stat['written'] += 1
+                    if job.route is not None:
+                        os.makedirs(job.route, exist_ok=True)
+                        transfer.submit(job.xml_path, os.path.join(job.route, file_name + '.xml'))
+                        transfer.submit(job.img_path, os.path.join(job.route, file_name + data.img_format))
+                        stat['routed'] += 1
+                data.dataset[category] = kept
+                pbar.set_description('Processing category:{}'.format(category))
+        data.annotation_query = None
+        print('[FINISH] Pipeline written: {written}, deleted: {deleted}, routed: {routed}.'.format(**stat))
+        return stat
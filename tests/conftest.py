@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SyntheticDataset import generate_dataset, generate_result
+
+
+@pytest.fixture
+def sample_root(tmp_path):
+    """
+    :info: 4 个类别各 10 张图，所有图片内容相同
+    """
+    root = str(tmp_path / 'sample')
+    generate_dataset(root, num_categories=4, num_images=40, max_objects=3, seed=1)
+    return root
+
+
+@pytest.fixture
+def result_root(tmp_path):
+    root = str(tmp_path / 'result')
+    generate_result(root, num_classes=3, num_images=60, accuracy=0.8, seed=2)
+    return root
+
+
+def dataset_of(sample_root):
+    from DatasetIndex import DatasetIndex
+    return DatasetIndex(sample_root).build().to_dict()
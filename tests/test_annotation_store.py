@@ -0,0 +1,60 @@
+import os
+import time
+
+import numpy as np
+
+from AnnotationStore import AnnotationStore, parse_files
+from VocReader import read_voc
+from conftest import dataset_of
+
+
+def objects_of(store, image_id):
+    objects = store.objects
+    start = store.images['obj_start'][image_id]
+    stop = start + store.images['num_obj'][image_id]
+    return [(store.classes[objects['class_id'][i]], int(objects['xmin'][i]), int(objects['ymin'][i]),
+             int(objects['xmax'][i]), int(objects['ymax'][i]), int(objects['difficult'][i]))
+            for i in range(start, stop)]
+
+
+def test_store_matches_read_voc(sample_root):
+    dataset = dataset_of(sample_root)
+    store = AnnotationStore(sample_root).refresh(dataset)
+    assert len(store) == 40
+    for (category, file_name), image_id in store.lookup().items():
+        width, height, objects = read_voc(os.path.join(sample_root, category, file_name + '.xml'))
+        assert (store.images['width'][image_id], store.images['height'][image_id]) == (width, height)
+        assert objects_of(store, image_id) == objects
+    assert store.num_objects == int(store.images['num_obj'].sum())
+
+
+def test_update_reparses_only_modified_xml(sample_root):
+    dataset = dataset_of(sample_root)
+    store = AnnotationStore(sample_root).update(dataset)
+    assert store.parsed == 40
+
+    time.sleep(0.01)
+    xml_path = os.path.join(sample_root, 'C3', 'IMG00000003.xml')
+    with open(xml_path) as f:
+        text = f.read()
+    with open(xml_path, 'w') as f:
+        f.write(text.replace('<width>1024</width>', '<width>2048</width>'))
+    store = AnnotationStore(sample_root).update(dataset)
+    assert store.parsed == 1
+    assert store.changed
+    assert store.images['width'][store.lookup()[('C3', 'IMG00000003')]] == 2048
+    assert np.count_nonzero(store.images['width'] == 1024) == 39
+
+    store = AnnotationStore(sample_root).update(dataset)
+    assert store.parsed == 0
+    assert not store.changed
+
+
+def test_parse_files_is_independent_of_workers(sample_root):
+    dataset = dataset_of(sample_root)
+    xml_paths = [os.path.join(sample_root, category, file_name + '.xml')
+                 for category in sorted(dataset) for file_name in dataset[category]]
+    serial = parse_files(xml_paths, workers=1)
+    parallel = parse_files(xml_paths, workers=2)
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b) if isinstance(a, np.ndarray) else a == b
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from BatchRunner import load_jobs, run_batch
+
+
+def write_jobs(tmp_path, config):
+    job_file = str(tmp_path / 'jobs.json')
+    with open(job_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return job_file
+
+
+def test_load_jobs_applies_defaults_and_names(tmp_path):
+    job_file = write_jobs(tmp_path, {
+        'defaults': {'init': {'img_format': '.jpg'}},
+        'jobs': [{'sample_root': '/data/a/', 'ops': ['count_category']},
+                 {'sample_root': '/other/a', 'init': {'use_cache': False},
+                  'ops': [{'op': 'find_duplicates', 'threads': 4}]}]})
+    jobs = load_jobs(job_file)
+    assert [job['name'] for job in jobs] == ['a', 'a_2']
+    assert jobs[1]['init'] == {'img_format': '.jpg', 'use_cache': False}
+    assert jobs[1]['ops'] == [('find_duplicates', {'threads': 4})]
+
+
+@pytest.mark.parametrize('job', [{'class': 'Nope', 'sample_root': 'x'},
+                                 {'ops': ['count_category']},
+                                 {'sample_root': 'x', 'ops': ['_PlayDataset__select']},
+                                 {'sample_root': 'x', 'ops': ['no_such_op']}])
+def test_load_jobs_rejects_invalid_jobs(tmp_path, job):
+    with pytest.raises(ValueError):
+        load_jobs(write_jobs(tmp_path, [job]))
+
+
+def test_run_batch(sample_root, tmp_path):
+    summary_dir = str(tmp_path / 'batch')
+    jobs = load_jobs(write_jobs(tmp_path, [
+        {'name': 'ok', 'sample_root': sample_root, 'ops': [{'op': 'count_category', 'fmt': 'csv'},
+                                                           'find_duplicates']},
+        {'name': 'bad', 'sample_root': str(tmp_path / 'missing'), 'ops': ['count_category']}]))
+    summaries = run_batch(jobs, summary_dir, max_jobs=4, threads=2, workers=2)
+    ok, bad = summaries
+    assert ok['status'] == 'ok'
+    assert (ok['threads'], ok['workers']) == (1, 1)
+    assert ok['ops'][1]['args'] == {'threads': 1}
+    assert ok['ops'][1]['files'] == 40
+    assert 'parse' in ok['ops'][1]['phases']
+    assert bad['status'] == 'failed'
+    assert bad['ops'] == [{'op': 'count_category', 'status': 'skipped'}]
+    assert os.path.isfile(os.path.join(summary_dir, 'ok', 'summary.json'))
+    with open(os.path.join(summary_dir, 'summary.jsonl'), encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,30 @@
+import csv
+import json
+import os
+
+from CategoryReport import category_rollups, write_category_report
+
+
+def test_rollups_are_post_order():
+    dataset = {os.path.join('A', 'x'): [1, 2], os.path.join('A', 'y'): [3], 'A': [4], 'B': [5, 6]}
+    rows = list(category_rollups(dataset))
+    assert rows == [(os.path.join('A', 'x'), 2, 2, 2),
+                    (os.path.join('A', 'y'), 2, 1, 1),
+                    ('A', 1, 1, 4),
+                    ('B', 1, 2, 2),
+                    ('', 0, 0, 6)]
+
+
+def test_write_formats(tmp_path):
+    dataset = {os.path.join('A', 'x'): [1, 2], 'B': [3]}
+    csv_path = str(tmp_path / 'report.csv')
+    json_path = str(tmp_path / 'report.json')
+    assert write_category_report(category_rollups(dataset), csv_path, fmt='csv') == 4
+    assert write_category_report(category_rollups(dataset), json_path, fmt='json') == 4
+    write_category_report(category_rollups(dataset), str(tmp_path / 'report.xlsx'))
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    with open(json_path, encoding='utf-8') as f:
+        records = json.load(f)
+    assert rows[0] == ['category', 'level', 'quantity', 'total']
+    assert [row[3] for row in rows[1:]] == [str(record['total']) for record in records]
@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+
+from AnnotationStore import AnnotationStore
+from CocoExport import export_coco, export_npz
+from conftest import dataset_of
+
+
+def test_coco_and_npz_agree(sample_root, tmp_path):
+    store = AnnotationStore(sample_root).refresh(dataset_of(sample_root))
+    category_map = {'C1': 'C0'}
+    coco_path = str(tmp_path / 'coco.json')
+    npz_path = str(tmp_path / 'ann.npz')
+    assert export_coco(store, coco_path, category_map=category_map, chunk=7) == (40, store.num_objects)
+    export_npz(store, npz_path, category_map=category_map)
+
+    with open(coco_path, encoding='utf-8') as f:
+        coco = json.load(f)
+    assert [c['name'] for c in coco['categories']] == ['C0', 'C2', 'C3']
+    assert len(coco['images']) == 40
+    assert len(coco['annotations']) == store.num_objects
+    with np.load(npz_path) as data:
+        assert data['classes'].tolist() == ['C0', 'C2', 'C3']
+        assert data['img_id'].tolist() == [image['id'] for image in coco['images']]
+        assert data['obj_image_id'].tolist() == [ann['image_id'] for ann in coco['annotations']]
+        assert data['obj_category_id'].tolist() == [ann['category_id'] for ann in coco['annotations']]
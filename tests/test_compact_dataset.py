@@ -0,0 +1,67 @@
+import pytest
+
+from CompactDataset import CompactDataset, StemList
+from DatasetIndex import DatasetIndex
+
+
+def test_from_index_matches_dict(sample_root):
+    index = DatasetIndex(sample_root).build()
+    compact = CompactDataset.from_index(index)
+    assert compact.to_dict() == index.to_dict()
+    assert sorted(compact) == sorted(index.to_dict())
+
+
+def test_stem_list_behaves_like_list():
+    stems = StemList(['b', 'a', 'c', 'a'])
+    assert len(stems) == 4
+    assert stems[1] == 'a'
+    assert stems[-1] == 'a'
+    assert stems[1:3] == ['a', 'c']
+    assert 'c' in stems and 'z' not in stems
+
+    stems.remove('a')
+    assert stems.tolist() == ['b', 'c', 'a']
+    assert stems[1] == 'c'
+    with pytest.raises(ValueError):
+        stems.remove('z')
+
+    stems.discard_many(['b', 'a'])
+    assert stems.tolist() == ['c']
+    stems.extend(['longer_name', 'd'])
+    assert stems.tolist() == ['c', 'longer_name', 'd']
+    assert stems[2] == 'd'
+
+
+def test_setitem_and_delitem():
+    dataset = CompactDataset({'A': ['x', 'y']})
+    dataset['B'] = ['z']
+    dataset['A'].remove('x')
+    del dataset['B']
+    assert dataset.to_dict() == {'A': ['y']}
+
+
+def test_append_is_buffered():
+    stems = StemList(['a'])
+    for idx in range(100):
+        stems.append('s{}'.format(idx))
+    assert len(stems) == 101
+    assert stems[100] == 's99'
+    assert 's50' in stems
+    stems.remove('s0')
+    assert stems.tolist()[:2] == ['a', 's1']
+
+
+def test_merged_lists_remember_their_directory():
+    dataset = CompactDataset({'A': ['1', '2'], 'B': ['2', '3'], 'C': ['4']})
+    dataset['M'] = []
+    for category in ('A', 'B'):
+        dataset['M'] += dataset.pop(category)
+    dataset['M'].append('5')
+    assert dataset['M'].tolist() == ['1', '2', '2', '3', '5']
+    physical = {category: name_lst.tolist() for category, name_lst in dataset.physical().items()}
+    assert physical == {'A': ['1', '2'], 'B': ['2', '3'], 'C': ['4'], 'M': ['5']}
+
+    assert dataset.discard('M', 'B', ['2']) == 1
+    assert dataset['M'].tolist() == ['1', '2', '3', '5']
+    assert dataset.physical()['A'].tolist() == ['1', '2']
+    assert dataset.physical()['B'].tolist() == ['3']
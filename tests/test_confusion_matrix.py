@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+from ConfusionMatrix import ConfusionMatrix, confusion_of_root, confusion_of_roots
+from SyntheticDataset import generate_result
+
+
+def test_confusion_of_root(result_root):
+    matrix = confusion_of_root(result_root)
+    assert matrix.classes == ['C0', 'C1', 'C2']
+    assert matrix.total == 60
+    assert matrix.matrix.sum(axis=1).tolist() == [20, 20, 20]
+    incorrect = sum(len(files) for files in matrix.files.values())
+    assert incorrect == matrix.total - np.trace(matrix.matrix)
+    for files in matrix.files.values():
+        assert all(os.path.isfile(os.path.join(os.path.dirname(result_root), path)) for path in files)
+
+
+def test_shallow_directories_are_skipped(result_root):
+    os.makedirs(os.path.join(result_root, 'C9'))
+    with open(os.path.join(result_root, 'C9', 'IMG99999999.jpg'), 'wb') as f:
+        f.write(b'')
+    with open(os.path.join(result_root, 'IMG99999998.jpg'), 'wb') as f:
+        f.write(b'')
+    matrix = confusion_of_root(result_root)
+    assert 'C9' not in matrix.classes
+    assert matrix.total == 60
+
+
+def test_folds_merge_to_total(tmp_path):
+    roots = []
+    for fold in range(3):
+        root = str(tmp_path / 'fold{}'.format(fold))
+        generate_result(root, num_classes=3, num_images=30, seed=fold)
+        roots.append(root)
+    total, parts = confusion_of_roots(roots, workers=2)
+    assert total.total == 90
+    expected = ConfusionMatrix(total.classes)
+    for part in parts.values():
+        expected.merge(part)
+    assert np.array_equal(total.matrix, expected.matrix)
+    paths = total.save(str(tmp_path / 'out'), 'folds')
+    assert all(os.path.isfile(path) for path in paths)
@@ -0,0 +1,53 @@
+import os
+import time
+
+from DatasetIndex import DatasetIndex
+from DuplicateFinder import find_duplicates
+
+
+def test_build_pairs_images_and_xml(sample_root):
+    os.remove(os.path.join(sample_root, 'C0', 'IMG00000000.xml'))
+    os.remove(os.path.join(sample_root, 'C1', 'IMG00000001.jpg'))
+    index = DatasetIndex(sample_root).build()
+    dataset = index.to_dict()
+    assert sorted(dataset) == ['C0', 'C1', 'C2', 'C3']
+    assert index.num_valid == 38
+    assert 'IMG00000000' not in dataset['C0']
+    assert index.orphans() == {'C0': (['IMG00000000'], []), 'C1': ([], ['IMG00000001'])}
+
+
+def test_refresh_rescans_only_changed_dirs(sample_root):
+    index = DatasetIndex(sample_root).build()
+    assert index.rescanned == 5
+    index.refresh()
+    assert index.rescanned == 0
+    time.sleep(0.01)
+    os.remove(os.path.join(sample_root, 'C2', 'IMG00000002.jpg'))
+    index.refresh()
+    assert index.rescanned == 1
+    assert 'IMG00000002' not in index.to_dict()['C2']
+
+
+def test_update_persists_index(sample_root):
+    DatasetIndex(sample_root).update()
+    index = DatasetIndex(sample_root)
+    assert index.load()
+    index.update()
+    assert index.rescanned == 0
+    assert index.num_valid == 40
+
+
+def test_indexed_paths_can_be_opened(sample_root):
+    for name, ext in (('IMG00000000', '.JPG'), ('IMG00000004', '.XML')):
+        src = os.path.join(sample_root, 'C0', name + ext.lower())
+        os.rename(src, src[:-4] + ext)
+    index = DatasetIndex(sample_root).build()
+    for category, name_lst in index.to_dict().items():
+        for file_name in name_lst:
+            for ext in ('.jpg', '.xml'):
+                assert os.path.isfile(os.path.join(sample_root, category, file_name + ext))
+    if os.path.normcase('A') == 'A':
+        assert len(index.to_dict()['C0']) == 8
+        assert sorted(index.orphans()['C0'][0]) == ['IMG00000004']
+        report = find_duplicates(sample_root, index.to_dict(), threads=1, use_cache=False)
+        assert report.num_files == index.num_valid
@@ -0,0 +1,11 @@
+from DatasetJoin import join_datasets
+
+
+def test_join_with_category_mapping():
+    source = {'A': ['1', '2', '3'], 'B': ['4']}
+    target = {'a': ['1', '3', '9'], 'b': ['4']}
+    result = join_datasets(source, target, source_key=str.lower)
+    assert sorted(result.matched) == [('A', 'a', '1'), ('A', 'a', '3'), ('B', 'b', '4')]
+    assert result.target_missing == {('A', '2')}
+    assert result.source_missing == {('a', '9')}
+    assert result.matched_by_source() == {'A': [('a', '1'), ('a', '3')], 'B': [('b', '4')]}
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from AnnotationStore import AnnotationStore
+from DatasetQuery import AnnotationQuery
+from conftest import dataset_of
+
+
+def brute_force(store, predicate):
+    objects = store.objects
+    ids = set()
+    for i in range(store.num_objects):
+        area = (int(objects['xmax'][i]) - objects['xmin'][i] + 1) * (int(objects['ymax'][i]) - objects['ymin'][i] + 1)
+        if predicate(store.classes[objects['class_id'][i]], area, int(objects['difficult'][i])):
+            ids.add(int(objects['image_id'][i]))
+    return sorted(ids)
+
+
+def test_queries_match_brute_force(sample_root):
+    store = AnnotationStore(sample_root).refresh(dataset_of(sample_root))
+    query = AnnotationQuery(store)
+
+    selection = query.objects(cls='C1', min_area=1000)
+    assert selection.image_ids.tolist() == brute_force(store, lambda cls, area, diff: cls == 'C1' and area >= 1000)
+    selection = query.objects(difficult=1)
+    assert selection.image_ids.tolist() == brute_force(store, lambda cls, area, diff: diff == 1)
+
+    num_obj = store.images['num_obj']
+    assert query.num_objects(min_num=2).image_ids.tolist() == np.flatnonzero(num_obj >= 2).tolist()
+    assert len(query.all() - query.num_objects(min_num=1)) == np.count_nonzero(num_obj == 0)
+
+
+def test_selection_to_dataset(sample_root):
+    store = AnnotationStore(sample_root).refresh(dataset_of(sample_root))
+    query = AnnotationQuery(store)
+    selection = query.category('C0', 'C2') & query.num_objects(min_num=1)
+    dataset = selection.to_dataset()
+    assert set(dataset) <= {'C0', 'C2'}
+    for category, name_lst in dataset.items():
+        for file_name in name_lst:
+            assert store.images['num_obj'][store.lookup()[(category, file_name)]] >= 1
+    assert len(~selection) + len(selection) == len(store)
+
+
+def test_selection_expires_when_rows_change(sample_root):
+    dataset = dataset_of(sample_root)
+    store = AnnotationStore(sample_root).refresh(dataset)
+    selection = AnnotationQuery(store).category('C1')
+    store.refresh(dataset)
+    assert selection.to_dataset() == {'C1': dataset['C1']}
+
+    dataset['C0'].remove('IMG00000000')
+    store.refresh(dataset)
+    with pytest.raises(ValueError):
+        selection.to_dataset()
+    with pytest.raises(ValueError):
+        selection & AnnotationQuery(store).all()
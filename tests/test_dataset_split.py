@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from DatasetSplit import kfold_dataset, split_dataset
+from conftest import dataset_of
+
+
+def test_split_is_disjoint_and_seeded(sample_root):
+    dataset = dataset_of(sample_root)
+    split = split_dataset(dataset, ratios=(0.6, 0.2, 0.2), seed=3)
+    subsets = [split.subset(name) for name in ('train', 'val', 'test')]
+    for category, name_lst in dataset.items():
+        parts = [set(subset.get(category, [])) for subset in subsets]
+        assert [len(part) for part in parts] == [6, 2, 2]
+        assert set.union(*parts) == set(name_lst)
+    again = split_dataset(dataset, ratios=(0.6, 0.2, 0.2), seed=3)
+    assert again.subset('train') == split.subset('train')
+
+
+def test_split_quotas(sample_root):
+    dataset = dataset_of(sample_root)
+    split = split_dataset(dataset, num_of_samples=5, quotas={'C0': 10, 'C1': (1, 1, 1)})
+    counts = split.counts_of_split()
+    assert sum(counts['C0'].values()) == 10
+    assert counts['C1'] == {'train': 1, 'val': 1, 'test': 1}
+    assert sum(counts['C2'].values()) == 5
+
+
+def test_kfold_is_balanced(sample_root):
+    dataset = dataset_of(sample_root)
+    split = kfold_dataset(dataset, k=3, seed=1, quotas={'C3': 7})
+    counts = split.counts_of_split()
+    for category in ('C0', 'C1', 'C2'):
+        assert sorted(counts[category].values()) == [3, 3, 4]
+    assert sorted(counts['C3'].values()) == [2, 2, 3]
+
+
+def test_kfold_rejects_per_split_quotas(sample_root):
+    with pytest.raises(AssertionError):
+        kfold_dataset(dataset_of(sample_root), k=3, quotas={'C0': (1, 1, 1)})
+
+
+def test_merged_split_keeps_directories(sample_root, tmp_path):
+    dataset = dataset_of(sample_root)
+    split = split_dataset(dataset, ratios=(0.5, 0.5), names=('train', 'val'), category_map={'C0': 'M', 'C1': 'M'})
+    assert sorted(split.counts_of_split()) == ['C2', 'C3', 'M']
+    assert split.counts_of_split()['M'] == {'train': 10, 'val': 10}
+    assert set(split.subset('train')) == {'C0', 'C1', 'C2', 'C3'}
+    for manifest in split.write_manifests(str(tmp_path / 'split'))[:-1]:
+        with open(manifest, encoding='utf-8') as f:
+            for line in f:
+                assert os.path.isfile(os.path.join(sample_root, line.strip()))
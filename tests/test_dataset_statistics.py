@@ -0,0 +1,41 @@
+import numpy as np
+
+from AnnotationStore import AnnotationStore
+from DatasetStatistics import DatasetStats, MAX_CENTER, statistics_of_store
+from conftest import dataset_of
+
+
+def test_merge_equals_whole(sample_root):
+    store = AnnotationStore(sample_root).refresh(dataset_of(sample_root))
+    whole = statistics_of_store(store)
+    assert whole.num_images == 40
+    assert whole.num_objects == store.num_objects
+    assert whole.out_of_range == 0
+
+    objects = store.objects
+    category = store.image_of_objects('category_id')
+    parts = []
+    for half in (slice(0, store.num_objects // 2), slice(store.num_objects // 2, None)):
+        part = DatasetStats()
+        for category_id, name in enumerate(store.categories):
+            mask = np.zeros(store.num_objects, dtype=bool)
+            mask[half] = True
+            mask &= category == category_id
+            part.update_objects(name, objects['xmin'][mask], objects['ymin'][mask],
+                                objects['xmax'][mask], objects['ymax'][mask])
+        parts.append(part)
+    parts[0].update_images(store.images['width'], store.images['height'])
+    merged = parts[0].merge(parts[1])
+    assert merged.to_dict() == whole.to_dict()
+
+
+def test_out_of_range_boxes_are_counted_not_binned():
+    stats = DatasetStats(cell=16)
+    stats.update_objects('A', [0, 10, 10 ** 6], [0, 10, 10 ** 6], [20, 30, 10 ** 6 + 4], [20, 30, 10 ** 6 + 4])
+    stats.update_objects('A', [900], [10], [950], [20], width=[800], height=[600])
+    category = stats.categories['A']
+    assert category.count == 4
+    assert category.out_of_range == 2
+    assert category.center_hist.sum() == 2
+    assert max(category.center_hist.shape) <= MAX_CENTER // 16
+    assert stats.to_dict()['out_of_range'] == 2
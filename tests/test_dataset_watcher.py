@@ -0,0 +1,75 @@
+import os
+import shutil
+import threading
+import time
+
+from DatasetIndex import DatasetIndex
+from DatasetWatcher import DatasetWatcher
+
+
+def test_refresh_and_handle(sample_root):
+    watcher = DatasetWatcher(sample_root, use_inotify=False)
+    watcher.index.update()
+    assert watcher.handle({'op': 'counts'})['counts'] == {'C0': 10, 'C1': 10, 'C2': 10, 'C3': 10}
+    version = watcher.version
+
+    time.sleep(0.01)
+    os.remove(os.path.join(sample_root, 'C1', 'IMG00000001.xml'))
+    assert watcher.refresh() == 1
+    assert watcher.version == version + 1
+    response = watcher.handle({'op': 'counts'})
+    assert response['counts']['C1'] == 9
+    assert 'IMG00000001' not in watcher.handle({'op': 'files', 'category': 'C1'})['files']
+    assert watcher.handle({'op': 'orphans'})['orphans'] == {'C1': (['IMG00000001'], [])}
+    assert 'error' in watcher.handle({'op': 'unknown'})
+
+
+def test_start_and_stop(sample_root):
+    with DatasetWatcher(sample_root, interval=0.05) as watcher:
+        os.makedirs(os.path.join(sample_root, 'C4'))
+        for ext in ('.jpg', '.xml'):
+            with open(os.path.join(sample_root, 'C4', 'IMG99999999' + ext), 'w') as f:
+                f.write('')
+        deadline = time.time() + 5
+        while 'C4' not in watcher.counts() and time.time() < deadline:
+            time.sleep(0.05)
+        assert watcher.counts().get('C4') == 1
+
+
+def test_dirty_scan_matches_full_build(sample_root):
+    watcher = DatasetWatcher(sample_root, use_inotify=False)
+    watcher.index.update()
+    os.makedirs(os.path.join(sample_root, 'C1', 'sub', 'deep'))
+    for ext in ('.jpg', '.xml'):
+        with open(os.path.join(sample_root, 'C1', 'sub', 'deep', 'IMG99999999' + ext), 'w') as f:
+            f.write('')
+    shutil.rmtree(os.path.join(sample_root, 'C2'))
+    os.remove(os.path.join(sample_root, 'C3', 'IMG00000003.jpg'))
+    # 只有这些目录收到了 inotify 事件
+    assert watcher.refresh({'C1', os.curdir, 'C3'}, full=False) == 5
+    assert watcher.index.entries == DatasetIndex(sample_root).build().entries
+
+
+def test_queries_do_not_wait_for_scan(sample_root):
+    watcher = DatasetWatcher(sample_root, use_inotify=False)
+    watcher.index.update()
+    started = threading.Event()
+    release = threading.Event()
+    scan = watcher.index.scan
+
+    def slow_scan(dirty=()):
+        started.set()
+        release.wait(5)
+        return scan(dirty)
+
+    watcher.index.scan = slow_scan
+    thread = threading.Thread(target=watcher.refresh)
+    thread.start()
+    try:
+        assert started.wait(5)
+        begin = time.time()
+        assert watcher.counts()['C0'] == 10
+        assert time.time() - begin < 1
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,33 @@
+import os
+
+from DuplicateFinder import file_digest, find_duplicates
+from conftest import dataset_of
+
+
+def test_find_duplicates(sample_root):
+    # 合成数据集中所有图片内容相同，改写其中一张使其唯一
+    with open(os.path.join(sample_root, 'C0', 'IMG00000000.jpg'), 'ab') as f:
+        f.write(b'\x00')
+    dataset = dataset_of(sample_root)
+    report = find_duplicates(sample_root, dataset, threads=2)
+    assert len(report.groups) == 1
+    assert len(report.groups[0]) == 39
+    assert ('C0', 'IMG00000000') not in report.groups[0]
+    assert len(report.across) == 1 and not report.within
+    assert len(report.redundant) == 38
+    assert report.num_hashed == 39
+
+    report = find_duplicates(sample_root, dataset, threads=2)
+    assert report.num_hashed == 0
+    assert len(report.redundant) == 38
+
+
+def test_file_digest_depends_on_content(tmp_path):
+    paths = []
+    for idx, data in enumerate((b'a' * 10, b'a' * 10, b'b' * 10)):
+        path = str(tmp_path / str(idx))
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+    digests = [file_digest(path) for path in paths]
+    assert digests[0] == digests[1] != digests[2]
@@ -0,0 +1,70 @@
+import os
+import stat
+
+import pytest
+
+from FileTransfer import TransferExecutor, materialize
+
+
+@pytest.fixture
+def files(tmp_path):
+    src_dir = tmp_path / 'src'
+    dst_dir = tmp_path / 'dst'
+    src_dir.mkdir()
+    dst_dir.mkdir()
+    for name, data in (('a.jpg', b'image'), ('a.xml', b'<annotation/>')):
+        (src_dir / name).write_bytes(data)
+        (dst_dir / name).write_bytes(b'old')
+    return str(src_dir), str(dst_dir)
+
+
+@pytest.mark.parametrize('mode', ['copy', 'hardlink', 'symlink', 'reflink'])
+def test_every_mode_overwrites(files, mode):
+    src_dir, dst_dir = files
+    used = materialize(os.path.join(src_dir, 'a.jpg'), os.path.join(dst_dir, 'a.jpg'), mode)
+    assert used in (mode, 'copy')
+    with open(os.path.join(dst_dir, 'a.jpg'), 'rb') as f:
+        assert f.read() == b'image'
+
+
+@pytest.mark.parametrize('mode', ['hardlink', 'symlink'])
+def test_xml_is_always_copied(files, mode):
+    src_dir, dst_dir = files
+    src, dst = os.path.join(src_dir, 'a.xml'), os.path.join(dst_dir, 'a.xml')
+    assert materialize(src, dst, mode) == 'copy'
+    assert not os.path.islink(dst)
+    with open(dst, 'w') as f:
+        f.write('<annotation>changed</annotation>')
+    with open(src, 'rb') as f:
+        assert f.read() == b'<annotation/>'
+
+
+def test_copy_keeps_permission_bits(files):
+    src_dir, dst_dir = files
+    src, dst = os.path.join(src_dir, 'a.jpg'), os.path.join(dst_dir, 'b.jpg')
+    os.chmod(src, 0o640)
+    materialize(src, dst)
+    assert stat.S_IMODE(os.stat(dst).st_mode) == 0o640
+
+
+def test_copy_over_hardlink_does_not_touch_source(files):
+    src_dir, dst_dir = files
+    src, dst = os.path.join(src_dir, 'a.jpg'), os.path.join(dst_dir, 'a.jpg')
+    materialize(src, dst, 'hardlink')
+    other = os.path.join(src_dir, 'other.jpg')
+    with open(other, 'wb') as f:
+        f.write(b'other')
+    materialize(other, dst, 'copy')
+    with open(src, 'rb') as f:
+        assert f.read() == b'image'
+
+
+def test_executor_counts_files_and_errors(files):
+    src_dir, dst_dir = files
+    with TransferExecutor(threads=2, queue_depth=1) as transfer:
+        transfer.submit(os.path.join(src_dir, 'a.jpg'), os.path.join(dst_dir, 'c.jpg'))
+        transfer.submit(os.path.join(src_dir, 'a.xml'), os.path.join(dst_dir, 'c.xml'))
+        transfer.submit(os.path.join(src_dir, 'missing.jpg'), os.path.join(dst_dir, 'd.jpg'))
+    assert transfer.files == 2
+    assert transfer.bytes == len(b'image') + len(b'<annotation/>')
+    assert len(transfer.errors) == 1
@@ -0,0 +1,29 @@
+import json
+
+from Instrument import Instrumentation, JsonLinesSink, instrumented
+
+
+class Worker(object):
+    def __init__(self, instrument):
+        self.instrument = instrument
+
+    @instrumented
+    def run(self):
+        with self.instrument.phase('scan', files=2):
+            pass
+        with self.instrument.phase('transfer') as phase:
+            phase.add(files=3, num_bytes=100)
+
+
+def test_phases_roll_up_to_total(tmp_path):
+    path = str(tmp_path / 'instrument.jsonl')
+    records = []
+    instrument = Instrumentation([JsonLinesSink(path)])
+    instrument.add_hook(records.append)
+    Worker(instrument).run()
+    assert [record['phase'] for record in records] == ['scan', 'transfer', 'total']
+    total = records[-1]
+    assert (total['class'], total['method']) == ('Worker', 'run')
+    assert (total['files'], total['bytes']) == (5, 100)
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == records
@@ -0,0 +1,44 @@
+import os
+
+from AnnotationStore import AnnotationStore
+from IntegrityCheck import check_integrity, image_header
+from SyntheticDataset import jpeg_bytes
+from conftest import dataset_of
+
+
+def test_image_header(tmp_path):
+    path = str(tmp_path / 'a.jpg')
+    with open(path, 'wb') as f:
+        f.write(jpeg_bytes(320, 240, padding=100))
+    assert image_header(path) == (320, 240, True)
+    with open(path, 'wb') as f:
+        f.write(jpeg_bytes(320, 240)[:-2])
+    assert image_header(path) == (320, 240, False)
+    with open(path, 'wb') as f:
+        f.write(b'not an image')
+    assert image_header(path) == (None, None, False)
+
+
+def test_check_integrity(sample_root):
+    with open(os.path.join(sample_root, 'C0', 'IMG00000000.jpg'), 'wb') as f:
+        f.write(jpeg_bytes(1024, 768)[:-2])
+    with open(os.path.join(sample_root, 'C1', 'IMG00000001.jpg'), 'wb') as f:
+        f.write(jpeg_bytes(640, 480))
+    dataset = dataset_of(sample_root)
+    store = AnnotationStore(sample_root).refresh(dataset)
+    report = check_integrity(sample_root, dataset, store=store, threads=2)
+    counts = report.count()
+    assert counts['truncated'] == 1
+    assert counts['size_mismatch'] == 1
+    assert ('C0', 'IMG00000000') in report.bad
+    assert ('C1', 'IMG00000001') in report.bad
+    assert report.num_files == 40
+
+
+def test_missing_image_does_not_stop_the_scan(sample_root):
+    dataset = dataset_of(sample_root)
+    os.remove(os.path.join(sample_root, 'C0', 'IMG00000000.jpg'))
+    report = check_integrity(sample_root, dataset, threads=2)
+    assert report.issues[0][:3] == ('C0', 'IMG00000000', 'unreadable')
+    assert 'FileNotFoundError' in report.issues[0][3]
+    assert report.num_files == 40 and len(report.bad) == 1
@@ -0,0 +1,88 @@
+import os
+
+from MoveJournal import MoveJournal, plan_key, rollback_moves, run_moves
+
+
+def make_files(root, names):
+    os.makedirs(root, exist_ok=True)
+    for name in names:
+        with open(os.path.join(root, name), 'w') as f:
+            f.write(name)
+
+
+def plan_of(src_dir, dst_dir, names):
+    return lambda: [(os.path.join(src_dir, name), os.path.join(dst_dir, name)) for name in names]
+
+
+def test_move_and_rollback(tmp_path):
+    src_dir, dst_dir, journal_dir = str(tmp_path / 'src'), str(tmp_path / 'dst'), str(tmp_path / 'journal')
+    names = ['{}.jpg'.format(i) for i in range(5)]
+    make_files(src_dir, names)
+    journal = run_moves(journal_dir, 'op', plan_of(src_dir, dst_dir, names), batch_size=2)
+    assert journal.status == 'done'
+    assert sorted(os.listdir(dst_dir)) == names
+    assert os.listdir(src_dir) == []
+
+    rollback_moves(journal_dir, 'op')
+    assert sorted(os.listdir(src_dir)) == names
+    assert MoveJournal.latest(journal_dir, 'op').status == 'rolled_back'
+
+
+def test_resume_unfinished_journal(tmp_path):
+    src_dir, dst_dir, journal_dir = str(tmp_path / 'src'), str(tmp_path / 'dst'), str(tmp_path / 'journal')
+    names = ['{}.jpg'.format(i) for i in range(5)]
+    make_files(src_dir, names)
+    args = {'dir_name': 'dst'}
+    # 模拟第一批提交后中断
+    journal = MoveJournal.create(journal_dir, 'op', plan_of(src_dir, dst_dir, names)(), plan_key('op', args))
+    for src, dst in journal.moves[:2]:
+        MoveJournal._move(src, dst)
+    journal._append({'start': 0, 'end': 2})
+
+    def plan():
+        raise AssertionError('the plan should not be rebuilt when resuming')
+
+    resumed = run_moves(journal_dir, 'op', plan, batch_size=2, args=args)
+    assert resumed.journal_path == journal.journal_path
+    assert resumed.status == 'done'
+    assert sorted(os.listdir(dst_dir)) == names
+
+
+def test_different_args_start_a_new_journal(tmp_path):
+    src_dir, journal_dir = str(tmp_path / 'src'), str(tmp_path / 'journal')
+    make_files(src_dir, ['a.jpg', 'b.jpg'])
+    first = MoveJournal.create(journal_dir, 'op', plan_of(src_dir, str(tmp_path / 'A'), ['a.jpg'])(),
+                               plan_key('op', {'dir_name': 'A'}))
+    journal = run_moves(journal_dir, 'op', plan_of(src_dir, str(tmp_path / 'B'), ['b.jpg']),
+                        args={'dir_name': 'B'})
+    assert journal.journal_path != first.journal_path
+    assert os.listdir(str(tmp_path / 'B')) == ['b.jpg']
+    assert not os.path.exists(str(tmp_path / 'A'))
+    assert MoveJournal.latest(journal_dir, 'op', unfinished_only=True).journal_path == first.journal_path
+
+
+def test_missing_sources_are_skipped(tmp_path):
+    src_dir, dst_dir, journal_dir = str(tmp_path / 'src'), str(tmp_path / 'dst'), str(tmp_path / 'journal')
+    make_files(src_dir, ['a.jpg'])
+    journal = run_moves(journal_dir, 'op', plan_of(src_dir, dst_dir, ['a.jpg', 'gone.jpg']))
+    assert journal.skipped == [os.path.join(src_dir, 'gone.jpg')]
+    assert MoveJournal(journal.journal_path).load().skipped == journal.skipped
+
+
+def test_latest_reads_only_the_chosen_plan(tmp_path):
+    src_dir, dst_dir, journal_dir = str(tmp_path / 'src'), str(tmp_path / 'dst'), str(tmp_path / 'journal')
+    make_files(src_dir, ['a.jpg', 'b.jpg'])
+    old = run_moves(journal_dir, 'op', plan_of(src_dir, dst_dir, ['a.jpg']))
+    # 已完成的旧日志的计划不应再被读取
+    os.remove(old.plan_path)
+    journal = run_moves(journal_dir, 'op', plan_of(src_dir, dst_dir, ['b.jpg']), args={'name': 'b'})
+    assert journal.status == 'done'
+    assert MoveJournal.latest(journal_dir, 'op', key=plan_key('op', {'name': 'b'})).moves == journal.moves
+
+
+def test_empty_plan_creates_no_journal(tmp_path):
+    journal_dir = str(tmp_path / 'journal')
+    journal = run_moves(journal_dir, 'op', lambda: [])
+    assert journal.moves == [] and journal.status == 'done'
+    assert not os.path.exists(journal_dir) or os.listdir(journal_dir) == []
+    assert MoveJournal.latest(journal_dir, 'op') is None
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from PlayDataset import PlayDataset
+from ShardExport import ShardReader
+
+
+@pytest.fixture
+def data(sample_root, tmp_path):
+    return PlayDataset(sample_root, headless=True, output_dir=str(tmp_path / 'output'))
+
+
+def test_physical_dataset_after_merge(data):
+    data.merge_category(M=['C0', 'C1'])
+    assert sorted(data.dataset) == ['C2', 'C3', 'M']
+    physical = data.physical_dataset()
+    assert sorted(physical) == ['C0', 'C1', 'C2', 'C3']
+    assert sum(len(name_lst) for name_lst in physical.values()) == 40
+
+
+def test_find_duplicates_after_merge(data, sample_root):
+    data.merge_category(M=['C0', 'C1'])
+    report = data.find_duplicates(threads=2, quarantine=True)
+    assert len(report.redundant) == 39
+    assert sum(len(name_lst) for name_lst in data.dataset.values()) == 1
+    assert data.rollback_moves('find_duplicates').status == 'rolled_back'
+    assert sum(len(files) for _, _, files in os.walk(sample_root)) == 80
+
+
+def test_export_shards_after_merge(data, tmp_path):
+    data.merge_category(M=['C0', 'C1'])
+    output_dir = data.export_shards(output_dir=str(tmp_path / 'shards'), workers=1)
+    with ShardReader(output_dir) as reader:
+        assert len(reader) == 40
+        assert sorted(reader.categories) == ['C0', 'C1', 'C2', 'C3']
+
+
+def test_reset_difficult_after_merge(data):
+    data.merge_category(M=['C0', 'C1'])
+    assert (data.load_annotations().objects['difficult'] == 1).any()
+    data.reset_difficult()
+    assert not (data.load_annotations().objects['difficult'] == 1).any()
+
+
+def test_reset_difficult_requires_tag(data, sample_root):
+    xml_path = os.path.join(sample_root, 'C0', 'IMG00000000.xml')
+    with open(xml_path) as f:
+        text = f.read()
+    if '<difficult>' not in text:
+        pytest.skip('the first synthetic xml has no objects')
+    with open(xml_path, 'w') as f:
+        f.write(text.replace('<difficult>0</difficult>', '').replace('<difficult>1</difficult>', ''))
+    with pytest.raises(NotImplementedError):
+        data.reset_difficult()
+
+
+def test_query_is_cached_until_changed(data):
+    query = data.query()
+    assert data.query() is query
+    selection = query.category('C2')
+    data.move_selection(selection, dir_name='selected')
+    assert data.annotation_query is None
+    assert 'C2' not in data.query().store.categories or len(data.query().category('C2')) == 0
+    assert len(data.dataset['C2']) == 0
+
+
+def test_count_category(data):
+    path = data.count_category(fmt='csv')
+    assert path.startswith(data.output_dir)
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'category,level,quantity,total'
+    assert lines[-1] == ',0,0,40'
+
+
+def test_stale_selection_is_not_moved(data, sample_root):
+    selection = data.query().category('C1')
+    for ext in ('.jpg', '.xml'):
+        os.remove(os.path.join(sample_root, 'C0', 'IMG00000000' + ext))
+    data.dataset['C0'].remove('IMG00000000')
+    data.query(refresh=True)
+    with pytest.raises(ValueError):
+        data.move_selection(selection)
+    assert len(data.dataset['C1']) == 10
+    assert len(data.query().category('C1').to_dataset()['C1']) == 10
+
+
+def test_quarantine_keeps_same_name_in_other_folder(sample_root, tmp_path):
+    for ext in ('.jpg', '.xml'):
+        with open(os.path.join(sample_root, 'C0', 'IMG00000000' + ext), 'rb') as f:
+            data = f.read()
+        with open(os.path.join(sample_root, 'C1', 'IMG00000000' + ext), 'wb') as f:
+            f.write(data)
+    data = PlayDataset(sample_root, headless=True, output_dir=str(tmp_path / 'output'))
+    data.merge_category(M=['C0', 'C1'])
+    report = data.find_duplicates(threads=2, quarantine=True)
+    assert report.groups[0][0] == ('C0', 'IMG00000000')
+    assert ('C1', 'IMG00000000') in report.redundant
+    assert os.path.isfile(os.path.join(sample_root, 'C0', 'IMG00000000.jpg'))
+    assert data.dataset['M'].tolist() == ['IMG00000000']
+    assert {category: name_lst.tolist() for category, name_lst in data.physical_dataset().items()
+            if len(name_lst)} == {'C0': ['IMG00000000']}
+
+
+def test_split_after_merge_uses_disk_paths(data, tmp_path):
+    data.merge_category(M=['C0', 'C1'])
+    split = data.kfold_dataset(k=2, output_dir=str(tmp_path / 'kfold'))
+    assert sum(split.counts_of_split()['M'].values()) == 20
+    output_dir = data.export_shards(output_dir=str(tmp_path / 'shards'), dataset=split.subset('fold0'), workers=1)
+    with ShardReader(output_dir) as reader:
+        assert len(reader) == 20
+
+
+def test_delete_no_bbox_xml_after_merge(data, sample_root):
+    store = data.load_annotations()
+    no_bbox = int((store.images['num_obj'] == 0).sum())
+    assert no_bbox > 0
+    data.merge_category(M=['C0', 'C1'])
+    data.delete_no_bbox_xml()
+    assert sum(len(name_lst) for name_lst in data.dataset.values()) == 40 - no_bbox
+    num_xml = sum(name.endswith('.xml') for _, _, files in os.walk(sample_root) for name in files)
+    assert num_xml == 40 - no_bbox
+    assert len(data.load_annotations()) == 40 - no_bbox
@@ -0,0 +1,31 @@
+import json
+import os
+
+from ShardExport import ShardReader, export_shards
+from VocReader import read_voc
+from conftest import dataset_of
+
+
+def test_round_trip(sample_root, tmp_path):
+    dataset = dataset_of(sample_root)
+    output_dir = str(tmp_path / 'shards')
+    assert export_shards(sample_root, dataset, output_dir, samples_per_shard=7, workers=2) == 40
+    with ShardReader(output_dir) as reader:
+        assert len(reader) == 40
+        for idx in range(len(reader)):
+            category, file_name = reader.name(idx)
+            with open(os.path.join(sample_root, category, file_name + '.jpg'), 'rb') as f:
+                assert bytes(reader.image(idx)) == f.read()
+            width, height, objects = read_voc(os.path.join(sample_root, category, file_name + '.xml'))
+            assert reader.annotation(idx) == json.loads(json.dumps(
+                {'width': width, 'height': height, 'objects': objects}))
+        names = [reader.name(idx)[1] for idx, _, _ in reader.by_category('C2')]
+        assert sorted(names) == sorted(dataset['C2'])
+
+
+def test_img_only(sample_root, tmp_path):
+    output_dir = str(tmp_path / 'shards')
+    export_shards(sample_root, {'C1': dataset_of(sample_root)['C1']}, output_dir, img_only=True, workers=1)
+    with ShardReader(output_dir) as reader:
+        assert len(reader) == 10
+        assert reader.annotation(0) is None
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from VocReader import lxml_etree, parse_voc_tree, read_voc
+from conftest import dataset_of
+
+BACKENDS = ['etree'] + (['lxml'] if lxml_etree is not None else [])
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_read_voc_matches_tree_parser(sample_root, backend):
+    for category, name_lst in dataset_of(sample_root).items():
+        for file_name in name_lst:
+            xml_path = os.path.join(sample_root, category, file_name + '.xml')
+            assert read_voc(xml_path, backend) == parse_voc_tree(xml_path)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_read_voc_checks_like_get_and_check(tmp_path, backend):
+    xml_path = str(tmp_path / 'a.xml')
+    with open(xml_path, 'w') as f:
+        f.write('<annotation><size><width>10</width><height>10</height></size>'
+                '<object><name>A</name></object></annotation>')
+    with pytest.raises(NotImplementedError, match='bndbox'):
+        read_voc(xml_path, backend)
+    with open(xml_path, 'w') as f:
+        f.write('<annotation><size><width>10</width><height>10</height></size>'
+                '<object><name>A</name><bndbox><xmin>1</xmin><ymin>1</ymin><xmax>5</xmax>'
+                '<ymax>5</ymax></bndbox></object></annotation>')
+    assert read_voc(xml_path, backend) == (10, 10, [('A', 1, 1, 5, 5, -1)])
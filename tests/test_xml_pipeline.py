@@ -0,0 +1,28 @@
+import os
+
+from AnnotationStore import AnnotationStore
+from PlayDataset import PlayDataset
+from conftest import dataset_of
+
+
+def test_single_pass_pipeline(sample_root, tmp_path):
+    before = AnnotationStore(sample_root).refresh(dataset_of(sample_root))
+    no_bbox = int((before.images['num_obj'] == 0).sum())
+    with_difficult = len(set(before.objects['image_id'][before.objects['difficult'] == 1].tolist()))
+
+    data = PlayDataset(sample_root, headless=True, output_dir=str(tmp_path / 'output'))
+    data.query()
+    stat = data.pipeline().reset_difficult().delete_no_bbox_xml().correct_dataset().run(threads=2)
+    assert stat['deleted'] == no_bbox
+    assert stat['written'] == with_difficult
+    assert stat['routed'] == 40 - no_bbox
+    assert data.annotation_query is None
+    assert sum(len(name_lst) for name_lst in data.dataset.values()) == 40 - no_bbox
+
+    after = data.load_annotations()
+    assert len(after) == 40 - no_bbox
+    assert not (after.objects['difficult'] == 1).any()
+    correct_root = sample_root + '_correct'
+    routed = sum(len(files) for _, _, files in os.walk(correct_root))
+    assert routed == 2 * stat['routed']
+    assert not os.path.isdir(os.path.join(correct_root, 'difficult'))